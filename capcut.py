@@ -2,41 +2,109 @@ import os
 import sys
 import subprocess
 import time
-import ctypes
 import threading
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext, font
-import json
-import shutil
-from datetime import datetime
-from pathlib import Path
-
-# --- Core Helper Functions ---
-
-def is_admin():
-    """Check if script is running with admin privileges"""
-    try:
-        return ctypes.windll.shell32.IsUserAnAdmin()
-    except:
-        return False
-
-def run_as_admin():
-    """Relaunch script with admin privileges"""
-    if sys.platform == 'win32':
-        ctypes.windll.shell32.ShellExecuteW(
-            None, "runas", sys.executable, " ".join(sys.argv), None, 1
-        )
-
-def get_capcut_path():
-    """Get CapCut installation path"""
-    localappdata = os.getenv('LOCALAPPDATA')
-    if not localappdata:
-        return Path("C:/") 
-    capcut_path = Path(localappdata) / "CapCut"
-    return capcut_path
-
-class CapCutBlockerApp:
+import collections
+import logging
+
+from capcut_core import CapCutBlocker, format_bytes, is_admin, run_as_admin, setup_logging
+from capcut_queue import DownloadQueue
+from capcut_tasks import TaskCancelled, TaskRunner
+from capcut_trace import TRACE_ENV, enable, format_summary, tracer
+
+# --- UI Event Channel ---
+
+UI_FRAME_MS = 50 # Worker events reach the widgets at most 20 times per second
+CLOSE_TIMEOUT = 10 # Seconds the window waits for running work to reach a safe point
+
+class UIEventChannel:
+    """Thread-safe hand-off from worker threads to the Tk main loop
+
+    post() queues an event that is delivered in order; post_latest() keeps only
+    the newest event per key (progress). The main loop calls drain() once a frame.
+    """
+    def __init__(self):
+        self._events = collections.deque()
+        self._latest = {}
+        self._lock = threading.Lock()
+        self.posted = 0
+        self.delivered = 0
+
+    def post(self, callback, *args):
+        with self._lock:
+            self.posted += 1
+            self._events.append((callback, args))
+
+    def post_latest(self, key, callback, *args):
+        with self._lock:
+            self.posted += 1
+            self._latest[key] = (callback, args)
+
+    def drain(self):
+        """Run every queued event, then the newest coalesced one per key"""
+        while self._events:
+            callback, args = self._events.popleft()
+            callback(*args)
+            self.delivered += 1
+        with self._lock:
+            latest, self._latest = self._latest, {}
+        for callback, args in latest.values():
+            callback(*args)
+            self.delivered += 1
+
+DOWNLOAD_LIMITS = {
+    "No speed limit": None,
+    "Limit to 1 MB/s": 1024 ** 2,
+    "Limit to 2 MB/s": 2 * 1024 ** 2,
+    "Limit to 5 MB/s": 5 * 1024 ** 2,
+    "Limit to 10 MB/s": 10 * 1024 ** 2,
+}
+
+def format_eta(seconds):
+    if seconds is None:
+        return "--:--"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+# --- Activity Log Sink ---
+
+LOG_MAX_LINES = 1000 # Lines kept in the Activity Log widget
+
+class WidgetLogHandler(logging.Handler):
+    """Collects formatted lines for the Tk log widget
+
+    Worker threads only append to a bounded deque (no handler lock, no Tk
+    calls); the main loop drains it in batches. If the UI falls far behind,
+    the oldest pending lines are dropped, like the widget itself would.
+    """
+    def __init__(self, max_lines=LOG_MAX_LINES):
+        super().__init__()
+        self.pending = collections.deque(maxlen=max_lines)
+
+    def handle(self, record):
+        # Skip Handler's lock: deque.append is already atomic
+        rv = self.filter(record)
+        if rv:
+            self.emit(record)
+        return rv
+
+    def emit(self, record):
+        try:
+            self.pending.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+    def drain(self):
+        batch = []
+        while True:
+            try: batch.append(self.pending.popleft())
+            except IndexError: return batch
+
+class CapCutBlockerApp(CapCutBlocker):
     def __init__(self, root):
+        super().__init__()
         self.root = root
         self.root.title("CapCut Update Blocker")
         self.root.geometry("500x700")
@@ -53,16 +121,6 @@ class CapCutBlockerApp:
         self.button_font = font.Font(family="Segoe UI", size=10, weight="bold")
         self.mono_font = font.Font(family="Consolas", size=9)
 
-        # Version Map
-        self.versions = {
-            "v1.0.5 (Ultra Legacy)": "https://lf16-capcut.faceulv.com/obj/capcutpc-packages-us/packages/CapCut_1_0_5_80_capcutpc_0.exe",
-            "v1.5.0": "https://lf16-capcut.faceulv.com/obj/capcutpc-packages-us/packages/CapCut_1_5_0_230_capcutpc_0.exe",
-            "v2.0.0 (Legacy Stable)": "https://lf16-capcut.faceulv.com/obj/capcutpc-packages-us/packages/CapCut_2_0_0_357_capcutpc_0.exe",
-            "v3.0.0 (Split)": "https://lf16-capcut.faceulv.com/obj/capcutpc-packages-us/packages/CapCut_split_3_0_0_1015_capcutpc_0.exe",
-            "v4.0.0 (Stable)": "https://lf16-capcut.faceulv.com/obj/capcutpc-packages-us/packages/CapCut_4_0_0_1539_capcutpc_0_creatortool.exe",
-            "v5.0.0 (Latest Supported)": "https://lf16-capcut.faceulv.com/obj/capcutpc-packages-us/packages/CapCut_5_0_0_1886_capcutpc_0_creatortool.exe"
-        }
-
         style = ttk.Style()
         style.theme_use('clam')
         style.configure("TFrame", background=self.bg_color)
@@ -103,7 +161,24 @@ class CapCutBlockerApp:
         self.btn_block.pack(fill=tk.X, pady=(0, 5))
         
         self.btn_restore = ttk.Button(controls_lf, text="🔓  Restore Original", command=self.start_restore)
-        self.btn_restore.pack(fill=tk.X)
+        self.btn_restore.pack(fill=tk.X, pady=(0, 5))
+
+        # Which backup snapshot Restore returns to
+        self.snapshot_var = tk.StringVar()
+        self.snapshot_ids = {}
+        self.snapshot_dropdown = ttk.Combobox(controls_lf, textvariable=self.snapshot_var, state="readonly")
+        self.snapshot_dropdown.pack(fill=tk.X)
+
+        # Sizes every cache and old version first; the user picks what goes
+        self.btn_space = ttk.Button(controls_lf, text="🧹  Free Up Space...", command=self.start_space_scan)
+        self.btn_space.pack(fill=tk.X, pady=(5, 0))
+
+        # Hashes the active version folder against the baseline taken at block time
+        self.btn_integrity = ttk.Button(controls_lf, text="🧬  Check Integrity", command=self.start_integrity_check)
+        self.btn_integrity.pack(fill=tk.X, pady=(5, 0))
+
+        self.btn_stop = ttk.Button(controls_lf, text="⏹  Stop", command=self.stop_action)
+        # Packed only while a block or restore runs
 
         # --- Divider ---
         ttk.Separator(main_content, orient='horizontal').pack(fill=tk.X, pady=(0, 20))
@@ -117,18 +192,41 @@ class CapCutBlockerApp:
         self.version_var = tk.StringVar()
         self.version_dropdown = ttk.Combobox(download_frame, textvariable=self.version_var, values=list(self.versions.keys()), state="readonly")
         self.version_dropdown.pack(fill=tk.X, pady=(0, 8))
-        self.version_dropdown.current(1)
+        self.version_dropdown.current(min(1, len(self.versions) - 1))
+
+        # One shared cap for every queued download; changes apply immediately
+        self.limit_var = tk.StringVar(value=next(iter(DOWNLOAD_LIMITS)))
+        self.limit_dropdown = ttk.Combobox(download_frame, textvariable=self.limit_var, values=list(DOWNLOAD_LIMITS), state="readonly")
+        self.limit_dropdown.pack(fill=tk.X, pady=(0, 8))
+        self.limit_dropdown.bind("<<ComboboxSelected>>", self.on_limit_change)
 
         self.btn_download = ttk.Button(download_frame, text="Download Installer", command=self.start_download)
         self.btn_download.pack(fill=tk.X)
 
-        # --- Progress & Cancel (Hidden by default) ---
-        self.progress_bar = ttk.Progressbar(download_frame, orient="horizontal", mode="determinate")
+        self.downloads = DownloadQueue(self, on_update=self.on_job_update)
+        self.job_rows = {} # DownloadJob -> Treeview item
+        self.reported_jobs = set()
+
+        # --- Queue, Progress & Cancel (Hidden by default) ---
+        self.job_list = ttk.Treeview(download_frame, columns=("state", "progress", "speed"), height=3)
+        self.job_list.heading("#0", text="Version")
+        self.job_list.heading("state", text="Status")
+        self.job_list.heading("progress", text="Progress")
+        self.job_list.heading("speed", text="Speed")
+        self.job_list.column("#0", width=90)
+        for column, width in (("state", 70), ("progress", 130), ("speed", 80)):
+            self.job_list.column(column, width=width, anchor=tk.W)
         # Pack deliberately omitted here, will be packed in show_download_ui
+
+        self.progress_bar = ttk.Progressbar(download_frame, orient="horizontal", mode="determinate")
+
+        self.speed_label = ttk.Label(download_frame, text="", font=self.mono_font, foreground=self.text_dim)
         
-        self.btn_cancel = ttk.Button(download_frame, text="Cancel Download", command=self.cancel_action)
+        self.btn_cancel = ttk.Button(download_frame, text="Pause Download", command=self.cancel_action)
         # Pack deliberately omitted here
 
+        self.btn_discard = ttk.Button(download_frame, text="Discard Download", command=self.discard_action)
+
         # 3. Log Area (Fixed sizing)
         log_frame = ttk.LabelFrame(root, text="Activity Log", padding="10")
         log_frame.pack(fill=tk.BOTH, expand=True, padx=30, pady=(0, 20))
@@ -136,505 +234,357 @@ class CapCutBlockerApp:
         self.log_area = scrolledtext.ScrolledText(log_frame, height=6, state='disabled', font=self.mono_font, relief=tk.FLAT, bg="#F8F9FA")
         self.log_area.pack(fill=tk.BOTH, expand=True)
 
+        self.log_handler = setup_logging(WidgetLogHandler(), self.get_log_dir())
+
+        # Worker threads talk to the widgets only through this channel
+        self.ui_events = UIEventChannel()
+        self.root.after(UI_FRAME_MS, self.pump_ui_events)
+
+        # Block and restore run here; Stop and closing the window cancel them between steps
+        self.tasks = TaskRunner(on_done=self.on_task_done)
+        self.current_task = None
+        self.trace_path = os.environ.get(TRACE_ENV) or None
+        if self.trace_path:
+            enable() # Every task adds to one trace, rewritten after each
+
+        self.close_deadline = None
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
         # Initial Logic
+        try:
+            self.recover() # Finish a block or restore that was cut off last time
+        except Exception as e:
+            self.log(f"⚠️ Could not finish the interrupted run: {e}")
         self.refresh_status()
 
-    def log(self, message):
-        """Thread-safe logging"""
+    def flush_log(self):
+        """Append pending log lines in one batch and trim the widget to LOG_MAX_LINES"""
+        batch = self.log_handler.drain()
+        if not batch:
+            return
         self.log_area.config(state='normal')
-        self.log_area.insert(tk.END, message + "\n")
+        self.log_area.insert(tk.END, "\n".join(batch) + "\n")
+        line_count = int(self.log_area.index('end-1c').split('.')[0])
+        if line_count > LOG_MAX_LINES:
+            self.log_area.delete('1.0', f'{line_count - LOG_MAX_LINES}.0')
         self.log_area.see(tk.END)
         self.log_area.config(state='disabled')
 
+    def post_dialog(self, kind, title, message):
+        """Show a messagebox from a worker thread; kind is info, warning or error"""
+        self.ui_events.post(self.show_dialog, kind, title, message)
+
+    def show_dialog(self, kind, title, message):
+        """Main-loop side of a dialog event"""
+        self.flush_log() # The log lines that explain the dialog are visible behind it
+        getattr(messagebox, f"show{kind}")(title, message)
+
+    def pump_ui_events(self):
+        """Deliver queued worker events and log lines once per frame"""
+        try:
+            self.ui_events.drain()
+            self.flush_log()
+        finally:
+            self.root.after(UI_FRAME_MS, self.pump_ui_events)
+
     def refresh_status(self):
         """Update status label based on installation"""
-        capcut_path = get_capcut_path()
+        capcut_path = self.capcut_path
         if capcut_path.exists():
-            self.status_label.config(text=f"✅ CapCut detected at: {capcut_path}", foreground="green")
+            installation = self.scan_installation()
+            text = f"✅ CapCut detected at: {capcut_path}"
+            if installation.active:
+                text = f"✅ CapCut {installation.active.label} detected at: {capcut_path}"
+                if installation.others:
+                    text += f" (+{len(installation.others)} other version folder(s), removed on block)"
+            self.status_label.config(text=text, foreground="green")
         else:
             self.status_label.config(text="⚠️ CapCut NOT detected. Please download and install it first.", foreground="#D32F2F")
+        self.refresh_snapshots()
 
-    def run_threaded(self, target):
-        thread = threading.Thread(target=target)
-        thread.daemon = True
-        thread.start()
+    def refresh_snapshots(self):
+        """Fill the snapshot dropdown, newest first"""
+        latest = "Latest backup"
+        self.snapshot_ids = {latest: None}
+        try:
+            manifests = self.list_snapshots()
+        except OSError:
+            manifests = []
+        for manifest in reversed(manifests):
+            created = time.strftime("%Y-%m-%d %H:%M", time.localtime(manifest["created"]))
+            label = f"{created}  •  {', '.join(sorted(manifest['files']))}"
+            self.snapshot_ids[label] = manifest["id"]
+        self.snapshot_dropdown.config(values=list(self.snapshot_ids))
+        self.snapshot_dropdown.set(latest)
+
+    def run_task(self, name, target, *args):
+        """Run target on the task pool; Stop cancels it at its next step"""
+        self.current_task = self.tasks.submit(name, target, *args)
+        self.btn_stop.config(state='normal')
+        self.btn_stop.pack(fill=tk.X, pady=(5, 0))
+
+    def on_task_done(self, task):
+        self.log(f"⏱️ {task.summary()}")
+        if self.trace_path:
+            for line in format_summary(tracer().summary(), limit=10).splitlines():
+                self.log(f"   {line}")
+            try:
+                tracer().export(self.trace_path)
+                self.log(f"🧭 Trace written to {self.trace_path}")
+            except OSError as e:
+                self.log(f"⚠️ Could not write trace: {e}")
+
+    def stop_action(self):
+        if self.current_task:
+            self.log("⏹️ Stopping after the current step...")
+            self.current_task.cancel()
+        self.btn_stop.config(state='disabled') # Prevent double clicks
+
+    def on_close(self):
+        """Cancel running work, let it reach a safe point, then close"""
+        if self.close_deadline is not None:
+            return
+        self.close_deadline = time.monotonic() + CLOSE_TIMEOUT
+        self.log("⏹️ Closing after the current step...")
+        self.tasks.cancel_all()
+        self.downloads.cancel() # Paused, so they resume next time
+        self.purge_stop.set()
+        self.finish_close()
+
+    def finish_close(self):
+        purging = self.purge_thread is not None and self.purge_thread.is_alive()
+        busy = self.tasks.active() or not self.downloads.idle() or purging
+        if busy and time.monotonic() < self.close_deadline:
+            self.root.after(UI_FRAME_MS, self.finish_close)
+            return
+        self.stop_watch(timeout=1)
+        self.tasks.shutdown(timeout=0) # A step still running finishes before the process exits
+        self.root.destroy()
 
     def set_buttons_state(self, state):
         self.btn_block.config(state=state)
         self.btn_download.config(state=state)
         self.btn_restore.config(state=state)
+        self.btn_space.config(state=state)
+        self.btn_integrity.config(state=state)
+        self.snapshot_dropdown.config(state="readonly" if state == "normal" else "disabled")
         self.version_dropdown.config(state="readonly" if state == "normal" else "disabled")
+        if state == "normal":
+            self.btn_stop.pack_forget()
 
     # --- Actions ---
 
     def start_block_updates(self):
         self.set_buttons_state("disabled")
-        self.run_threaded(self.do_block_logic)
+        self.run_task("block", self.do_block_logic)
 
     def do_block_logic(self):
         try:
-            self.log("-" * 50)
-            self.log("🚀 Starting blocking process...")
-            
-            capcut_path = get_capcut_path()
-            if not capcut_path.exists():
-                 # Create it if it doesn't exist (user might want to pre-block)
-                 self.log(f"   Creating directory: {capcut_path}")
-                 capcut_path.mkdir(parents=True, exist_ok=True)
-
-            self.kill_capcut_processes()
-            
-            apps_path = capcut_path / "Apps"
-            userdata_path = capcut_path / "User Data"
-            
-            apps_path.mkdir(exist_ok=True)
-            userdata_path.mkdir(exist_ok=True)
-            
-            self.clean_old_versions(apps_path)
-            self.clean_update_cache(userdata_path)
-            self.lock_configure_ini(apps_path)
-            self.block_productinfo_xml(apps_path)
-            self.block_update_exe(userdata_path)
-            self.block_apps_update_exe(apps_path) # Added per user feedback
-            
-            self.log("\n🔍 Verifying locks...")
-            if self.verify_locks(capcut_path):
-                self.log("\n🎉 SUCCESS! All locks are active.")
-                messagebox.showinfo("Success", "CapCut updates have been successfully blocked!\n\nYou can now use your preferred version without forced updates.")
+            if self.block():
+                self.start_watch() # Keep the locks in place while the app stays open
+                self.post_dialog("info", "Success", "CapCut updates have been successfully blocked!\n\nYou can now use your preferred version without forced updates.")
             else:
-                self.log("\n⚠️ Warning: Some locks verified as missing.")
-                messagebox.showwarning("Warning", "Some locks might not be in place. Please check the log.")
+                self.post_dialog("warning", "Warning", "Some locks might not be in place. Please check the log.")
                 
+        except TaskCancelled:
+            raise # block() has logged where it stopped; the task records it as cancelled
         except Exception as e:
             self.log(f"❌ Critical Error: {e}")
-            messagebox.showerror("Error", str(e))
+            self.post_dialog("error", "Error", str(e))
         finally:
-            self.root.after(0, lambda: self.set_buttons_state("normal"))
+            self.ui_events.post(self.refresh_status) # Versions and snapshots may have changed
+            self.ui_events.post(self.set_buttons_state, "normal")
 
     def start_download(self):
         version_name = self.version_var.get()
         if messagebox.askyesno("Confirm Download", f"This will download the CapCut {version_name} installer.\n\nProceed?"):
-            self.set_buttons_state("disabled")
-            self.run_threaded(self.do_download_logic)
-        
-    def do_download_logic(self):
-        try:
-            version_name = self.version_var.get()
-            download_url = self.versions[version_name]
-            
-            self.log("-" * 50)
-            self.log(f"📥 Initiating Download for {version_name}...")
-            
-            # Extract simple filename from version string
-            clean_name = version_name.split(' ')[0].replace('.', '_')
-            downloads_dir = Path(os.path.expanduser("~")) / "Downloads"
-            installer_path = downloads_dir / f"capcut_{clean_name}_installer.exe"
-            
-            success = self.download_file_native(download_url, str(installer_path))
-            
-            if success:
-                 self.log("\n✅ Download successfully saved to Downloads folder.")
-                 self.log(f"   Path: {installer_path}")
-                 
-                 # Open explorer to the file
-                 subprocess.run(f'explorer /select,"{installer_path}"')
-                 
-                 messagebox.showinfo("Download Complete", f"Installer saved to your Downloads folder:\n\n{installer_path}\n\nPlease run it manually to install CapCut.")
-            else:
-                # The browser fallback logic is inside download_file_native, so if we are here and False, main error happened
-                pass
+            self.show_download_ui(True)
+            self.downloads.submit(version_name) # Runs alongside anything already queued
 
-        except Exception as e:
-            self.log(f"❌ Error during download: {e}")
-        finally:
-             self.root.after(0, lambda: self.set_buttons_state("normal"))
-
-    # --- Logic Implementations ---
-    
-    def kill_capcut_processes(self):
-        self.log("🔴 Closing any running CapCut processes...")
-        processes = ["CapCut.exe", "CapCutService.exe"]
-        for proc in processes:
-            try:
-                subprocess.run(["taskkill", "/F", "/IM", proc], capture_output=True, check=False)
-            except: pass
-        time.sleep(1)
+    def on_limit_change(self, event=None):
+        self.downloads.set_rate_limit(DOWNLOAD_LIMITS[self.limit_var.get()])
 
-    def download_file_native(self, url, save_path):
-        """Native Python download with Progress & Cancel"""
-        try:
-            import urllib.request
-            self.log(f"   Target: {Path(save_path).name}")
-            self.log("   Method: Native Python Download...")
-            
-            # Setup UI for download
-            self.cancel_download_flag = False
-            self.root.after(0, lambda: self.show_download_ui(True))
-            
-            # Work with a temporary file
-            temp_path = str(save_path) + ".part"
-            
-            headers = {'User-Agent': 'Mozilla/5.0'}
-            req = urllib.request.Request(url, headers=headers)
-            
-            with urllib.request.urlopen(req) as response:
-                total_size = int(response.info().get('Content-Length', 0))
-                block_size = 8192 # 8KB chunks
-                downloaded_size = 0
-                
-                with open(temp_path, 'wb') as file:
-                    while True:
-                        if self.cancel_download_flag:
-                            self.log("   ⚠️ Download cancelled by user.")
-                            file.close()
-                            os.remove(temp_path)
-                            return False
-                        
-                        buffer = response.read(block_size)
-                        if not buffer:
-                            break
-                        
-                        downloaded_size += len(buffer)
-                        file.write(buffer)
-                        
-                        # Update progress
-                        if total_size > 0:
-                            percent = (downloaded_size / total_size) * 100
-                            self.root.after(0, lambda p=percent: self.update_progress(p))
-
-            # Move temp file to final path
-            if os.path.exists(temp_path):
-                if os.path.exists(save_path):
-                    os.remove(save_path)
-                os.rename(temp_path, save_path)
-            
-            if os.path.exists(save_path) and os.path.getsize(save_path) > 1000000:
-                self.log("   ✅ Download successful.")
-                return True
-            else:
-                self.log("   ⚠️ Download finished but file seems too small.")
-                if os.path.exists(save_path): os.remove(save_path) # Cleanup
-                return False
+    # --- Download UI ---
 
-        except Exception as e:
-            self.log(f"   ⚠️ Native download error: {e}")
-            if 'temp_path' in locals() and os.path.exists(temp_path):
-                try: os.remove(temp_path)
-                except: pass
-            return False
-        finally:
-            self.root.after(0, lambda: self.show_download_ui(False))
-        
-        # Fallback only on error (not cancel)
-        self.log("   Switching to Browser Fallback...")
-        
-        try:
-            import webbrowser
-            self.log("   Opening direct download link in default browser...")
-            webbrowser.open(url)
-            messagebox.showinfo("Browser Download", "Automated download failed.\n\nWe have opened the direct download link in your browser.\n\nPlease save the file, then install it manually.")
-            return False 
-        except:
-            self.log("❌ Failed to open browser.")
-            return False
+    def on_job_update(self, job):
+        # Coalesced: only the newest state per job, and of the totals, reaches the widgets
+        self.ui_events.post_latest(('job', id(job)), self.update_job_row, job)
+        self.ui_events.post_latest('progress', self.update_progress)
 
     def show_download_ui(self, show):
         if show:
+            self.job_list.pack(fill=tk.X, pady=(8, 5))
             self.progress_bar.pack(fill=tk.X, pady=(0, 5))
-            self.btn_cancel.pack(fill=tk.X)
-            self.btn_download.config(state='disabled')
-            self.version_dropdown.config(state='disabled')
-            self.btn_block.config(state='disabled')
-            self.btn_restore.config(state='disabled')
+            self.speed_label.pack(anchor=tk.W, pady=(0, 5))
+            self.btn_cancel.config(state='normal')
+            self.btn_cancel.pack(fill=tk.X, pady=(0, 5))
+            self.btn_discard.config(state='normal')
+            self.btn_discard.pack(fill=tk.X)
         else:
-            self.progress_bar.stop()
             self.progress_bar.pack_forget()
             self.btn_cancel.pack_forget()
-            self.btn_download.config(state='normal')
-            self.version_dropdown.config(state='readonly')
-            self.btn_block.config(state='normal')
-            self.btn_restore.config(state='normal')
-
-    def update_progress(self, percent):
-        self.progress_bar['value'] = percent
-        self.root.update_idletasks()
+            self.btn_discard.pack_forget()
+
+    def update_job_row(self, job):
+        """Main-loop side of a coalesced job event"""
+        row = self.job_rows.get(job)
+        if row is None:
+            row = self.job_rows[job] = self.job_list.insert("", tk.END, text=job.label)
+        progress = format_bytes(job.done)
+        if job.total:
+            progress += f"  {job.done * 100 // job.total}%"
+        speed = f"{format_bytes(job.rate())}/s" if job.state == "running" else ""
+        self.job_list.item(row, values=(job.state, progress, speed))
+
+    def update_progress(self):
+        """Main-loop side of the coalesced totals event"""
+        stats = self.downloads.stats()
+        done, total, rate = stats["done"], stats["total"], stats["rate"]
+        self.progress_bar['value'] = (done / total) * 100 if total else 0
+        eta = format_eta((total - done) / rate if rate and total > done else None)
+        self.speed_label.config(text=f"{stats['running']} running  •  {stats['queued']} queued  •  {format_bytes(rate)}/s  •  ETA {eta}")
+        if self.downloads.idle():
+            self.downloads_finished()
+
+    def downloads_finished(self):
+        """The queue ran dry: report the installers that arrived since last time"""
+        self.show_download_ui(False)
+        self.speed_label.config(text="")
+        paths = [job.path for job in self.downloads.jobs if job.state == "done" and job not in self.reported_jobs]
+        self.reported_jobs.update(self.downloads.jobs)
+        if paths:
+            # Open explorer to the newest file
+            subprocess.run(f'explorer /select,"{paths[-1]}"')
+            listing = "\n".join(str(p) for p in paths)
+            messagebox.showinfo("Download Complete", f"Installer saved to your Downloads folder:\n\n{listing}\n\nPlease run it manually to install CapCut.")
+
+    def selected_jobs(self):
+        """Jobs selected in the list, or every unfinished one if none is"""
+        selected = set(self.job_list.selection())
+        jobs = [job for job, row in self.job_rows.items() if row in selected] or list(self.job_rows)
+        return [job for job in jobs if job.active]
 
     def cancel_action(self):
-        self.cancel_download_flag = True
-        self.btn_cancel.config(state='disabled') # Prevent double clicks
+        """Pause: stop workers but keep the .part file for resume"""
+        for job in self.selected_jobs():
+            job.cancel()
 
-    def clean_old_versions(self, apps_path):
-        self.log("🧹 Cleaning update artifacts...")
-        if not apps_path.exists(): return
-        
-        # Identify version folders (names like 1.5.0, 2.0.0)
-        version_dirs = []
-        for item in apps_path.iterdir():
-            if item.is_dir() and item.name[0].isdigit():
-                version_dirs.append(item)
-        
-        if not version_dirs:
-            self.log("   No version folders found.")
-            return
-
-        # Sort by name (simple way to find 'latest')
-        version_dirs.sort(key=lambda x: [int(p) for p in x.name.split('.') if p.isdigit()], reverse=True)
-        
-        # Protect the latest/active version, clean others
-        active_version = version_dirs[0]
-        self.log(f"   Protecting active version: {active_version.name}")
-        
-        for item in version_dirs[1:]:
-            try:
-                shutil.rmtree(item)
-                self.log(f"   Deleted old version: {item.name}")
-            except Exception as e:
-                 self.log(f"   Error cleaning {item.name}: {e}")
+    def discard_action(self):
+        """Stop workers and delete the partial download"""
+        for job in self.selected_jobs():
+            job.cancel(discard=True)
 
     # --- Restore & Reverse logic ---
 
-    def get_backup_dir(self):
-        return Path(os.getenv('LOCALAPPDATA')) / "CapCutUpdateBlocker" / "OriginalSettings"
-
-    def is_file_blocked(self, file_path):
-        """Check if file appears to be already blocked/modified"""
-        try:
-            if not file_path.exists(): return False
-            
-            # Check 1: File size (Blocked executables are usually 0 bytes or very small)
-            if file_path.suffix.lower() == '.exe':
-                # Real update.exe is usually > 10MB. 1MB is a safe lower bound.
-                if file_path.stat().st_size < 1024 * 1024: 
-                    return True
-            
-            # Check 2: Content checks for configure.ini
-            if file_path.name.lower() == 'configure.ini':
-                # If we can't read it, assume it might be locked/crypto, but let's try
-                try:
-                    with open(file_path, 'r', errors='ignore') as f:
-                        content = f.read()
-                        # If it has the blocked version string, it's ours
-                        if 'last_version=1.0.0.0' in content:
-                            return True
-                except: pass
-
-            # Check 3: ProductInfo.xml (Blocker creates empty file)
-            if file_path.name.lower() == 'productinfo.xml':
-                 if file_path.stat().st_size == 0: return True
-
-            return False
-        except:
-            return False
-
-    def backup_config(self, file_path):
-        """Save original file before we modify it"""
-        try:
-            if not file_path.exists(): return
-
-            # SAFETY CHECK: Don't backup if it looks like it's ALREADY blocked
-            if self.is_file_blocked(file_path):
-                self.log(f"   ⚠️ Skipping backup of {file_path.name} (appears already blocked)")
-                return
-
-            backup_dir = self.get_backup_dir()
-            backup_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Save as filename.bak in our special appdata folder
-            dest = backup_dir / f"{file_path.name}.bak"
-            if not dest.exists(): # Only backup the VERY first time
-                shutil.copy2(file_path, dest)
-                self.log(f"   Stored original: {file_path.name}")
-        except: pass
-
-    def remove_readonly(self, file_path):
-        """Remove Windows read-only/system/hidden attributes and unlock the file."""
-        try:
-            subprocess.run(
-                ["attrib", "-r", "-s", "-h", str(file_path)],
-                capture_output=True,
-                check=False,
-            )
-        except: pass
-        try:
-            os.chmod(file_path, 0o666)
-        except: pass
-
     def start_restore(self):
         if messagebox.askyesno("Confirm Restore", "This will UNLOCK and RESTORE CapCut to its original state.\n\nAre you sure you want to reverse the blocker?"):
+            snapshot_id = self.snapshot_ids.get(self.snapshot_var.get())
             self.set_buttons_state("disabled")
-            self.run_threaded(self.do_restore_logic)
+            self.run_task("restore", self.do_restore_logic, snapshot_id)
 
-    def do_restore_logic(self):
+    def do_restore_logic(self, snapshot_id=None):
         try:
-            self.log("-" * 50)
-            self.log("🔓 Reversing blocker...")
-            capcut_path = get_capcut_path()
-            if not capcut_path.exists():
-                self.log("❌ Error: CapCut installation not found.")
-                return
-
-            self.kill_capcut_processes()
-            
-            apps_path = capcut_path / "Apps"
-            dl_path = capcut_path / "User Data" / "Download"
-            
-            targets = [
-                (apps_path / "configure.ini", "configure.ini"),
-                (apps_path / "ProductInfo.xml", "ProductInfo.xml"),
-                (apps_path / "update.exe", "Apps/update.exe"),
-                (dl_path / "update.exe", "Download/update.exe")
-            ]
-
-            backup_dir = self.get_backup_dir()
-
-            for fp, name in targets:
-                if fp.exists():
-                    self.log(f"   Processing: {name}")
-                    try:
-                        # Force unlock using attrib for Windows stubborn files
-                        self.remove_readonly(fp)
-                    except Exception as e:
-                        self.log(f"   ⚠️ Could not unlock {name}: {e}")
-
-                    # Try to restore from backup
-                    bak_file = backup_dir / f"{fp.name}.bak"
-                    
-                    if bak_file.exists() and bak_file.stat().st_size > 0:
-                        try:
-                            shutil.copy2(bak_file, fp)
-                            self.log(f"   ✅ Restored original: {name}")
-                        except Exception as e:
-                            self.log(f"   ❌ Restore failed for {name}: {e}")
-                    else:
-                        # Logic for determining if it's a dummy file we should delete
-                        # If it's exactly 0 bytes (like our touched files), delete it
-                        try:
-                            if fp.stat().st_size == 0: 
-                                 self.remove_readonly(fp)
-                                 fp.unlink()
-                                 self.log(f"   🗑️ Removed dummy file: {name}")
-                            else:
-                                 self.log(f"   🔓 Unlocked existing file: {name}")
-                        except Exception as e:
-                            self.log(f"   ❌ Delete failed for {name}: {e}")
-
-            self.log("\n🎉 SUCCESS! Blocker has been reversed.")
-            messagebox.showinfo("Success", "Blocker reversed.\n\nCapCut is now back to its default state.")
+            if self.restore(snapshot_id):
+                self.post_dialog("info", "Success", "Blocker reversed.\n\nCapCut is now back to its default state.")
             
+        except TaskCancelled:
+            raise
         except Exception as e:
             self.log(f"❌ Error during restore: {e}")
-            messagebox.showerror("Error", str(e))
+            self.post_dialog("error", "Error", str(e))
         finally:
-            self.root.after(0, self.refresh_status)
-            self.root.after(0, lambda: self.set_buttons_state("normal"))
-
-    def clean_update_cache(self, userdata_path):
-        self.log("🗑️ Cleaning update cache folders...")
-        folders = ["Cache", "Shadow_Cache", "Smart_Crop", "update_cache"]
-        for f in folders:
-            fp = userdata_path / f
-            if fp.exists():
-                try: 
-                    shutil.rmtree(fp)
-                except: pass
-
-    def lock_configure_ini(self, apps_path):
-        self.log("🔒 Locking configure.ini...")
-        ini_path = apps_path / "configure.ini"
-        try:
-            self.backup_config(ini_path) # Backup original
-            if ini_path.exists():
-                with open(ini_path, 'r') as f: lines = f.readlines()
-                with open(ini_path, 'w') as f:
-                    for line in lines:
-                        if line.strip().startswith('last_version='): f.write('last_version=1.0.0.0\n')
-                        else: f.write(line)
-            else:
-                with open(ini_path, 'w') as f:
-                    f.write('[capcut]\nlast_version=1.0.0.0\n')
-            os.chmod(ini_path, 0o444)
-        except Exception as e: self.log(f"❌ Error: {e}")
-
-    def block_productinfo_xml(self, apps_path):
-        self.log("🛡️ Blocking ProductInfo.xml...")
-        xml_path = apps_path / "ProductInfo.xml"
+            self.ui_events.post(self.refresh_status)
+            self.ui_events.post(self.set_buttons_state, "normal")
+
+    def start_integrity_check(self):
+        self.set_buttons_state("disabled")
+        self.run_task("integrity", self.do_integrity_check)
+
+    def do_integrity_check(self):
         try:
-            self.backup_config(xml_path) # Backup original
-            if xml_path.exists():
-                os.chmod(xml_path, 0o666) # Ensure we can read/lock it
+            self.log("-" * 50)
+            self.log("🧬 Checking the installed files...")
+            report = self.check_integrity()
+            if report is None:
+                self.post_dialog("info", "Integrity", "No baseline for this version yet.\n\nBlock updates once to record one.")
+            elif report.ok:
+                self.post_dialog("info", "Integrity", f"All {report.files} files of CapCut {report.version} are unchanged.")
             else:
-                # Only create if it doesn't exist at all
-                xml_path.touch()
-            
-            os.chmod(xml_path, 0o444) # SET TO READ-ONLY BUT DO NOT DELETE CONTENTS
-        except Exception as e: self.log(f"❌ Error: {e}")
-
-    def block_update_exe(self, userdata_path):
-        self.log("⛔ Blocking Download/update.exe...")
-        dl_path = userdata_path / "Download"
-        dl_path.mkdir(exist_ok=True)
-        exe_path = dl_path / "update.exe"
+                self.post_dialog("warning", "Integrity", f"CapCut {report.version} changed since it was blocked:\n\n"
+                                 f"{len(report.modified)} modified, {len(report.added)} added, {len(report.removed)} removed.\n\n"
+                                 "See the log for the files. Reinstalling this version and blocking again is the safe fix.")
+        except TaskCancelled:
+            raise
+        except Exception as e:
+            self.log(f"❌ Error while checking: {e}")
+        finally:
+            self.ui_events.post(self.set_buttons_state, "normal")
+
+    def start_space_scan(self):
+        self.set_buttons_state("disabled")
+        self.run_task("space", self.do_space_scan)
+
+    def do_space_scan(self):
         try:
-            self.backup_config(exe_path) # Backup original
-            if exe_path.exists():
-                os.chmod(exe_path, 0o666)
-                exe_path.unlink()
-            exe_path.touch()
-            # Force set Read-Only using attrib (stronger than os.chmod)
-            try:
-                subprocess.run(["attrib", "+r", str(exe_path)], capture_output=True, check=False)
-            except: pass
-            os.chmod(exe_path, 0o444)
-            self.log("   Set to Read-Only (attrib +r).")
-        except Exception as e: self.log(f"❌ Error: {e}")
-
-    def block_apps_update_exe(self, apps_path):
-        self.log("⛔ Blocking Apps/update.exe...")
-        exe_path = apps_path / "update.exe"
+            targets = self.reclaimable()
+            total = sum(t["bytes"] for t in targets)
+            self.log(f"🧹 {format_bytes(total)} reclaimable in {len(targets)} folder(s).")
+            self.ui_events.post(self.show_space_dialog, targets)
+        except TaskCancelled:
+            raise
+        except Exception as e:
+            self.log(f"❌ Error while measuring: {e}")
+        finally:
+            self.ui_events.post(self.set_buttons_state, "normal")
+
+    def show_space_dialog(self, targets):
+        """Tick the caches and old versions to delete; unticked ones are also kept by Block"""
+        if not targets:
+            messagebox.showinfo("Free Up Space", "Nothing to clean: no update caches or old versions found.")
+            return
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Free Up Space")
+        dialog.configure(bg=self.bg_color)
+        dialog.transient(self.root)
+        frame = ttk.Frame(dialog, padding="20")
+        frame.pack(fill=tk.BOTH, expand=True)
+        ttk.Label(frame, text="Tick what to delete. Unticked items are also kept by Block.").pack(anchor=tk.W, pady=(0, 10))
+        choices = {}
+        for target in sorted(targets, key=lambda t: -t["bytes"]):
+            var = tk.BooleanVar(value=target["name"] not in self.keep_targets)
+            choices[target["name"]] = var
+            text = f"{target['name']}  —  {format_bytes(target['bytes'])}, {target['files']} files ({target['reason']})"
+            ttk.Checkbutton(frame, text=text, variable=var).pack(anchor=tk.W)
+
+        def clean():
+            chosen = [name for name, var in choices.items() if var.get()]
+            self.keep_targets = {name for name, var in choices.items() if not var.get()}
+            if self.keep_targets:
+                self.log(f"   Block will keep: {', '.join(sorted(self.keep_targets))}")
+            dialog.destroy()
+            if chosen:
+                self.set_buttons_state("disabled")
+                self.run_task("clean", self.do_clean_logic, chosen)
+
+        buttons = ttk.Frame(frame)
+        buttons.pack(fill=tk.X, pady=(15, 0))
+        ttk.Button(buttons, text="Clean Selected", command=clean).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(0, 5))
+        ttk.Button(buttons, text="Close", command=dialog.destroy).pack(side=tk.LEFT, expand=True, fill=tk.X)
+
+    def do_clean_logic(self, names):
         try:
-            self.backup_config(exe_path) # Backup original
-            if exe_path.exists():
-                os.chmod(exe_path, 0o666)
-                exe_path.unlink()
-            exe_path.touch()
-            try:
-                subprocess.run(["attrib", "+r", str(exe_path)], capture_output=True, check=False)
-            except: pass
-            os.chmod(exe_path, 0o444)
-            self.log("   Set to Read-Only (attrib +r).")
-        except Exception as e: self.log(f"❌ Error: {e}")
-
-    def verify_locks(self, capcut_path):
-        apps_path = capcut_path / "Apps"
-        dl_path = capcut_path / "User Data" / "Download"
-        checks = [
-            (apps_path / "configure.ini", "configure.ini"),
-            (apps_path / "ProductInfo.xml", "ProductInfo.xml"),
-            (dl_path / "update.exe", "Download/update.exe"),
-            (apps_path / "update.exe", "Apps/update.exe")
-        ]
-        all_good = True
-        for fp, name in checks:
-            status = "MISSING"
-            if fp.exists():
-                if "update.exe" in name:
-                     if not os.access(fp, os.W_OK):
-                         status = "Blocked"
-                     else:
-                         status = "Unblocked"
-                         all_good = False
-                elif not os.access(fp, os.W_OK): 
-                     status = "Locked"
-                else: 
-                     status = "Unlocked"
-                     all_good = False
-            else:
-                all_good = False
-            
-            symbol = "✅" if status in ["Locked", "Blocked"] else "❌"
-            self.log(f"   {symbol} {name}: {status}")
-            
-        return all_good
+            if self.clean(names):
+                report = self.wait_for_purge()
+                if report:
+                    self.post_dialog("info", "Free Up Space", f"{format_bytes(report.bytes)} freed.")
+        except TaskCancelled:
+            raise
+        except Exception as e:
+            self.log(f"❌ Error during cleanup: {e}")
+            self.post_dialog("error", "Error", str(e))
+        finally:
+            self.ui_events.post(self.refresh_status)
+            self.ui_events.post(self.set_buttons_state, "normal")
 
 if __name__ == "__main__":
     if not is_admin():
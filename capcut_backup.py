@@ -0,0 +1,228 @@
+"""Versioned, content-addressed backups of the files that block() modifies
+
+Backups used to be flat OriginalSettings/<name>.bak copies, so Apps/update.exe
+and User Data/Download/update.exe shared one slot and only the very first
+original was ever kept. Now every original is stored once as
+objects/<sha256[:2]>/<sha256>, and each block run that saves something writes
+snapshots/<id>.json: the CapCut root, and for each file its path relative to
+that root with size, mtime and digest. Identical content costs nothing extra,
+in any number of snapshots. Restore can return to any snapshot.
+"""
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from capcut_fs import LOCAL_FS
+from capcut_journal import atomic_write
+
+COPY_CHUNK = 1024 * 1024
+FICLONE = 0x40049409 # Linux ioctl: share extents with another file (btrfs, XFS)
+
+class UnknownItemError(KeyError):
+    """A snapshot, version or cleanup target asked for by name that does not exist"""
+    def __init__(self, kind, name):
+        super().__init__(kind, name)
+        self.kind = kind
+        self.name = name
+
+    def __str__(self):
+        return f"Unknown {self.kind}: {self.name}"
+
+def file_digest(path, fs=LOCAL_FS, chunk=COPY_CHUNK):
+    """SHA-256 of a file, read in chunk-sized blocks into one reused buffer"""
+    import hashlib
+    sha = hashlib.sha256()
+    buffer = bytearray(chunk)
+    view = memoryview(buffer)
+    with fs.open(path, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                return sha.hexdigest()
+            sha.update(view[:n])
+
+def clone_file(src, dest, durable=False, fs=LOCAL_FS):
+    """Write a copy of src to the new file dest the cheapest way available; return how
+
+    Tries a copy-on-write reflink, then an in-kernel copy_file_range, then
+    falls back to a chunked copy. Never hardlinks: CapCut and lock_ini both
+    rewrite these files in place, which would change a linked backup too.
+    durable fsyncs dest before returning. On a filesystem without real file
+    descriptors (fs.native false) it is always the chunked copy.
+    """
+    with fs.open(src, 'rb', buffering=0) as fsrc, fs.open(dest, 'wb', buffering=0) as fdst:
+        method = _copy_into(fsrc, fdst, fs.native)
+        if durable:
+            fs.fsync(fdst)
+        return method
+
+def _copy_into(fsrc, fdst, native=True):
+    if native and sys.platform.startswith('linux'):
+        try:
+            import fcntl
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            return "reflink"
+        except OSError:
+            pass
+    if native and hasattr(os, 'copy_file_range'):
+        size = os.fstat(fsrc.fileno()).st_size
+        offset = 0
+        try:
+            while offset < size:
+                n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), size - offset, offset, offset)
+                if not n:
+                    break
+                offset += n
+            if offset == size:
+                return "copy_file_range"
+        except OSError:
+            pass
+        fsrc.seek(0)
+        fdst.seek(0)
+        fdst.truncate()
+    buffer = bytearray(COPY_CHUNK)
+    view = memoryview(buffer)
+    while True:
+        n = fsrc.readinto(buffer)
+        if not n:
+            return "copy"
+        fdst.write(view[:n])
+
+class Snapshot:
+    """Files backed up during one run; written to the store by commit()"""
+    def __init__(self, store, root, label=None):
+        self.store = store
+        self.root = str(root)
+        self.created = time.time()
+        self.id = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.created)) + "-" + os.urandom(3).hex()
+        self.label = label
+        self.files = {} # relative path -> {sha256, size, mtime}
+        self.methods = {} # relative path -> how the object was stored
+
+    def add(self, path, relative):
+        """Store path; return how, or None if it matches the newest backup of relative"""
+        st = self.store.fs.stat(path)
+        digest, method = self.store.put(path)
+        latest = self.store.state(self.root).get(relative)
+        if latest and latest["sha256"] == digest:
+            return None
+        self.files[relative] = {"sha256": digest, "size": st.st_size, "mtime": st.st_mtime}
+        self.methods[relative] = method
+        return method
+
+    def commit(self):
+        """Write (or rewrite) the manifest if anything was added; return it or None"""
+        if not self.files:
+            return None
+        manifest = {"id": self.id, "root": self.root, "created": self.created, "files": self.files}
+        if self.label:
+            manifest["label"] = self.label
+        self.store.write_manifest(manifest)
+        return manifest
+
+class BackupStore:
+    """objects/ holds each distinct file once; snapshots/ holds one manifest per run
+
+    peers are objects/ folders of other stores on the same volume (the other
+    profiles in a fleet run). An object one of them already has is hardlinked
+    rather than copied; objects are read-only and never rewritten, so that is
+    safe where linking to a live file would not be.
+    """
+    def __init__(self, root, peers=(), fs=LOCAL_FS):
+        self.root = Path(root)
+        self.object_dir = self.root / "objects"
+        self.snapshot_dir = self.root / "snapshots"
+        self.peers = [Path(p) for p in peers]
+        self.fs = fs
+
+    def object_path(self, digest):
+        return self.object_dir / digest[:2] / digest
+
+    def put(self, path):
+        """Add a file's content; return (sha256, "dedup" | "hardlink" | clone_file method)"""
+        fs = self.fs
+        digest = file_digest(path, fs)
+        obj = self.object_path(digest)
+        if fs.exists(obj):
+            return digest, "dedup"
+        fs.mkdir(obj.parent, parents=True, exist_ok=True)
+        for peer in self.peers:
+            candidate = peer / digest[:2] / digest
+            if candidate != obj and fs.exists(candidate):
+                try:
+                    fs.link(candidate, obj)
+                    return digest, "hardlink"
+                except OSError:
+                    if fs.exists(obj):
+                        return digest, "dedup"
+        tmp = obj.with_name(f"{digest}.{os.urandom(4).hex()}.tmp")
+        try:
+            method = clone_file(path, tmp, durable=True, fs=fs)
+            fs.chmod(tmp, 0o444)
+            fs.replace(tmp, obj)
+        except OSError:
+            try: fs.unlink(tmp)
+            except OSError: pass
+            raise
+        return digest, method
+
+    def snapshot(self, root, label=None):
+        return Snapshot(self, root, label)
+
+    def write_manifest(self, manifest):
+        self.fs.mkdir(self.snapshot_dir, parents=True, exist_ok=True)
+        atomic_write(self.snapshot_dir / f"{manifest['id']}.json", json.dumps(manifest, indent=1).encode(), self.fs)
+
+    def snapshots(self, root=None):
+        """Manifests (oldest first), optionally only those for one CapCut root"""
+        manifests = []
+        try:
+            with self.fs.scandir(self.snapshot_dir) as it:
+                entries = list(it)
+        except FileNotFoundError:
+            return manifests
+        for entry in entries:
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                with self.fs.open(entry.path, 'r') as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if root is None or os.path.normcase(manifest.get("root", "")) == os.path.normcase(str(root)):
+                manifests.append(manifest)
+        manifests.sort(key=lambda m: (m.get("created", 0), m["id"]))
+        return manifests
+
+    def state(self, root, snapshot_id=None):
+        """{relative path: entry} as of snapshot_id (default: the newest)
+
+        Later snapshots override earlier ones per file, so restoring a snapshot
+        also restores files it did not touch to their state at that point.
+        """
+        files = {}
+        for manifest in self.snapshots(root):
+            files.update(manifest["files"])
+            if manifest["id"] == snapshot_id:
+                return files
+        if snapshot_id is not None:
+            raise UnknownItemError("snapshot", snapshot_id)
+        return files
+
+    def restore_file(self, entry, dest):
+        """Put an object back at dest (replacing it) with its original mtime"""
+        fs = self.fs
+        dest = Path(dest)
+        fs.mkdir(dest.parent, parents=True, exist_ok=True)
+        tmp = dest.with_name(f"{dest.name}.{os.urandom(4).hex()}.tmp")
+        try:
+            clone_file(self.object_path(entry["sha256"]), tmp, durable=True, fs=fs)
+            fs.utime(tmp, (entry["mtime"], entry["mtime"]))
+            fs.replace(tmp, dest)
+        except OSError:
+            try: fs.unlink(tmp)
+            except OSError: pass
+            raise
+        fs.fsync_dir(dest.parent)
@@ -0,0 +1,783 @@
+"""Reproducible benchmarks for block, restore, verify, purge and download
+
+    python capcut_bench.py [--scale small|medium|large] [--repeat N] [--only NAME ...]
+                           [--out FILE] [--compare OLD.json] [--keep DIR]
+
+Everything runs against synthetic CapCut trees in a temporary folder, with
+LOCALAPPDATA pointed there too, and with the platform backend replaced by
+BenchPlatform: no process is ever looked up or killed. So the suite runs on
+a Linux CI box as well as on Windows and never touches a real install.
+Installers come from a local HTTP server throttled by a TokenBucket.
+
+Results are printed as a table and written as JSON (stdout unless --out).
+With --compare, a benchmark whose median is more than REGRESSION_THRESHOLD
+slower than in the old file is flagged and the exit code is 1.
+"""
+import argparse
+import collections
+import hashlib
+import http.server
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import capcut_platform
+from capcut_fixtures import memory_scenario, write_version_exe
+from capcut_platform import PosixBackend, WindowsBackend
+
+MB = 1024 * 1024
+REGRESSION_THRESHOLD = 0.20
+STARTUP_IMPORT_RATIO = 0.85 # The CLI must import in at most this share of the GUI's import time
+HERE = Path(__file__).resolve().parent
+
+SCALES = {
+    # versions: folders under Apps; cache_files/cache_mb: User Data/Cache (sparse files);
+    # update_mb: each update.exe; payload_mb: installer served; profiles: fleet size;
+    # scenarios: in-memory block/restore runs; install_mb: active version hashed by integrity
+    "small": dict(versions=5, version_files=20, cache_files=2000, cache_mb=256, update_mb=16,
+                  payload_mb=32, rate_mb=0, profiles=20, requests=300, scenarios=1000, install_mb=256),
+    "medium": dict(versions=20, version_files=50, cache_files=20000, cache_mb=2048, update_mb=64,
+                   payload_mb=128, rate_mb=0, profiles=100, requests=1000, scenarios=5000, install_mb=1024),
+    "large": dict(versions=40, version_files=100, cache_files=100000, cache_mb=8192, update_mb=200,
+                  payload_mb=300, rate_mb=0, profiles=200, requests=2000, scenarios=20000, install_mb=4096),
+}
+
+# --- Synthetic trees ---
+
+def write_blob(path, size, seed=b"capcut"):
+    """Write size bytes of incompressible-looking data (1 MB block, repeated)"""
+    block = hashlib.sha256(seed).digest() * (MB // 32)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as f:
+        remaining = size
+        while remaining > 0:
+            f.write(block[:min(remaining, MB)])
+            remaining -= MB
+
+def build_tree(root, versions=5, version_files=20, cache_files=2000, cache_mb=256, update_mb=16, exe_mb=0, **_):
+    """A CapCut folder: version folders under Apps, a cache tree and real-sized update.exe files
+
+    Every version folder has a CapCut.exe reporting its folder name, exe_mb
+    large; configure.ini launches the newest.
+
+    Cache files are sparse, so a multi-GB cache costs inodes and metadata
+    work, not disk space. Returns the root as a Path.
+    """
+    root = Path(root)
+    apps = root / "Apps"
+    names = [f"5.{i // 10}.{i % 10}.{1000 + i}" for i in range(versions)]
+    for name in names:
+        write_version_exe(apps / name / "CapCut.exe", name, exe_mb * MB)
+        for n in range(version_files):
+            write_blob(apps / name / "bin" / f"module{n}.dll", 32 * 1024, name.encode())
+    (apps / "configure.ini").write_text(f"[capcut]\nlast_version={names[-1]}\nchannel=release\n")
+    (apps / "ProductInfo.xml").write_text(f'<product version="{names[-1]}"/>\n')
+    write_blob(apps / "update.exe", update_mb * MB, b"apps-update")
+    write_blob(root / "User Data" / "Download" / "update.exe", update_mb * MB, b"download-update")
+    cache = root / "User Data" / "Cache"
+    size = cache_mb * MB // max(1, cache_files)
+    for n in range(cache_files):
+        path = cache / f"d{n // 100:04d}" / f"f{n:06d}.bin"
+        if n % 100 == 0:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'wb') as f:
+            f.truncate(size)
+    return root
+
+def tree_size(root):
+    files = total = 0
+    for folder, _, names in os.walk(root):
+        for name in names:
+            files += 1
+            total += os.lstat(os.path.join(folder, name)).st_size
+    return files, total
+
+# --- Stubbed platform ---
+
+class BenchPlatform(PosixBackend if os.name != 'nt' else WindowsBackend):
+    """The real attribute calls, but no process lookup or kill; counts every call
+
+    calls is what the old attrib/taskkill backend would have spawned as
+    processes, one per call.
+    """
+    def __init__(self):
+        super().__init__()
+        self.calls = collections.Counter()
+
+    def set_readonly(self, path):
+        self.calls["set_readonly"] += 1
+        return super().set_readonly(path)
+
+    def clear_attributes(self, path):
+        self.calls["clear_attributes"] += 1
+        return super().clear_attributes(path)
+
+    def is_readonly(self, path):
+        self.calls["is_readonly"] += 1
+        return super().is_readonly(path)
+
+    def find_processes(self, names):
+        self.calls["find_processes"] += 1
+        return []
+
+    def kill_processes(self, names, timeout=None):
+        self.calls["kill_processes"] += 1
+        return []
+
+def install_bench_platform():
+    """Make every CapCutBlocker in this process use a BenchPlatform"""
+    capcut_platform._backend = BenchPlatform()
+    return capcut_platform._backend
+
+# --- Local installer server ---
+
+class InstallerServer:
+    """Serves one payload with Range, ETag and keep-alive, optionally throttled
+
+    rate caps all connections together (bytes per second); after
+    collapse_after bytes the server slows to a trickle, like a failing mirror.
+    connections counts accepted TCP connections.
+    """
+    def __init__(self, payload, rate=None, collapse_after=None):
+        from capcut_queue import TokenBucket
+        self.payload = payload
+        self.sha256 = hashlib.sha256(payload).hexdigest()
+        self.bucket = TokenBucket(rate)
+        self.collapse_after = collapse_after
+        self.sent = 0
+        self.connections = 0
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                server.connections += 1
+                super().setup()
+
+            def do_GET(self):
+                size = len(server.payload)
+                match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range") or "")
+                if match:
+                    start, end = int(match.group(1)), int(match.group(2) or size - 1)
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+                else:
+                    start, end = 0, size - 1
+                    self.send_response(200)
+                self.send_header("ETag", '"bench"')
+                self.send_header("Content-Length", str(end - start + 1))
+                self.end_headers()
+                view = memoryview(server.payload)
+                try:
+                    while start <= end:
+                        count = min(256 * 1024, end - start + 1)
+                        if server.collapse_after is not None and server.sent > server.collapse_after:
+                            count = min(count, 4096)
+                            time.sleep(0.1)
+                        server.bucket.consume(count)
+                        self.wfile.write(view[start:start + count])
+                        start += count
+                        server.sent += count
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/CapCut_bench_installer.exe"
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def make_payload(size):
+    block = os.urandom(MB)
+    return block * (size // MB) + block[:size % MB]
+
+# --- Harness ---
+
+class BenchSkipped(Exception):
+    """Raised by a benchmark whose precondition does not hold here (not a failure)"""
+
+class Bench:
+    """Workspace, parameters and results of one benchmark run"""
+    def __init__(self, workdir, params, repeat):
+        self.workdir = Path(workdir)
+        self.params = params
+        self.repeat = repeat
+        self.results = {}
+        self.failures = [] # [(benchmark, reason)]: checks that make the run exit with 1
+        os.environ["LOCALAPPDATA"] = str(self.workdir / "LocalAppData")
+        self.platform = install_bench_platform()
+        self._count = 0
+
+    def fresh_dir(self, name):
+        self._count += 1
+        path = self.workdir / f"{self._count:03d}-{name}"
+        path.mkdir(parents=True)
+        return path
+
+    def reset_appdata(self):
+        shutil.rmtree(os.environ["LOCALAPPDATA"], ignore_errors=True)
+
+    def blocker(self, root):
+        from capcut_core import CapCutBlocker
+        return CapCutBlocker(root, self.platform)
+
+    def time_runs(self, name, run, setup=None, **extra):
+        """Time run(state) self.repeat times, each after a fresh setup(); record median and min
+
+        run may return a dict of metrics; the last run's is kept.
+        """
+        runs, metrics = [], {}
+        for _ in range(self.repeat):
+            state = setup() if setup else None
+            calls = sum(self.platform.calls.values())
+            started = time.perf_counter()
+            metrics = run(state) or {}
+            runs.append(time.perf_counter() - started)
+            metrics.setdefault("platform_calls", sum(self.platform.calls.values()) - calls)
+        self.results[name] = dict(median=statistics.median(runs), min=min(runs),
+                                  runs=[round(r, 6) for r in runs], **metrics, **extra)
+        return self.results[name]
+
+    def skip(self, name, reason):
+        self.results[name] = {"skipped": reason}
+
+    def fail(self, name, reason):
+        self.failures.append((name, reason))
+        self.results.setdefault(name, {})["failed"] = reason
+
+def quiet_logging():
+    """Keep the blockers' log lines out of the benchmark output"""
+    import logging
+    from capcut_core import logger
+    logger.handlers[:] = [logging.NullHandler()]
+    logger.propagate = False
+
+# --- Benchmarks ---
+
+def bench_block(b):
+    def setup():
+        b.reset_appdata()
+        return b.blocker(build_tree(b.fresh_dir("block"), **b.params))
+    def run(blocker):
+        ok = blocker.block()
+        blocker.wait_for_purge()
+        return {"ok": ok, "plan_steps": len(blocker.last_plan)}
+    b.time_runs("block", run, setup)
+
+def bench_block_noop(b):
+    blocker = b.blocker(build_tree(b.fresh_dir("noop"), **b.params))
+    blocker.block()
+    blocker.wait_for_purge()
+    b.time_runs("block_noop", lambda _: {"ok": blocker.block(), "plan_steps": len(blocker.last_plan)})
+
+def bench_verify(b):
+    blocker = b.blocker(build_tree(b.fresh_dir("verify"), **b.params))
+    blocker.block()
+    blocker.wait_for_purge()
+    b.time_runs("verify", lambda _: {"ok": blocker.verify_locks(blocker.capcut_path)})
+
+def bench_restore(b):
+    def setup():
+        b.reset_appdata()
+        blocker = b.blocker(build_tree(b.fresh_dir("restore"), **b.params))
+        blocker.block()
+        blocker.wait_for_purge()
+        return blocker
+    b.time_runs("restore", lambda blocker: {"ok": blocker.restore()}, setup)
+
+def bench_purge(b):
+    """The cache cleaners: old versions and update caches moved to the trash, then deleted"""
+    from capcut_purge import empty_trash, move_to_trash
+    def setup():
+        root = build_tree(b.fresh_dir("purge"), **b.params)
+        trash = root / ".blocker_trash"
+        blocker = b.blocker(root)
+        _, olds = blocker.find_versions(root / "Apps")
+        for path in olds + [root / "User Data" / "Cache"]:
+            move_to_trash(path, trash)
+        return trash
+    def run(trash):
+        report = empty_trash(trash)
+        return {"files": report.files, "bytes": report.bytes, "failures": len(report.failures)}
+    b.time_runs("purge", run, setup)
+
+def bench_recover(b):
+    """Finishing a block whose lock steps were all left open by a crash"""
+    from capcut_journal import Journal
+    from capcut_rules import LOCK_RULES
+    def setup():
+        b.reset_appdata()
+        blocker = b.blocker(build_tree(b.fresh_dir("recover"), **b.params))
+        Journal(blocker.get_journal_path()).begin("block", blocker.capcut_path,
+                                                  [{"kind": "lock", "rule": rule.name} for rule in LOCK_RULES])
+        return blocker
+    def run(blocker):
+        steps = blocker.recover()
+        return {"steps": steps, "ok": blocker.verify_locks(blocker.capcut_path)}
+    b.time_runs("recover", run, setup)
+
+def bench_crash(b):
+    """Kill a block at several points in a child process; recovery must converge"""
+    delays = [0.0, 0.005, 0.01, 0.02, 0.04, 0.08]
+    converged, interrupted, recover_times = 0, 0, []
+    for delay in delays:
+        b.reset_appdata()
+        root = build_tree(b.fresh_dir("crash"), **b.params)
+        child = subprocess.Popen([sys.executable, str(Path(__file__).resolve()), "--child-block", str(root)],
+                                 stdout=subprocess.PIPE, env=dict(os.environ))
+        child.stdout.readline() # "ready": imports done, block about to start
+        time.sleep(delay)
+        child.kill()
+        child.wait()
+        blocker = b.blocker(root)
+        started = time.perf_counter()
+        steps = blocker.recover()
+        ok = blocker.block() # Anything the journal did not cover is planned again
+        interrupted += bool(steps or blocker.last_plan)
+        blocker.wait_for_purge()
+        recover_times.append(time.perf_counter() - started)
+        converged += bool(ok)
+    b.results["crash_recovery"] = dict(median=statistics.median(recover_times), min=min(recover_times),
+                                       runs=[round(t, 6) for t in recover_times],
+                                       kill_points=len(delays), interrupted=interrupted,
+                                       converged=converged)
+
+def bench_inventory(b):
+    """Version scan of Apps: every CapCut.exe parsed (cold), then all from the cache (warm)
+
+    The downgrade case must keep the folder configure.ini launches, not the
+    highest-numbered one.
+    """
+    from capcut_inventory import VersionInventory
+    root = build_tree(b.fresh_dir("inventory"), **dict(b.params, version_files=0, cache_files=0, exe_mb=150))
+    cache = b.workdir / "inventory.json"
+    def cold_setup():
+        try: cache.unlink()
+        except FileNotFoundError: pass
+        return VersionInventory(cache)
+    def run(inventory):
+        installation = inventory.scan(root / "Apps")
+        return {"versions": len(installation.versions), "parsed": inventory.reads, "exe_mb": 150}
+    b.time_runs("inventory_cold", run, cold_setup)
+    b.time_runs("inventory_warm", run, lambda: VersionInventory(cache))
+    oldest = min(p.name for p in (root / "Apps").iterdir() if p.is_dir())
+    (root / "Apps" / "configure.ini").write_text(f"[capcut]\nlast_version={oldest}\n")
+    active = VersionInventory().scan(root / "Apps").active
+    b.results["inventory_warm"]["downgrade_kept"] = active is not None and active.name == oldest
+
+def bench_space(b):
+    """Reclaimable-space report: cold (no size cache), warm, and after one new cache file"""
+    blocker = b.blocker(build_tree(b.fresh_dir("space"), **b.params))
+    sizes = Path(blocker.get_dir_size_cache_path())
+    def cold_setup():
+        try: sizes.unlink()
+        except FileNotFoundError: pass
+    def run(_):
+        targets = blocker.reclaimable()
+        return {"targets": len(targets), "bytes": sum(t["bytes"] for t in targets),
+                "files": sum(t["files"] for t in targets)}
+    b.time_runs("space_cold", run, cold_setup)
+    warm = b.time_runs("space_warm", run)
+    cache = blocker.capcut_path / "User Data" / "Cache"
+    (next(cache.iterdir()) / "new.bin").write_bytes(b"x" * 4096)
+    warm["sees_new_file"] = run(None)["bytes"] == warm["bytes"] + 4096
+
+def bench_integrity(b):
+    """Hash the active version folder: cold on 1 and on INTEGRITY_WORKERS threads, then a cached re-check
+
+    Afterwards one file is modified, one added and one removed; the check
+    must report exactly those.
+    """
+    from capcut_integrity import INTEGRITY_WORKERS, HashCache, hash_tree
+    b.reset_appdata()
+    root = build_tree(b.fresh_dir("integrity"), **b.params)
+    blocker = b.blocker(root)
+    active = blocker.scan_installation().active.path
+    parts = 16
+    for n in range(parts):
+        write_blob(active / "lib" / f"part{n:02d}.dll", b.params["install_mb"] * MB // parts, f"part{n}".encode())
+    for name, workers in (("integrity_serial", 1), ("integrity_cold", INTEGRITY_WORKERS)):
+        def run(_, workers=workers):
+            hashes = hash_tree(active, workers, HashCache())
+            return {"workers": workers, "files": len(hashes.files), "mb": hashes.bytes // MB}
+        b.time_runs(name, run)
+
+    blocker.block()
+    blocker.wait_for_purge()
+    def warm(_):
+        report = blocker.check_integrity()
+        return {"ok": report.ok, "hashed": report.hashed, "cached": report.cached}
+    result = b.time_runs("integrity_warm", warm)
+    write_blob(active / "lib" / "part00.dll", MB, b"swapped by the updater")
+    write_blob(active / "lib" / "new.dll", 1024)
+    (active / "bin" / "module1.dll").unlink()
+    report = blocker.check_integrity()
+    result["detects"] = {"modified": report.modified, "added": report.added, "removed": report.removed}
+
+def bench_memory(b):
+    """block, verify, restore and verify again for every scenario of the in-memory matrix"""
+    from capcut_core import CapCutBlocker
+    count = b.params["scenarios"]
+    def run(_):
+        wrong = []
+        for n in range(count):
+            fs, root, expected = memory_scenario(n)
+            blocker = CapCutBlocker(root, platform=fs)
+            ok = blocker.block()
+            blocker.wait_for_purge()
+            blocker.restore()
+            restored = all(fs.exists(path) and fs.read_bytes(path) == data and not fs.is_readonly(path)
+                           for path, data in expected["restored"].items())
+            if ok != expected["block"] or not restored:
+                wrong.append(n)
+        return {"scenarios": count, "wrong": len(wrong), "first_wrong": wrong[:5]}
+    result = b.time_runs("memory_scenarios", run)
+    result["per_scenario_us"] = round(result["median"] / count * 1e6, 1)
+
+def bench_fleet(b):
+    from capcut_fleet import run_fleet
+    count = b.params["profiles"]
+    small = dict(versions=2, version_files=5, cache_files=20, cache_mb=1, update_mb=2)
+    def setup():
+        base = b.fresh_dir("fleet")
+        return [build_tree(base / f"user{n:03d}" / "AppData" / "Local" / "CapCut", **small) for n in range(count)]
+    def run(roots):
+        _, summary = run_fleet(roots, "block")
+        return {"profiles": summary["roots"], "ok": summary["ok"], "workers": summary["workers"]}
+    b.time_runs("fleet_block", run, setup)
+
+def bench_watchdog(b):
+    """Tamper with configure.ini and time how long until it is locked again"""
+    from capcut_rules import LOCK_RULES, rule_drift
+    from capcut_watch import LockWatchdog
+    blocker = b.blocker(build_tree(b.fresh_dir("watch"), **b.params))
+    blocker.block()
+    blocker.wait_for_purge()
+    rule = LOCK_RULES[0]
+    path = rule.path(blocker.capcut_path)
+    watchdog = LockWatchdog(blocker)
+    if watchdog.watcher.name == "polling":
+        watchdog.stop()
+        raise BenchSkipped("no native change notifications; polling would only time POLL_INTERVAL")
+    watchdog.start()
+    time.sleep(0.2)
+    latencies = []
+    try:
+        for _ in range(max(5, b.repeat)):
+            b.platform.clear_attributes(path)
+            started = time.perf_counter()
+            path.write_text("[capcut]\nlast_version=9.9.9.9\n")
+            while rule_drift(rule, path, os.stat(path)) and time.perf_counter() - started < 10:
+                time.sleep(0.001)
+            latencies.append(time.perf_counter() - started)
+            time.sleep(0.1)
+    finally:
+        watchdog.stop()
+        watchdog.thread.join(5)
+    b.results["watchdog_relock"] = dict(median=statistics.median(latencies), min=min(latencies), max=round(max(latencies), 6),
+                                        runs=[round(t, 6) for t in latencies], watcher=watchdog.watcher.name,
+                                        relocks=watchdog.relocks)
+
+def bench_download(b):
+    from capcut_catalog import VersionEntry
+    from capcut_http import default_pool
+    payload = make_payload(b.params["payload_mb"] * MB)
+    server = InstallerServer(payload, rate=b.params["rate_mb"] * MB or None)
+    try:
+        entry = VersionEntry("bench", [server.url], len(payload), server.sha256)
+        dest = b.fresh_dir("download") / "installer.exe"
+        blocker = b.blocker(b.workdir)
+        callbacks = [0]
+        channel = ui_channel()
+        def on_progress(done, total):
+            callbacks[0] += 1
+            if channel:
+                channel.post_latest("progress", lambda *args: None, done, total)
+        blocker.on_progress = on_progress
+        def setup():
+            for path in (dest, Path(str(dest) + ".part"), Path(str(dest) + ".part.json")):
+                try: path.unlink()
+                except FileNotFoundError: pass
+            callbacks[0] = 0
+            server.connections = 0
+            return dict(default_pool().stats)
+        def run(before):
+            started = time.perf_counter()
+            stop = threading.Event()
+            drainer = None
+            if channel:
+                channel.posted = channel.delivered = 0
+                drainer = threading.Thread(target=drain_frames, args=(channel, stop), daemon=True)
+                drainer.start()
+            ok = blocker.download_file_native(entry, str(dest))
+            seconds = time.perf_counter() - started
+            stop.set()
+            if drainer:
+                drainer.join()
+            after = default_pool().stats
+            metrics = {"ok": ok, "mb_per_s": round(len(payload) / MB / seconds, 1),
+                       "progress_callbacks": callbacks[0], "connections": server.connections,
+                       "requests": after["requests"] - before["requests"], "reused": after["reused"] - before["reused"]}
+            if channel:
+                metrics["ui_updates"] = channel.delivered
+            return metrics
+        b.time_runs("download", run, setup, payload_mb=b.params["payload_mb"], rate_mb=b.params["rate_mb"])
+    finally:
+        server.close()
+
+def bench_failover(b):
+    """The first mirror collapses a quarter of the way in; time to a complete, verified file"""
+    from capcut_catalog import VersionEntry
+    payload = make_payload(min(b.params["payload_mb"], 64) * MB)
+    bad = InstallerServer(payload, collapse_after=len(payload) // 4)
+    good = InstallerServer(payload)
+    try:
+        entry = VersionEntry("bench", [bad.url, good.url], len(payload), bad.sha256)
+        blocker = b.blocker(b.workdir)
+        # The good mirror answers probes more slowly so the collapsing one is tried first
+        good_get = good.httpd.RequestHandlerClass.do_GET
+        good.httpd.RequestHandlerClass.do_GET = lambda self: (time.sleep(0.02), good_get(self))
+        dest = b.fresh_dir("failover") / "installer.exe"
+        started = time.perf_counter()
+        ok = blocker.download_file_native(entry, str(dest))
+        seconds = time.perf_counter() - started
+    finally:
+        bad.close()
+        good.close()
+    b.results["download_failover"] = dict(median=seconds, min=seconds, runs=[round(seconds, 6)], ok=ok,
+                                          payload_mb=len(payload) // MB)
+
+def bench_http_pool(b):
+    """Many small ranged requests with keep-alive reuse against one new connection each"""
+    from capcut_http import ConnectionPool
+    server = InstallerServer(make_payload(8 * MB))
+    count = b.params["requests"]
+    try:
+        for name, pool in (("http_pooled", ConnectionPool()), ("http_unpooled", ConnectionPool(max_idle=0))):
+            def run(_):
+                server.connections = 0
+                for n in range(count):
+                    start = (n * 16 * 1024) % (8 * MB)
+                    with pool.request(server.url, {"Range": f"bytes={start}-{start + 16 * 1024 - 1}"}, 10) as response:
+                        response.read()
+                return {"requests": count, "connections": server.connections}
+            b.time_runs(name, run)
+    finally:
+        server.close()
+
+def bench_startup(b):
+    """Cold start of the CLI (versions --json), and the import of the CLI against the GUI module
+
+    Bytecode is cached in the workspace, as in an installed copy, so the
+    import times measure what is imported rather than compiling it. The run
+    fails unless the CLI imports in at most STARTUP_IMPORT_RATIO of the GUI's time.
+    """
+    env = {k: v for k, v in os.environ.items() if k != "PYTHONDONTWRITEBYTECODE"}
+    env["PYTHONPYCACHEPREFIX"] = str(b.fresh_dir("pycache"))
+    timed_import = "import time; started = time.perf_counter(); import {}; print(time.perf_counter() - started)"
+    for module in ("capcut_cli", "capcut"):
+        subprocess.run([sys.executable, "-c", f"import {module}"], cwd=HERE, env=env, capture_output=True)
+
+    def run(_):
+        result = subprocess.run([sys.executable, str(HERE / "capcut_cli.py"), "--json", "versions"], cwd=HERE, env=env, capture_output=True)
+        return {"exit_code": result.returncode}
+    b.time_runs("startup_cli", run)
+
+    for name, module in (("import_cli", "capcut_cli"), ("import_gui", "capcut")):
+        seconds = []
+        def run(_):
+            result = subprocess.run([sys.executable, "-c", timed_import.format(module)], cwd=HERE, env=env,
+                                    capture_output=True, text=True, check=True)
+            seconds.append(float(result.stdout))
+        b.time_runs(name, run)
+        # The import alone, without the interpreter's own start
+        b.results[name].update(median=statistics.median(seconds), min=min(seconds), runs=[round(s, 6) for s in seconds])
+
+    cli, gui = b.results["import_cli"]["median"], b.results["import_gui"]["median"]
+    b.results["import_cli"]["share_of_gui"] = round(cli / gui, 2)
+    if cli > gui * STARTUP_IMPORT_RATIO:
+        b.fail("import_cli", f"CLI import {cli * 1000:.1f} ms is not under {STARTUP_IMPORT_RATIO:.0%} of the GUI's {gui * 1000:.1f} ms")
+
+def bench_trace(b):
+    """Cost of a span and a counter with tracing off and on, then a traced block"""
+    import capcut_trace
+    calls = 100000
+    def run(_):
+        for _ in range(calls):
+            with capcut_trace.span("step"):
+                pass
+            capcut_trace.count("bytes", 1)
+        return {"calls": calls}
+    capcut_trace.disable()
+    off = b.time_runs("trace_off", run)
+    capcut_trace.enable()
+    try:
+        on = b.time_runs("trace_on", run)
+        capcut_trace.disable()
+        capcut_trace.enable()
+        blocker = b.blocker(build_tree(b.fresh_dir("trace"), **b.params))
+        blocker.block()
+        blocker.wait_for_purge()
+        summary = capcut_trace.tracer().summary()
+    finally:
+        capcut_trace.disable()
+    off["ns_per_call"] = round(off["median"] / calls * 1e9)
+    on["ns_per_call"] = round(on["median"] / calls * 1e9)
+    on["block_spans"] = sum(s["count"] for s in summary["spans"])
+    on["block_counters"] = summary["counters"]
+
+def ui_channel():
+    """The GUI's UIEventChannel, if tkinter can be imported here"""
+    try:
+        from capcut import UIEventChannel
+    except ImportError:
+        return None
+    return UIEventChannel()
+
+def drain_frames(channel, stop):
+    from capcut import UI_FRAME_MS
+    while not stop.wait(UI_FRAME_MS / 1000):
+        channel.drain()
+    channel.drain()
+
+BENCHMARKS = collections.OrderedDict([
+    ("block", bench_block),
+    ("block_noop", bench_block_noop),
+    ("verify", bench_verify),
+    ("restore", bench_restore),
+    ("purge", bench_purge),
+    ("recover", bench_recover),
+    ("crash", bench_crash),
+    ("inventory", bench_inventory),
+    ("space", bench_space),
+    ("integrity", bench_integrity),
+    ("memory", bench_memory),
+    ("fleet", bench_fleet),
+    ("watchdog", bench_watchdog),
+    ("download", bench_download),
+    ("failover", bench_failover),
+    ("http_pool", bench_http_pool),
+    ("startup", bench_startup),
+    ("trace", bench_trace),
+])
+
+# --- Reporting ---
+
+def git_revision():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True)
+        return result.stdout.strip() or None
+    except OSError:
+        return None
+
+def format_table(results, baseline=None):
+    lines = [f"{'Benchmark':<20} {'Median':>10} {'Min':>10}  Details"]
+    for name, r in results.items():
+        if "skipped" in r:
+            lines.append(f"{name:<20} {'skipped':>10} {'':>10}  {r['skipped']}")
+            continue
+        if "median" not in r:
+            lines.append(f"{name:<20} {'failed':>10} {'':>10}  {r['failed']}")
+            continue
+        details = ", ".join(f"{k}={v}" for k, v in r.items() if k not in ("median", "min", "runs"))
+        line = f"{name:<20} {r['median'] * 1000:>8.1f}ms {r['min'] * 1000:>8.1f}ms  {details}"
+        old = (baseline or {}).get(name, {})
+        if "median" in old and old["median"] > 0:
+            change = r["median"] / old["median"] - 1
+            line += f"  [{change:+.0%}{' REGRESSION' if change > REGRESSION_THRESHOLD else ''}]"
+        lines.append(line)
+    return "\n".join(lines)
+
+def regressions(results, baseline):
+    """Names whose median got more than REGRESSION_THRESHOLD slower than in baseline"""
+    slower = []
+    for name, r in results.items():
+        old = baseline.get(name, {})
+        if "median" in r and "median" in old and old["median"] > 0:
+            if r["median"] / old["median"] - 1 > REGRESSION_THRESHOLD:
+                slower.append(name)
+    return slower
+
+def child_block(root):
+    """Entry point of the crash benchmark's child: block root until killed"""
+    install_bench_platform()
+    quiet_logging()
+    from capcut_core import CapCutBlocker
+    blocker = CapCutBlocker(root, capcut_platform._backend)
+    print("ready", flush=True)
+    blocker.block()
+    blocker.wait_for_purge()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="capcut_bench", description="Benchmark block, restore, verify, purge and download on synthetic data.")
+    parser.add_argument("--scale", choices=list(SCALES), default="small")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark (default: 3)")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="run just these")
+    parser.add_argument("--out", help="write the JSON results here instead of stdout")
+    parser.add_argument("--compare", help="earlier results JSON; exit 1 on a regression")
+    parser.add_argument("--keep", help="build the trees here and leave them afterwards")
+    parser.add_argument("--child-block", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child_block:
+        child_block(args.child_block)
+        return 0
+
+    params = SCALES[args.scale]
+    workdir = Path(args.keep) if args.keep else Path(tempfile.mkdtemp(prefix="capcut-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    bench = Bench(workdir, params, max(1, args.repeat))
+    quiet_logging()
+    try:
+        for name in args.only or BENCHMARKS:
+            print(f"running {name}...", file=sys.stderr, flush=True)
+            try:
+                BENCHMARKS[name](bench)
+            except BenchSkipped as e:
+                bench.skip(name, str(e))
+            except Exception as e:
+                bench.fail(name, f"crashed with {type(e).__name__}: {e}")
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "revision": git_revision(),
+                 "python": platform.python_version(), "platform": platform.platform(),
+                 "cpus": os.cpu_count(), "scale": args.scale, "repeat": bench.repeat, "params": params},
+        "results": bench.results,
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)["results"]
+    print(format_table(bench.results, baseline), file=sys.stderr)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n")
+    else:
+        print(text)
+    for name, reason in bench.failures:
+        print(f"FAILED {name}: {reason}", file=sys.stderr)
+    if bench.failures or (baseline is not None and regressions(bench.results, baseline)):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Installer catalog: every downloadable version with its mirrors, size and SHA-256
+
+The built-in catalog lists the official CDN only. A JSON manifest can replace
+it, for example to put an office mirror first:
+
+    {
+      "versions": [
+        {
+          "name": "v2.0.0 (Legacy Stable)",
+          "size": 301234567,
+          "sha256": "9f2c...",
+          "mirrors": [
+            "http://mirror.office.lan/capcut/CapCut_2_0_0_357_capcutpc_0.exe",
+            "https://lf16-capcut.faceulv.com/obj/capcutpc-packages-us/packages/CapCut_2_0_0_357_capcutpc_0.exe"
+          ]
+        }
+      ]
+    }
+
+size and sha256 are optional. When present, mirrors serving a different size
+are skipped and a download whose digest does not match is rejected.
+"""
+import json
+import os
+from pathlib import Path
+
+CATALOG_ENV = "CAPCUT_CATALOG"
+CATALOG_FILE_NAME = "versions.json"
+
+# Version Map
+VERSIONS = {
+    "v1.0.5 (Ultra Legacy)": "https://lf16-capcut.faceulv.com/obj/capcutpc-packages-us/packages/CapCut_1_0_5_80_capcutpc_0.exe",
+    "v1.5.0": "https://lf16-capcut.faceulv.com/obj/capcutpc-packages-us/packages/CapCut_1_5_0_230_capcutpc_0.exe",
+    "v2.0.0 (Legacy Stable)": "https://lf16-capcut.faceulv.com/obj/capcutpc-packages-us/packages/CapCut_2_0_0_357_capcutpc_0.exe",
+    "v3.0.0 (Split)": "https://lf16-capcut.faceulv.com/obj/capcutpc-packages-us/packages/CapCut_split_3_0_0_1015_capcutpc_0.exe",
+    "v4.0.0 (Stable)": "https://lf16-capcut.faceulv.com/obj/capcutpc-packages-us/packages/CapCut_4_0_0_1539_capcutpc_0_creatortool.exe",
+    "v5.0.0 (Latest Supported)": "https://lf16-capcut.faceulv.com/obj/capcutpc-packages-us/packages/CapCut_5_0_0_1886_capcutpc_0_creatortool.exe"
+}
+
+class VersionEntry:
+    """One downloadable installer"""
+    def __init__(self, name, mirrors, size=None, sha256=None):
+        if not mirrors:
+            raise ValueError(f"{name}: no mirrors listed")
+        self.name = name
+        self.mirrors = list(mirrors)
+        self.size = size
+        self.sha256 = sha256.lower() if sha256 else None
+
+    @property
+    def url(self):
+        return self.mirrors[0]
+
+    def as_dict(self):
+        return {"name": self.name, "mirrors": self.mirrors, "size": self.size, "sha256": self.sha256}
+
+def builtin_catalog():
+    return {name: VersionEntry(name, [url]) for name, url in VERSIONS.items()}
+
+def load_catalog(path=None):
+    """Return {name: VersionEntry} from a JSON manifest, or the built-in catalog
+
+    Raises ValueError if the manifest exists but is malformed.
+    """
+    if path is None:
+        return builtin_catalog()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        catalog = {}
+        for item in data["versions"]:
+            entry = VersionEntry(item["name"], item["mirrors"], item.get("size"), item.get("sha256"))
+            catalog[entry.name] = entry
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid catalog {path}: {e}") from e
+    if not catalog:
+        raise ValueError(f"Invalid catalog {path}: no versions")
+    return catalog
+
+def default_catalog_path(app_dir=None):
+    """$CAPCUT_CATALOG, else versions.json in the app data folder if there is one"""
+    if os.getenv(CATALOG_ENV):
+        return Path(os.getenv(CATALOG_ENV))
+    if app_dir:
+        candidate = Path(app_dir) / CATALOG_FILE_NAME
+        if candidate.exists():
+            return candidate
+    return None
@@ -0,0 +1,302 @@
+"""Headless command line for CapCut Update Blocker
+
+    python capcut_cli.py block   [--path DIR] [--json] [--dry-run] [--keep NAME ...] [--rebaseline]
+    python capcut_cli.py restore [--path DIR] [--json] [--snapshot ID]
+    python capcut_cli.py snapshots [--path DIR] [--json]
+    python capcut_cli.py verify  [--path DIR] [--json] [--integrity]
+    python capcut_cli.py space   [--path DIR] [--json]
+    python capcut_cli.py clean   [NAME ...] [--path DIR] [--json]
+    python capcut_cli.py watch   [--path DIR] [--json] [--duration SECONDS]
+    python capcut_cli.py download VERSION [VERSION ...] [--dest DIR] [--parallel N] [--limit RATE] [--json] [--catalog FILE]
+    python capcut_cli.py versions [--json]
+    python capcut_cli.py probe VERSION [--json]
+    python capcut_cli.py fleet block|verify|restore [--root DIR ...] [--users-dir DIR] [--workers N] [--json]
+
+Exit codes: 0 success, 1 locks missing, files changed since the integrity
+baseline or download failed (for block --dry-run: changes pending), 2
+usage error, 3 unexpected error, 130 stopped with Ctrl+C. The first Ctrl+C
+stops at the next step boundary; a second one aborts at once. Never
+imports tkinter.
+
+Every command also takes --trace FILE (default: %CAPCUT_TRACE%): each step
+is timed and the counters (bytes deleted, files touched, subprocesses,
+bytes downloaded) kept; FILE gets a Chrome trace and a summary table is
+printed (with --json, returned as "trace").
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+from capcut_core import CapCutBlocker, UnknownItemError, format_bytes, setup_logging
+from capcut_queue import DOWNLOAD_QUEUE_WORKERS, DownloadQueue, parse_rate
+from capcut_tasks import TaskCancelled, TaskRunner, checkpoint, current_task
+from capcut_trace import TRACE_ENV, disable, enable, format_summary
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_ERROR = 3
+EXIT_INTERRUPTED = 130
+RECOVER_COMMANDS = ("block", "restore", "watch", "fleet") # The commands that change the protected files
+CTRL_C_POLL = 0.2 # Windows only delivers Ctrl+C to the main thread between waits
+
+class RecordingHandler(logging.Handler):
+    """Keeps log lines so --json can return them instead of printing"""
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record).strip("\n"))
+
+def resolve_version(versions, name):
+    """Accept a full version label or just its number ("2.0.0", "v2.0.0")"""
+    if name in versions:
+        return name
+    wanted = name if name.startswith("v") else "v" + name
+    for label in versions:
+        if label.split(" ")[0] == wanted:
+            return label
+    raise UnknownItemError("version", name)
+
+def format_download_table(jobs):
+    """One line per job plus the combined throughput"""
+    lines = []
+    for job in jobs:
+        seconds = job["seconds"] or 0
+        line = f"{job['version']:<28} {job['state']:<9} {format_bytes(job['done']):>10} in {seconds:6.1f} s  {format_bytes(job['average_rate'])}/s"
+        lines.append(line + (f"  {job['path']}" if job["path"] else ""))
+    wall = max((job["seconds"] or 0 for job in jobs), default=0)
+    total = sum(job["done"] for job in jobs)
+    if len(jobs) > 1 and wall:
+        lines.append(f"{len(jobs)} downloads, {format_bytes(total)} at {format_bytes(total / wall)}/s combined")
+    return "\n".join(lines)
+
+def format_space_table(targets):
+    """One line per cleanup target, biggest first, plus the total"""
+    lines = []
+    for target in sorted(targets, key=lambda t: -t["bytes"]):
+        lines.append(f"{target['name']:<20} {format_bytes(target['bytes']):>10} {target['files']:>8} files  {target['reason']}")
+    lines.append(f"{'Total':<20} {format_bytes(sum(t['bytes'] for t in targets)):>10} {sum(t['files'] for t in targets):>8} files")
+    return "\n".join(lines)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="capcut_cli", description="Block or restore CapCut auto-updates without the GUI.")
+    parser.add_argument("--json", action="store_true", help="print a single JSON result on stdout")
+    parser.add_argument("--trace", metavar="FILE", default=os.environ.get(TRACE_ENV) or None,
+                        help="write a Chrome trace of every step to FILE and print a timing summary")
+    parser.add_argument("--path", help="CapCut folder (default: %%LOCALAPPDATA%%\\CapCut)")
+    parser.add_argument("--catalog", help="JSON version catalog with mirrors (default: %%CAPCUT_CATALOG%%, then versions.json in the app data folder)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    block = commands.add_parser("block", help="apply every lock that is not already in place")
+    block.add_argument("--dry-run", action="store_true", help="only print the planned changes")
+    block.add_argument("--keep", nargs="+", default=[], metavar="NAME", help="cache or version folder to leave in place (see space)")
+    block.add_argument("--rebaseline", action="store_true", help="replace the integrity baseline of the active version with its current files")
+    restore = commands.add_parser("restore", help="unlock and restore the original files")
+    restore.add_argument("--snapshot", help="backup snapshot to restore (default: the newest; see snapshots)")
+    commands.add_parser("snapshots", help="list the backup snapshots restore can return to")
+    verify = commands.add_parser("verify", help="report lock status without changing anything")
+    verify.add_argument("--integrity", action="store_true", help="also hash the active version folder and compare it with its baseline")
+    commands.add_parser("space", help="show how much space each cache and old version folder takes")
+    clean = commands.add_parser("clean", help="delete caches or old version folders without blocking")
+    clean.add_argument("names", nargs="*", metavar="NAME", help="targets listed by space (default: all of them)")
+    watch = commands.add_parser("watch", help="block, then re-lock any file CapCut rewrites until Ctrl+C")
+    watch.add_argument("--duration", type=float, help="stop after this many seconds")
+    download = commands.add_parser("download", help="download one or more legacy installers")
+    download.add_argument("version", nargs="+", help='e.g. "2.0.0" or "v2.0.0 (Legacy Stable)"; earlier ones start first')
+    download.add_argument("--dest", help="target folder (default: ~/Downloads)")
+    download.add_argument("--parallel", type=int, default=DOWNLOAD_QUEUE_WORKERS, help=f"downloads run at once (default: {DOWNLOAD_QUEUE_WORKERS})")
+    download.add_argument("--limit", type=parse_rate, help="total bandwidth cap, e.g. 800K or 5M per second (default: none)")
+    commands.add_parser("versions", help="list downloadable versions")
+    probe = commands.add_parser("probe", help="time every mirror of a version without downloading")
+    probe.add_argument("version")
+    fleet = commands.add_parser("fleet", help="run block, verify or restore across many CapCut folders")
+    fleet.add_argument("action", choices=["block", "verify", "restore"])
+    fleet.add_argument("--root", action="append", default=[], help="CapCut folder to include (repeatable)")
+    fleet.add_argument("--users-dir", help="discover <profile>\\AppData\\Local\\CapCut under this folder (default: C:\\Users)")
+    fleet.add_argument("--workers", type=int, default=8, help="profiles processed in parallel (default: 8)")
+    return parser
+
+def run_command(blocker, args):
+    """Run one command; return (exit_code, result dict)"""
+    result = {"command": args.command, "capcut_path": str(blocker.capcut_path)}
+    if args.command == "block":
+        blocker.keep_targets = set(args.keep)
+        ok = blocker.block(args.dry_run)
+        if ok and args.rebaseline and not args.dry_run:
+            blocker.record_integrity_baseline(force=True)
+        result["plan"] = [op.as_dict() for op in blocker.last_plan]
+        if args.dry_run:
+            result["dry_run"] = True
+        else:
+            result["checks"] = dict(blocker.last_checks)
+        report = blocker.wait_for_purge()
+        if report:
+            result["purge"] = report.as_dict()
+    elif args.command == "restore":
+        ok = blocker.restore(args.snapshot)
+        result["snapshot"] = args.snapshot
+    elif args.command == "snapshots":
+        ok = True
+        result["snapshots"] = blocker.list_snapshots()
+        if not args.json:
+            for manifest in result["snapshots"]:
+                created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(manifest["created"]))
+                print(f"{manifest['id']}  {created}  {', '.join(sorted(manifest['files']))}")
+    elif args.command == "verify":
+        ok = blocker.verify_locks(blocker.capcut_path)
+        result["checks"] = dict(blocker.last_checks)
+        installation = blocker.scan_installation()
+        result["installed"] = installation.as_dict()
+        if installation.active:
+            blocker.log(f"   📦 Active version: {installation.active.label} ({installation.reason}), "
+                        f"{len(installation.others)} other folder(s)")
+        if args.integrity:
+            report = blocker.check_integrity()
+            result["integrity"] = report.as_dict() if report else None
+            ok = ok and (report is None or report.ok)
+    elif args.command == "space":
+        ok = True
+        result["targets"] = blocker.reclaimable()
+        if not args.json:
+            print(format_space_table(result["targets"]))
+    elif args.command == "clean":
+        result["cleaned"] = blocker.clean(args.names or None)
+        report = blocker.wait_for_purge() if result["cleaned"] else None
+        ok = not (report and report.failures)
+        if report:
+            result["purge"] = report.as_dict()
+    elif args.command == "watch":
+        from capcut_watch import LockWatchdog
+        ok = blocker.block()
+        watchdog = LockWatchdog(blocker)
+        current_task().token.on_cancel(watchdog.stop) # Ctrl+C is how a watch normally ends
+        watchdog.run(args.duration)
+        result.update(watcher=watchdog.watcher.name, wakeups=watchdog.wakeups, relocks=watchdog.relocks)
+    elif args.command == "download":
+        labels = [resolve_version(blocker.versions, name) for name in args.version]
+        queue = DownloadQueue(blocker, args.parallel, args.limit)
+        queue.submit_many([(label, len(labels) - index) for index, label in enumerate(labels)], args.dest)
+        current_task().token.on_cancel(queue.cancel) # Pause: every .part file is kept for resume
+        queue.wait()
+        checkpoint()
+        jobs = [job.as_dict() for job in queue.jobs]
+        ok = all(job["state"] == "done" for job in jobs)
+        result.update(jobs=jobs, rate_limit=args.limit)
+        if len(jobs) == 1:
+            result.update(version=jobs[0]["version"], path=jobs[0]["path"])
+        if not args.json:
+            print(format_download_table(jobs))
+    elif args.command == "fleet":
+        from capcut_fleet import discover_capcut_roots, format_fleet_table, run_fleet
+        roots = [Path(r) for r in args.root]
+        if args.users_dir or not roots:
+            roots += discover_capcut_roots(args.users_dir)
+        results, summary = run_fleet(roots, args.action, args.workers)
+        ok = summary["roots"] > 0 and summary["ok"] == summary["roots"]
+        result.pop("capcut_path")
+        result.update(summary=summary, results=results)
+        if not args.json:
+            print(format_fleet_table(results, summary))
+    elif args.command == "probe":
+        from capcut_core import probe_mirrors
+        label = resolve_version(blocker.versions, args.version)
+        results = probe_mirrors(blocker.versions[label].mirrors)
+        ok = any("error" not in r for r in results)
+        result.update(version=label, mirrors=results)
+        if not args.json:
+            for r in results:
+                timing = r["error"] if "error" in r else f"{r['seconds'] * 1000:.0f} ms, {r['info']['size']} bytes"
+                print(f"{r['url']}  {timing}")
+    else:
+        ok = True
+        result["versions"] = {label: entry.as_dict() for label, entry in blocker.versions.items()}
+        if not args.json:
+            for label in blocker.versions:
+                print(label)
+    result["ok"] = ok
+    return (EXIT_OK if ok else EXIT_FAILED), result
+
+def wait_for_task(task, blocker):
+    """Return the task's result; the first Ctrl+C cancels it at its next step"""
+    try:
+        while not task.wait(CTRL_C_POLL):
+            pass
+    except KeyboardInterrupt:
+        blocker.log("⏹️ Stopping after the current step (Ctrl+C again to abort)...")
+        task.cancel()
+        while not task.wait(CTRL_C_POLL):
+            pass
+    return task.get()
+
+def write_trace(path, result, quiet):
+    """Export the trace to path and report its summary (into result when quiet)"""
+    tracer = disable()
+    summary = tracer.summary()
+    try:
+        tracer.export(path)
+        summary["file"] = str(path)
+    except OSError as e:
+        summary["error"] = str(e)
+    result["trace"] = summary
+    if not quiet:
+        print(format_summary(summary), file=sys.stderr)
+        print(f"Trace written to {path}" if "file" in summary else f"error: could not write trace: {summary['error']}",
+              file=sys.stderr)
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.trace:
+        enable()
+    try:
+        blocker = CapCutBlocker(args.path, catalog=args.catalog)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    if args.json:
+        sink = RecordingHandler()
+    else:
+        sink = logging.StreamHandler(sys.stderr)
+        if args.command == "fleet":
+            sink.setLevel(logging.WARNING) # The table replaces per-profile chatter
+    setup_logging(sink, blocker.get_log_dir())
+
+    aborted = False
+    try:
+        if args.command in RECOVER_COMMANDS:
+            try:
+                blocker.recover() # Finish whatever a killed earlier run left half done
+            except Exception as e:
+                blocker.log(f"⚠️ Could not finish the interrupted run: {e}")
+        task = TaskRunner(1).submit(args.command, run_command, blocker, args)
+        code, result = wait_for_task(task, blocker)
+        result["timing"] = task.as_dict()
+    except UnknownItemError as e:
+        code, result = EXIT_USAGE, {"command": args.command, "ok": False, "error": str(e)}
+    except TaskCancelled:
+        code, result = EXIT_INTERRUPTED, {"command": args.command, "ok": False, "error": "Interrupted"}
+    except KeyboardInterrupt:
+        aborted = True
+        code, result = EXIT_INTERRUPTED, {"command": args.command, "ok": False, "error": "Aborted"}
+    except Exception as e:
+        blocker.log(f"❌ Critical Error: {e}")
+        code, result = EXIT_ERROR, {"command": args.command, "ok": False, "error": str(e)}
+
+    if args.trace and not aborted:
+        write_trace(args.trace, result, args.json)
+    if args.json:
+        result["log"] = sink.lines
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    elif "error" in result:
+        print(f"error: {result['error']}", file=sys.stderr)
+    logging.shutdown()
+    if aborted:
+        os._exit(code) # Do not wait for the task thread; the journal finishes its run next time
+    return code
+
+if __name__ == "__main__":
+    sys.exit(main())
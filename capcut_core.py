@@ -0,0 +1,1430 @@
+"""CapCut Update Blocker core: block, restore, verify and download without a GUI
+
+Kept free of tkinter, ctypes, shutil and the HTTP stack at import time so the
+CLI starts fast; those are imported only by the functions that need them.
+"""
+import os
+import sys
+import time
+import threading
+import json
+import logging
+from pathlib import Path
+
+from capcut_backup import BackupStore, UnknownItemError
+from capcut_catalog import builtin_catalog, default_catalog_path, load_catalog
+from capcut_integrity import REPORT_LIMIT, BaselineStore, HashCache, IntegrityReport, hash_tree
+from capcut_inventory import VersionInventory
+from capcut_journal import Journal, atomic_write
+from capcut_platform import get_platform_backend
+from capcut_purge import TRASH_DIR_NAME, empty_trash, move_to_trash
+from capcut_tasks import TaskCancelled, checkpoint, current_task
+from capcut_trace import count, span, tracer
+from capcut_rules import BLOCKED_VERSION, LOCK_RULES, StatCache, looks_blocked, rule_drift, rule_status
+from capcut_usage import DirSizeCache, disk_usage
+
+logger = logging.getLogger("capcut_blocker")
+
+# --- Core Helper Functions ---
+
+def is_admin():
+    """Check if script is running with admin privileges"""
+    try:
+        import ctypes
+        return ctypes.windll.shell32.IsUserAnAdmin()
+    except:
+        return False
+
+def run_as_admin():
+    """Relaunch script with admin privileges"""
+    if sys.platform == 'win32':
+        import ctypes
+        ctypes.windll.shell32.ShellExecuteW(
+            None, "runas", sys.executable, " ".join(sys.argv), None, 1
+        )
+
+def get_capcut_path():
+    """Get CapCut installation path"""
+    localappdata = os.getenv('LOCALAPPDATA')
+    if not localappdata:
+        return Path("C:/") 
+    capcut_path = Path(localappdata) / "CapCut"
+    return capcut_path
+
+def format_bytes(count):
+    for unit in ("B", "KB", "MB", "GB"):
+        if count < 1024 or unit == "GB":
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024
+
+def add_ini_line(lines, entry):
+    """configure.ini lines (bytes, with endings) plus entry under [capcut], adding the section if needed"""
+    lines = list(lines)
+    newline = next((line[len(line.rstrip(b"\r\n")):] for line in lines if line.endswith(b"\n")), os.linesep.encode())
+    section = next((n for n, line in enumerate(lines) if line.strip().lower() == b"[capcut]"), None)
+    if section is None:
+        if lines and not lines[-1].endswith(b"\n"):
+            lines[-1] += newline
+        lines.append(b"[capcut]" + newline)
+        section = len(lines) - 1
+    elif not lines[section].endswith(b"\n"):
+        lines[section] += newline
+    lines.insert(section + 1, entry + newline)
+    return b"".join(lines)
+
+UPDATE_CACHE_FOLDERS = ["Cache", "Shadow_Cache", "Smart_Crop", "update_cache"]
+
+class PlannedOp:
+    """One step of a block plan: what to do, to which path, and why"""
+    def __init__(self, action, path, reason, rule=None):
+        self.action = action # mkdir | kill | trash | purge | lock
+        self.path = path
+        self.reason = reason
+        self.rule = rule
+
+    def __str__(self):
+        return f"{self.action:<5} {self.path}  ({self.reason})"
+
+    def as_dict(self):
+        return {"action": self.action, "path": str(self.path), "reason": self.reason}
+
+# --- Logging ---
+
+LOG_FILE_BYTES = 1024 * 1024
+LOG_FILE_COUNT = 5
+LOG_BUFFER_RECORDS = 50 # File writes are batched; warnings flush immediately
+
+def level_for(message):
+    """Map the emoji-prefixed log messages onto standard logging levels"""
+    text = message.lstrip()
+    if text.startswith("❌"):
+        return logging.ERROR
+    if text.startswith("⚠️"):
+        return logging.WARNING
+    return logging.INFO
+
+def setup_logging(sink, log_dir=None):
+    """Attach the display sink and, if possible, a buffered rotating audit log"""
+    logger.setLevel(logging.INFO)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+    sink.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(sink)
+
+    if log_dir:
+        try:
+            from logging.handlers import MemoryHandler, RotatingFileHandler
+            Path(log_dir).mkdir(parents=True, exist_ok=True)
+            file_handler = RotatingFileHandler(
+                Path(log_dir) / "blocker.log", maxBytes=LOG_FILE_BYTES,
+                backupCount=LOG_FILE_COUNT, encoding="utf-8")
+            file_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(threadName)s: %(message)s"))
+            logger.addHandler(MemoryHandler(
+                LOG_BUFFER_RECORDS, flushLevel=logging.WARNING, target=file_handler))
+        except OSError as e:
+            logger.warning(f"⚠️ File logging disabled: {e}")
+
+    return sink
+
+# --- Download Engine ---
+
+DOWNLOAD_HEADERS = {'User-Agent': 'Mozilla/5.0'}
+DOWNLOAD_SEGMENTS = 4
+MIN_SEGMENT_SIZE = 4 * 1024 * 1024 # Smaller files are not worth splitting
+DOWNLOAD_TIMEOUT = 30
+STATE_SAVE_INTERVAL = 1.0 # Seconds between resume-state checkpoints
+MIN_BLOCK_SIZE = 64 * 1024
+MAX_BLOCK_SIZE = 4 * 1024 * 1024
+BLOCK_TARGET_SECONDS = 0.1 # Keeps each read short enough for a prompt pause
+
+PROBE_TIMEOUT = 5 # A mirror that cannot answer a one-byte request in this long is skipped
+FAILOVER_WINDOW = 5.0 # Seconds of throughput judged at a time
+FAILOVER_RATIO = 0.2 # A window under this share of the best window so far counts as collapsed
+FAILOVER_MIN_RATE = 32 * 1024 # ...as does any window under this many bytes per second
+
+class DownloadCancelled(Exception):
+    """Raised inside download workers when the user pauses or discards"""
+
+class DownloadRestart(Exception):
+    """Raised when the remote file changed and a partial download cannot be resumed"""
+
+class DownloadProgress:
+    """Thread-safe byte counter shared by all download workers
+
+    throttle, if given, is called with each chunk's size before it is counted
+    and may block; that is how a bandwidth cap slows the workers down. It
+    returns the seconds it waited, and throttled counts the chunks it held up.
+    """
+    def __init__(self, total=0, callback=None, throttle=None):
+        self.total = total
+        self.done = 0
+        self.throttled = 0
+        self.callback = callback
+        self.throttle = throttle
+        self._lock = threading.Lock()
+
+    def add(self, count):
+        waited = self.throttle(count) if self.throttle else 0
+        with self._lock:
+            if waited:
+                self.throttled += 1
+            self.done += count
+            done = self.done
+        if self.callback:
+            self.callback(done, self.total)
+
+class ThroughputGuard:
+    """Decides when the current mirror's throughput has collapsed
+
+    check() is called from every download worker between reads. Each
+    FAILOVER_WINDOW it compares the window's rate with the best one seen;
+    once tripped it stays tripped so all workers stop. A window in which the
+    bandwidth cap held anything up is not judged: the cap, not the mirror,
+    set its rate.
+    """
+    def __init__(self, progress, window=FAILOVER_WINDOW):
+        self.progress = progress
+        self.window = window
+        self.started = time.monotonic()
+        self.start_done = progress.done
+        self.start_throttled = progress.throttled
+        self.best_rate = 0.0
+        self.tripped = False
+        self._lock = threading.Lock()
+
+    def check(self):
+        now = time.monotonic()
+        if self.tripped or now - self.started < self.window:
+            return self.tripped
+        with self._lock:
+            elapsed = now - self.started
+            if elapsed >= self.window:
+                if self.progress.throttled == self.start_throttled:
+                    rate = (self.progress.done - self.start_done) / elapsed
+                    self.tripped = rate < max(FAILOVER_MIN_RATE, self.best_rate * FAILOVER_RATIO)
+                    self.best_rate = max(self.best_rate, rate)
+                self.started, self.start_done = now, self.progress.done
+                self.start_throttled = self.progress.throttled
+        return self.tripped
+
+class DownloadState:
+    """Resume metadata stored next to a .part file as <name>.part.json
+
+    Each segment is [start, end, next] where [start, next) is already on disk.
+    """
+    def __init__(self, temp_path, url, total_size, etag=None, last_modified=None, segments=None):
+        self.path = str(temp_path) + ".json"
+        self.url = url
+        self.total_size = total_size
+        self.etag = etag
+        self.last_modified = last_modified
+        self.segments = segments or []
+        self._lock = threading.Lock()
+        self._saved_at = 0.0
+
+    @classmethod
+    def load(cls, temp_path):
+        try:
+            with open(str(temp_path) + ".json", 'r') as f:
+                data = json.load(f)
+            return cls(temp_path, data['url'], data['total_size'], data.get('etag'),
+                       data.get('last_modified'), [list(s) for s in data['segments']])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    @property
+    def validator(self):
+        """Strong validator for If-Range (weak ETags are not allowed there)"""
+        if self.etag and not self.etag.startswith('W/'):
+            return self.etag
+        return self.last_modified
+
+    def matches(self, url, info):
+        """True when a saved partial download can be continued against info"""
+        return (self.url == url and self.total_size == info['size'] and self.validator is not None
+                and self.etag == info['etag'] and self.last_modified == info['last_modified'])
+
+    def completed(self):
+        return sum(nxt - start for start, end, nxt in self.segments)
+
+    def switch(self, url, info):
+        """Continue the same file from another mirror, using its validators"""
+        with self._lock:
+            self.url = url
+            self.etag = info['etag']
+            self.last_modified = info['last_modified']
+
+    def advance(self, index, count):
+        with self._lock:
+            self.segments[index][2] += count
+        if time.monotonic() - self._saved_at >= STATE_SAVE_INTERVAL:
+            self.save()
+
+    def save(self):
+        with self._lock:
+            data = {
+                'url': self.url,
+                'total_size': self.total_size,
+                'etag': self.etag,
+                'last_modified': self.last_modified,
+                'segments': [list(s) for s in self.segments],
+            }
+            self._saved_at = time.monotonic()
+            tmp = self.path + ".tmp"
+            with open(tmp, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+
+class OrderedHasher:
+    """SHA-256 of a file that is written out of order by several download segments
+
+    Bytes that land exactly at the hash frontier are digested straight from the
+    download buffer, so a single-stream download is hashed with no extra read.
+    Data written ahead of the frontier is read back once at the end.
+    """
+    def __init__(self, path):
+        import hashlib
+        self.path = path
+        self.sha = hashlib.sha256()
+        self.frontier = 0
+        self._lock = threading.Lock()
+
+    def feed(self, offset, buffer):
+        with self._lock:
+            if offset == self.frontier:
+                self.sha.update(buffer)
+                self.frontier += len(buffer)
+
+    def hexdigest(self):
+        with self._lock:
+            with open(self.path, 'rb') as f:
+                f.seek(self.frontier)
+                while True:
+                    chunk = f.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    self.sha.update(chunk)
+                    self.frontier += len(chunk)
+            return self.sha.hexdigest()
+
+def discard_partial(temp_path):
+    """Delete a .part file together with its resume state"""
+    for path in (str(temp_path), str(temp_path) + ".json"):
+        try: os.remove(path)
+        except FileNotFoundError: pass
+
+def probe_download(url, timeout=DOWNLOAD_TIMEOUT):
+    """Return size, range support and validators using a one-byte Range request"""
+    from capcut_http import open_url
+    with open_url(url, dict(DOWNLOAD_HEADERS, Range='bytes=0-0'), timeout) as response:
+        info = {
+            'size': int(response.headers.get('Content-Length', 0) or 0),
+            'ranges': False,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+        if response.status == 206:
+            # Content-Range: bytes 0-0/123456
+            total = response.headers.get('Content-Range', '').rpartition('/')[2]
+            if total.isdigit():
+                info.update(size=int(total), ranges=True)
+            response.read() # The one byte; leaves the connection clean for the first segment
+        # Otherwise the server ignored the Range header and is sending the whole body
+        return info
+
+def probe_mirrors(urls, timeout=PROBE_TIMEOUT):
+    """Probe every mirror at once; return [{url, seconds, info} or {url, error}], fastest first"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    def probe(url):
+        started = time.perf_counter()
+        try:
+            info = probe_download(url, timeout)
+        except Exception as e:
+            return {'url': url, 'error': str(e)}
+        return {'url': url, 'seconds': time.perf_counter() - started, 'info': info}
+
+    with ThreadPoolExecutor(max_workers=max(1, len(urls))) as pool:
+        results = list(pool.map(probe, urls))
+    return sorted(results, key=lambda r: r.get('seconds', float('inf')))
+
+def split_ranges(total_size, segments):
+    """Split [0, total_size) into contiguous inclusive (start, end) byte ranges"""
+    segments = max(1, min(segments, total_size // MIN_SEGMENT_SIZE))
+    step = -(-total_size // segments)
+    return [(start, min(start + step, total_size) - 1) for start in range(0, total_size, step)]
+
+class AdaptiveBlockSize:
+    """Read size that tracks measured throughput
+
+    Grows while reads fill quickly and shrinks when one read takes too long,
+    so each read lasts about BLOCK_TARGET_SECONDS and cancel stays responsive.
+    """
+    def __init__(self, minimum=MIN_BLOCK_SIZE, maximum=MAX_BLOCK_SIZE):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.size = minimum
+
+    def update(self, requested, received, elapsed):
+        if received == requested and elapsed < BLOCK_TARGET_SECONDS / 2:
+            self.size = min(self.size * 2, self.maximum)
+        elif elapsed > BLOCK_TARGET_SECONDS * 2:
+            self.size = max(self.size // 2, self.minimum)
+
+def copy_stream(response, file, cancelled, offset=0, length=None, consumers=()):
+    """Copy response into file through one reused buffer; return bytes copied
+
+    Chunks are read into a preallocated bytearray and handed to file.write()
+    and every consumer(offset, chunk) as the same memoryview slice. Consumers
+    must not keep the view. readinto1() returns after a single socket read, so
+    a connection that slows to a trickle cannot hold one call for minutes.
+    """
+    readinto = getattr(response, 'readinto1', response.readinto)
+    buffer = bytearray(MAX_BLOCK_SIZE)
+    view = memoryview(buffer)
+    block = AdaptiveBlockSize()
+    copied = 0
+    while length is None or copied < length:
+        if cancelled():
+            raise DownloadCancelled()
+        requested = block.size if length is None else min(block.size, length - copied)
+        started = time.monotonic()
+        count = readinto(view[:requested])
+        if not count:
+            if length is not None:
+                raise IOError(f"Connection closed early at byte {offset + copied}")
+            break
+        chunk = view[:count]
+        file.write(chunk)
+        for consumer in consumers:
+            consumer(offset + copied, chunk)
+        copied += count
+        block.update(requested, count, time.monotonic() - started)
+    return copied
+
+def fetch_single(url, temp_path, progress, cancelled, hasher=None):
+    """Download url into temp_path over one stream"""
+    from capcut_http import open_url
+    with open_url(url, DOWNLOAD_HEADERS, DOWNLOAD_TIMEOUT) as response:
+        if not progress.total:
+            progress.total = int(response.headers.get('Content-Length', 0) or 0)
+        consumers = [lambda offset, chunk: progress.add(len(chunk))]
+        if hasher:
+            consumers.append(hasher.feed)
+        if tracer():
+            consumers.append(lambda _, chunk: count("bytes downloaded", len(chunk)))
+        # Unbuffered: copy_stream already writes large blocks
+        with span("stream", host=url.split('/')[2]), open(temp_path, 'wb', buffering=0) as file:
+            copy_stream(response, file, cancelled, consumers=consumers)
+
+def fetch_segmented(url, temp_path, state, progress, cancelled, hasher=None):
+    """Download the unfinished segments of state as parallel Range requests written at their offsets"""
+    from concurrent.futures import ThreadPoolExecutor
+    from capcut_http import open_url
+    failed = threading.Event()
+
+    # Preallocate so every worker can seek straight to its offset
+    if not os.path.exists(temp_path) or os.path.getsize(temp_path) != state.total_size:
+        with open(temp_path, 'wb') as file:
+            file.truncate(state.total_size)
+    state.save()
+
+    def fetch_range(index):
+        start, end, offset = state.segments[index]
+        if offset > end:
+            return
+        headers = dict(DOWNLOAD_HEADERS, Range=f'bytes={offset}-{end}')
+        if state.validator:
+            headers['If-Range'] = state.validator
+        with open_url(url, headers, DOWNLOAD_TIMEOUT) as response:
+            if response.status != 206:
+                # If-Range mismatch: the server is sending a different file in full
+                raise DownloadRestart(f"Remote file changed (HTTP {response.status})")
+            consumers = [
+                lambda _, chunk: state.advance(index, len(chunk)),
+                lambda _, chunk: progress.add(len(chunk)),
+            ]
+            if hasher:
+                consumers.append(hasher.feed)
+            if tracer():
+                consumers.append(lambda _, chunk: count("bytes downloaded", len(chunk)))
+            # Unbuffered so the checkpoint never runs ahead of what the OS has
+            with span(f"segment {index}", host=url.split('/')[2], bytes=end - offset + 1), \
+                    open(temp_path, 'r+b', buffering=0) as file:
+                file.seek(offset)
+                copy_stream(response, file, lambda: failed.is_set() or cancelled(),
+                            offset, end - offset + 1, consumers)
+
+    def run(index):
+        try:
+            fetch_range(index)
+        except BaseException:
+            failed.set() # Stop the sibling segments early
+            raise
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(state.segments)) as pool:
+            futures = [pool.submit(run, i) for i in range(len(state.segments))]
+    finally:
+        state.save() # Checkpoint whatever landed, even on pause or error
+    # Prefer the real error over the DownloadCancelled it caused in siblings
+    errors = [f.exception() for f in futures if f.exception()]
+    errors.sort(key=lambda e: isinstance(e, DownloadCancelled))
+    if errors:
+        raise errors[0]
+
+# --- Installer Cache ---
+
+INSTALLER_CACHE_LIMIT = 4 * 1024 * 1024 * 1024 # Room for every legacy version at once
+
+class InstallerCache:
+    """Content-addressed store of downloaded installers with LRU eviction
+
+    Blobs live under blobs/<sha256>; index.json maps each blob to its size,
+    the URLs it was downloaded from and when it was last served.
+    """
+    _shared_lock = threading.Lock()
+
+    def __init__(self, root, max_bytes=INSTALLER_CACHE_LIMIT):
+        self.root = Path(root)
+        self.blob_dir = self.root / "blobs"
+        self.index_path = self.root / "index.json"
+        self.max_bytes = max_bytes
+        self._lock = InstallerCache._shared_lock # Queued downloads share one index.json
+
+    def _load(self):
+        try:
+            with open(self.index_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, index):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_suffix(".tmp")
+        with open(tmp, 'w') as f:
+            json.dump(index, f, indent=1)
+        os.replace(tmp, self.index_path)
+
+    def lookup(self, urls, sha256=None):
+        """Return (sha256, blob_path) for a cached download of any of urls, or None
+
+        With sha256 given, only a blob with exactly that digest is a hit.
+        """
+        if isinstance(urls, str):
+            urls = [urls]
+        with self._lock:
+            index = self._load()
+            for digest, entry in index.items():
+                if sha256:
+                    if digest != sha256: # A known digest must match, whichever mirror it came from
+                        continue
+                elif not any(url in entry['urls'] for url in urls):
+                    continue
+                blob = self.blob_dir / digest
+                try:
+                    if blob.stat().st_size != entry['size']:
+                        continue
+                except OSError:
+                    continue
+                entry['last_used'] = time.time()
+                self._save(index)
+                return digest, blob
+            return None
+
+    def add(self, path, digest, url):
+        """Store path under its digest and evict least recently used blobs over the cap"""
+        with self._lock:
+            self.blob_dir.mkdir(parents=True, exist_ok=True)
+            blob = self.blob_dir / digest
+            if not blob.exists():
+                link_or_copy(path, blob)
+            index = self._load()
+            entry = index.setdefault(digest, {'size': blob.stat().st_size, 'urls': []})
+            if url not in entry['urls']:
+                entry['urls'].append(url)
+            entry['last_used'] = time.time()
+            self._evict(index, keep=digest)
+            self._save(index)
+
+    def _evict(self, index, keep):
+        total = sum(e['size'] for e in index.values())
+        for digest in sorted(index, key=lambda d: index[d].get('last_used', 0)):
+            if total <= self.max_bytes:
+                break
+            if digest == keep:
+                continue
+            try: (self.blob_dir / digest).unlink()
+            except FileNotFoundError: pass
+            total -= index.pop(digest)['size']
+
+def link_or_copy(src, dest):
+    """Hardlink src to dest when on the same volume, otherwise copy it"""
+    try:
+        os.link(src, dest)
+    except OSError:
+        import shutil
+        shutil.copy2(src, dest)
+
+def materialize(blob, dest):
+    """Place a cached blob at dest unless dest already is that blob"""
+    dest = Path(dest)
+    if dest.exists():
+        if os.path.samefile(blob, dest):
+            return
+        dest.unlink()
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    link_or_copy(blob, dest)
+
+class InstallerDownloader:
+    """Installer downloads: local cache, mirror ranking, resume, pause and discard
+
+    CapCutBlocker is one; a queued download (capcut_queue.DownloadJob) owns
+    one of its own, so it carries the download state and hooks without the
+    lock and restore API. versions is the {name: VersionEntry} catalog.
+    """
+    def __init__(self, versions):
+        self.versions = versions
+        self.cancel_download_flag = False
+        self.discard_download_flag = False
+        self.throttle = None # Optional bandwidth cap, see DownloadProgress
+
+    def log(self, message):
+        """Thread-safe logging through the capcut_blocker logger"""
+        logger.log(level_for(message), message)
+
+    # --- Hooks ---
+
+    def on_download_ui(self, show):
+        """Called when a download starts (True) and ends (False)"""
+
+    def on_progress(self, done, total):
+        """Called from download workers for every chunk; keep it cheap"""
+
+    # --- Download ---
+
+    def get_cache_dir(self):
+        localappdata = os.getenv('LOCALAPPDATA')
+        return Path(localappdata) / "CapCutUpdateBlocker" / "InstallerCache" if localappdata else None
+
+    def download_version(self, version_name, downloads_dir=None):
+        """Fetch an installer from the cache or the network; return its path or None"""
+        entry = self.versions[version_name]
+
+        self.log("-" * 50)
+        self.log(f"📥 Initiating Download for {version_name}...")
+
+        # Extract simple filename from version string
+        clean_name = version_name.split(' ')[0].replace('.', '_')
+        if downloads_dir is None:
+            downloads_dir = Path(os.path.expanduser("~")) / "Downloads"
+        installer_path = Path(downloads_dir) / f"capcut_{clean_name}_installer.exe"
+        installer_path.parent.mkdir(parents=True, exist_ok=True)
+
+        checkpoint("cache lookup")
+        cache = InstallerCache(self.get_cache_dir()) if self.get_cache_dir() else None
+        with span("cache lookup"):
+            hit = cache.lookup(entry.mirrors, entry.sha256) if cache else None
+            if hit:
+                digest, blob = hit
+                materialize(blob, installer_path)
+        if hit:
+            self.log(f"   ⚡ Served from local cache (SHA-256 {digest[:12]}…)")
+        else:
+            checkpoint("download")
+            if not self.download_file_native(entry, str(installer_path), cache):
+                checkpoint() # Report a cancelled task as such, not as a failed download
+                return None
+
+        self.log("\n✅ Download successfully saved to Downloads folder.")
+        self.log(f"   Path: {installer_path}")
+        return installer_path
+
+    def rank_mirrors(self, entry):
+        """Probe entry's mirrors concurrently; return [(url, info)] usable ones, fastest first"""
+        with span("probe mirrors", mirrors=len(entry.mirrors)):
+            results = probe_mirrors(entry.mirrors)
+        expected = entry.size
+        ranked = []
+        for r in results:
+            host = r['url'].split('/')[2] if '://' in r['url'] else r['url']
+            if 'error' in r:
+                self.log(f"   🌐 {host}: unreachable ({r['error']})")
+                continue
+            size = r['info']['size']
+            if expected is None:
+                expected = size # The fastest mirror decides when the catalog does not say
+            if size != expected:
+                self.log(f"   🌐 {host}: skipped, serves {size} bytes instead of {expected}")
+                continue
+            self.log(f"   🌐 {host}: {r['seconds'] * 1000:.0f} ms")
+            ranked.append((r['url'], r['info']))
+        return ranked
+
+    def download_file_native(self, entry, save_path, cache=None):
+        """Native Python download with Progress, Pause/Resume, Discard & mirror failover"""
+        try:
+            self.log(f"   Target: {Path(save_path).name}")
+            self.log("   Method: Native Python Download...")
+            
+            # Setup UI for download
+            self.on_download_ui(True)
+            
+            # Work with a temporary file
+            temp_path = str(save_path) + ".part"
+            
+            task = current_task() # Segment workers run on their own threads, so capture it here
+            cancelled = lambda: self.cancel_download_flag or (task is not None and task.token.cancelled)
+            hasher = OrderedHasher(temp_path)
+            mirrors = self.rank_mirrors(entry)
+            if not mirrors:
+                self.log("   ❌ Error: No mirror is reachable.")
+                return False
+            url, info = mirrors[0]
+
+            def fresh_state(url, info):
+                discard_partial(temp_path)
+                return DownloadState(temp_path, url, info['size'], info['etag'], info['last_modified'],
+                                     [[s, e, s] for s, e in split_ranges(info['size'], DOWNLOAD_SEGMENTS)])
+
+            def attempts(progress):
+                """Yield (index, url, info, cancelled) per mirror; the guard only arms while another mirror is left"""
+                for index, (url, info) in enumerate(mirrors):
+                    if index:
+                        self.log(f"   🔀 Switching to mirror {url.split('/')[2]}")
+                    guard = ThroughputGuard(progress) if index + 1 < len(mirrors) else None
+                    yield index, url, info, (lambda: cancelled() or (guard is not None and guard.check()))
+
+            try:
+                if info['ranges']:
+                    mirrors = [m for m in mirrors if m[1]['ranges']]
+                    state = DownloadState.load(temp_path)
+                    if state and os.path.exists(temp_path) and any(state.matches(u, i) for u, i in mirrors):
+                        # Continue on the mirror the partial file came from
+                        mirrors.sort(key=lambda m: m[0] != state.url)
+                        self.log(f"   Resuming: {state.completed() // (1024 * 1024)} MB already downloaded")
+                    else:
+                        if state:
+                            self.log("   Remote file changed, restarting download.")
+                        state = fresh_state(*mirrors[0])
+                    self.log(f"   Mode: Ranged ({len(state.segments)} parallel segments)")
+                    progress = DownloadProgress(state.total_size, self.on_progress, self.throttle)
+                    progress.done = state.completed()
+                    for index, url, info, stop in attempts(progress):
+                        state.switch(url, info)
+                        try:
+                            try:
+                                fetch_segmented(url, temp_path, state, progress, stop, hasher)
+                            except DownloadRestart:
+                                self.log("   Remote file changed mid-download, restarting.")
+                                info = probe_download(url)
+                                state = fresh_state(url, info)
+                                hasher = OrderedHasher(temp_path)
+                                progress = DownloadProgress(info['size'], self.on_progress, self.throttle)
+                                fetch_segmented(url, temp_path, state, progress, stop, hasher)
+                            break
+                        except DownloadCancelled:
+                            if cancelled() or index + 1 == len(mirrors):
+                                raise
+                            self.log("   ⚠️ Throughput collapsed on this mirror.")
+                        except Exception as e:
+                            if index + 1 == len(mirrors):
+                                raise
+                            self.log(f"   ⚠️ Mirror failed: {e}")
+                    os.remove(state.path) # Complete, resume state no longer needed
+                else:
+                    self.log("   Mode: Single stream (server does not support resume)")
+                    progress = DownloadProgress(info['size'], self.on_progress, self.throttle)
+                    for index, url, info, stop in attempts(progress):
+                        discard_partial(temp_path)
+                        hasher = OrderedHasher(temp_path)
+                        progress.done = 0
+                        try:
+                            fetch_single(url, temp_path, progress, stop, hasher)
+                            break
+                        except DownloadCancelled:
+                            if cancelled() or index + 1 == len(mirrors):
+                                raise
+                            self.log("   ⚠️ Throughput collapsed on this mirror.")
+                        except Exception as e:
+                            if index + 1 == len(mirrors):
+                                raise
+                            self.log(f"   ⚠️ Mirror failed: {e}")
+            except DownloadCancelled:
+                if self.discard_download_flag or not info['ranges']:
+                    discard_partial(temp_path)
+                    self.log("   🗑️ Download discarded.")
+                else:
+                    self.log("   ⏸️ Download paused. Run the download again to resume.")
+                return False
+
+            digest = hasher.hexdigest()
+            if entry.sha256 and digest != entry.sha256:
+                self.log(f"   ❌ Error: SHA-256 mismatch (got {digest[:12]}…, catalog says {entry.sha256[:12]}…)")
+                discard_partial(temp_path)
+                return False
+
+            # Move temp file to final path
+            if os.path.exists(temp_path):
+                if os.path.exists(save_path):
+                    os.remove(save_path)
+                os.rename(temp_path, save_path)
+            
+            if os.path.exists(save_path) and os.path.getsize(save_path) > 1000000:
+                self.log("   ✅ Download successful.")
+                self.log(f"   SHA-256: {digest}")
+                if cache:
+                    try:
+                        cache.add(save_path, digest, url)
+                    except Exception as e:
+                        self.log(f"   ⚠️ Could not cache installer: {e}")
+                return True
+            else:
+                self.log("   ⚠️ Download finished but file seems too small.")
+                if os.path.exists(save_path): os.remove(save_path) # Cleanup
+                return False
+
+        except Exception as e:
+            self.log(f"   ⚠️ Native download error: {e}")
+            if 'temp_path' in locals():
+                if os.path.exists(temp_path + ".json"):
+                    # Keep the partial file; the next attempt resumes from the checkpoint
+                    self.log("   Partial download kept for resume.")
+                else:
+                    try: discard_partial(temp_path)
+                    except: pass
+            return False
+        finally:
+            # A pause or discard applies to this download only
+            self.cancel_download_flag = False
+            self.discard_download_flag = False
+            self.on_download_ui(False)
+
+class CapCutBlocker(InstallerDownloader):
+    """Block, restore and verify logic without any GUI, plus the downloads it inherits
+
+    The CLI uses this class directly; CapCutBlockerApp layers the Tk interface
+    on top and overrides the on_* hooks to drive its widgets. platform is
+    also the filesystem every step goes through (see capcut_fs), so a
+    capcut_memfs.MemoryBackend runs the whole pipeline without a disk.
+    """
+    def __init__(self, capcut_path=None, platform=None, catalog=None):
+        self.capcut_path = Path(capcut_path) if capcut_path else get_capcut_path()
+        self.platform = platform or get_platform_backend()
+        super().__init__(self.load_versions(catalog))
+        self.last_checks = []
+        self.last_plan = []
+        self.purge_thread = None
+        self.purge_stop = threading.Event()
+        self.purge_report = None
+        self.purge_in_place = [] # Targets that could not be renamed into the trash
+        self.watchdog = None
+        self.inventory = None
+        self.keep_targets = set() # Cleanup target names block leaves alone, see cleanup_targets()
+
+    # --- Actions ---
+
+    def block(self, dry_run=False):
+        """Apply every lock that is not already in place; return True when all verify
+
+        The work is planned first, so a machine that is already blocked costs a
+        handful of stats and no process kill, cache purge or file rewrite.
+        """
+        self.log("-" * 50)
+        self.log("🚀 Starting blocking process...")
+        
+        capcut_path = self.capcut_path
+        cache = StatCache(self.platform)
+        checkpoint("plan")
+        with span("plan"):
+            plan = self.plan_block(cache)
+        self.last_plan = plan
+
+        if dry_run:
+            self.log(f"📝 Dry run: {len(plan)} change(s) needed.")
+            for op in plan:
+                self.log(f"   {op}")
+            return not plan
+
+        watching = self.watchdog is not None
+        if not plan:
+            self.log("✅ Already in the blocked state, nothing to change.")
+        elif self.get_backup_dir() is None:
+            self.log("❌ LOCALAPPDATA is not set, so there is nowhere to back up the originals. Nothing was changed.")
+            return False
+        else:
+            self.stop_watch() # It would race this run over the same files; restarted below
+            try:
+                self.apply_plan(plan, cache)
+            except TaskCancelled:
+                self.log("⏹️ Block stopped; the steps already done are kept. Run it again to finish.")
+                raise
+        
+        checkpoint("verify")
+        self.log("\n🔍 Verifying locks...")
+        with span("verify"):
+            ok = self.verify_locks(capcut_path, cache)
+        if ok:
+            checkpoint("integrity baseline")
+            try:
+                self.record_integrity_baseline()
+            except OSError as e:
+                self.log(f"   ⚠️ Could not record the integrity baseline: {e}")
+            self.log("\n🎉 SUCCESS! All locks are active.")
+        else:
+            self.log("\n⚠️ Warning: Some locks verified as missing.")
+        if watching:
+            self.start_watch()
+        return ok
+
+    def plan_block(self, cache):
+        """Diff the actual state against the blocked state; return [PlannedOp]"""
+        capcut_path = self.capcut_path
+        apps_path = capcut_path / "Apps"
+        userdata_path = capcut_path / "User Data"
+        plan = []
+        for folder in (capcut_path, apps_path, userdata_path):
+            if cache.stat(folder) is None:
+                # Create it if it doesn't exist (user might want to pre-block)
+                plan.append(PlannedOp("mkdir", folder, "missing"))
+
+        for name, path, reason in self.cleanup_targets(cache):
+            if name not in self.keep_targets:
+                plan.append(PlannedOp("trash", path, reason))
+
+        for rule in LOCK_RULES:
+            path = rule.path(capcut_path)
+            reason = rule_drift(rule, path, cache.stat(path), self.platform)
+            if reason:
+                plan.append(PlannedOp("lock", path, f"{rule.name}: {reason}", rule))
+
+        if any(op.action in ("trash", "lock") for op in plan):
+            # CapCut holds these files open; only worth closing it when we will touch them
+            plan.insert(sum(op.action == "mkdir" for op in plan), PlannedOp("kill", "CapCut.exe, CapCutService.exe", "files will change"))
+        if cache.stat(self.get_trash_dir()) is not None:
+            plan.append(PlannedOp("purge", self.get_trash_dir(), "left over from an earlier run"))
+        return plan
+
+    def apply_plan(self, plan, cache):
+        """Run the steps of plan_block(); lock steps run while the trash is purged
+
+        Each step is a checkpoint: a cancelled task stops between steps, and
+        the journal is dropped so the remaining steps are not redone later.
+        """
+        for op in plan:
+            if op.action == "mkdir":
+                checkpoint(f"mkdir {op.path.name}")
+                self.log(f"   Creating directory: {op.path}")
+                self.platform.mkdir(op.path, parents=True, exist_ok=True)
+                cache.invalidate(op.path)
+            elif op.action == "kill":
+                checkpoint("kill")
+                self.kill_capcut_processes()
+            elif op.action == "trash":
+                checkpoint(f"trash {op.path.name}")
+                self.log(f"🧹 Moving aside {op.path.name} ({op.reason})...")
+                with span(f"trash {op.path.name}"):
+                    self.trash(op.path)
+                cache.invalidate(op.path)
+        self.start_purge() # Also picks up trash left by an earlier run
+        with span("backup store"):
+            snapshot = self.get_backup_store().snapshot(self.capcut_path)
+        rules = [op.rule for op in plan if op.action == "lock"]
+        journal = Journal(self.get_journal_path(), self.platform)
+        journal.begin("block", self.capcut_path, [{"kind": "lock", "rule": rule.name} for rule in rules])
+        try:
+            for step, rule in enumerate(rules, 1):
+                checkpoint(f"lock {rule.name}")
+                with span(f"lock {rule.name}"):
+                    self.apply_rule(rule, cache, snapshot)
+                journal.done(step)
+        except TaskCancelled:
+            journal.clear() # Stopped on purpose, not a crash: nothing to finish on the next start
+            raise
+        journal.clear()
+        if snapshot.files:
+            self.log(f"   💾 Saved backup snapshot {snapshot.id} ({len(snapshot.files)} file(s))")
+
+    def restore(self, snapshot_id=None):
+        """Unlock and restore the files as of a backup snapshot (default: the newest)
+
+        Returns False if CapCut is missing. Raises UnknownItemError for an unknown snapshot.
+        """
+        capcut_path = self.capcut_path
+        store = self.get_backup_store()
+        if store is not None:
+            backups = store.state(capcut_path, snapshot_id)
+        elif snapshot_id:
+            raise UnknownItemError("snapshot", snapshot_id)
+        else:
+            backups = {} # Nowhere backups could have been kept: unlock and drop our dummies
+
+        self.stop_watch() # Otherwise it would lock the files again as we restore them
+        self.log("-" * 50)
+        self.log("🔓 Reversing blocker...")
+        if not self.platform.exists(capcut_path):
+            self.log("❌ Error: CapCut installation not found.")
+            return False
+
+        if snapshot_id:
+            self.log(f"   Using backup snapshot {snapshot_id}")
+
+        checkpoint("kill")
+        self.kill_capcut_processes()
+        
+        cache = StatCache(self.platform)
+        rules = [rule for rule in LOCK_RULES if cache.stat(rule.path(capcut_path)) is not None]
+        journal = Journal(self.get_journal_path(), self.platform)
+        journal.begin("restore", capcut_path, [{"kind": "restore", "rule": rule.name} for rule in rules], snapshot=snapshot_id)
+        try:
+            for step, rule in enumerate(rules, 1):
+                checkpoint(f"restore {rule.name}")
+                with span(f"restore {rule.name}"):
+                    self.restore_rule(rule, store, backups, cache)
+                journal.done(step)
+        except TaskCancelled:
+            journal.clear()
+            self.log("⏹️ Restore stopped; the files already restored are kept. Run it again to finish.")
+            raise
+        journal.clear()
+
+        self.log("\n🎉 SUCCESS! Blocker has been reversed.")
+        return True
+
+    def restore_rule(self, rule, store, backups, cache):
+        """Unlock one protected file and put back its backup (or drop our dummy)"""
+        fp, name = rule.path(self.capcut_path), rule.name
+        st = cache.stat(fp)
+        if st is None:
+            return
+        self.log(f"   Processing: {name}")
+        try:
+            # Force unlock for Windows stubborn files
+            self.remove_readonly(fp)
+        except Exception as e:
+            self.log(f"   ⚠️ Could not unlock {name}: {e}")
+
+        # Try to restore from backup
+        entry = backups.get(rule.relative)
+
+        if entry and entry["size"] > 0:
+            try:
+                store.restore_file(entry, fp)
+                count("files touched")
+                self.log(f"   ✅ Restored original: {name}")
+            except Exception as e:
+                self.log(f"   ❌ Restore failed for {name}: {e}")
+        else:
+            # Logic for determining if it's a dummy file we should delete
+            # If it's exactly 0 bytes (like our touched files), delete it
+            try:
+                if st.st_size == 0: 
+                     self.platform.unlink(fp)
+                     count("files touched")
+                     self.log(f"   🗑️ Removed dummy file: {name}")
+                else:
+                     self.log(f"   🔓 Unlocked existing file: {name}")
+            except Exception as e:
+                self.log(f"   ❌ Delete failed for {name}: {e}")
+        cache.invalidate(fp)
+
+    def load_versions(self, catalog=None):
+        """{name: VersionEntry} from catalog, $CAPCUT_CATALOG or versions.json, else built in"""
+        localappdata = os.getenv('LOCALAPPDATA')
+        path = catalog or default_catalog_path(Path(localappdata) / "CapCutUpdateBlocker" if localappdata else None)
+        if catalog:
+            return load_catalog(path) # Asked for explicitly: a bad file is an error
+        try:
+            return load_catalog(path)
+        except ValueError as e:
+            self.log(f"⚠️ {e}; using the built-in version list.")
+            return builtin_catalog()
+
+    # --- Logic Implementations ---
+    
+    def kill_capcut_processes(self):
+        self.log("🔴 Closing any running CapCut processes...")
+        processes = ["CapCut.exe", "CapCutService.exe"]
+        try:
+            # Returns as soon as they have exited instead of sleeping a fixed second
+            with span("kill_capcut_processes"):
+                survivors = self.platform.kill_processes(processes)
+            if survivors:
+                self.log(f"   ⚠️ Still running after timeout: PID {', '.join(map(str, survivors))}")
+        except Exception as e:
+            self.log(f"   ⚠️ Could not close CapCut: {e}")
+
+    def scan_installation(self, apps_path=None):
+        """Installation (see capcut_inventory) of apps_path, by default this CapCut folder's Apps"""
+        if self.inventory is None:
+            self.inventory = VersionInventory(self.get_inventory_path(), self.platform)
+        with span("inventory"):
+            return self.inventory.scan(apps_path or self.capcut_path / "Apps")
+
+    def find_versions(self, apps_path):
+        """Return (active version folder, [every other version folder])"""
+        installation = self.scan_installation(apps_path)
+        if installation.active is None:
+            return None, []
+        return installation.active.path, [v.path for v in installation.others]
+
+    # --- Disk space ---
+
+    def cleanup_targets(self, cache=None):
+        """[(name, path, reason)] block moves to the trash: every version but the active one, and the update caches"""
+        cache = cache or StatCache(self.platform)
+        targets = []
+        installation = self.scan_installation()
+        for item in installation.others:
+            targets.append((item.name, item.path, f"not the active {installation.active.label} ({installation.reason})"))
+        userdata_path = self.capcut_path / "User Data"
+        for folder in UPDATE_CACHE_FOLDERS:
+            if cache.stat(userdata_path / folder) is not None:
+                targets.append((folder, userdata_path / folder, "update cache"))
+        return targets
+
+    def reclaimable(self):
+        """[{name, reason, path, bytes, files, ...}] for every cleanup target, sized with the parallel du"""
+        sizes = DirSizeCache(self.get_dir_size_cache_path(), self.platform)
+        report = []
+        with span("reclaimable"):
+            for name, path, reason in self.cleanup_targets():
+                checkpoint(f"size {name}")
+                report.append(dict(disk_usage(path, cache=sizes, fs=self.platform).as_dict(), name=name, reason=reason))
+        sizes.prune(self.capcut_path)
+        sizes.save()
+        return report
+
+    def clean(self, names=None):
+        """Move the chosen cleanup targets (default: all) to the trash and purge them in the background
+
+        Returns the names moved aside. Raises UnknownItemError for a name that is not a target.
+        """
+        targets = {name: (path, reason) for name, path, reason in self.cleanup_targets()}
+        for name in names or ():
+            if name not in targets:
+                raise UnknownItemError("cleanup target", name)
+        chosen = [name for name in targets if names is None or name in names]
+        self.log("-" * 50)
+        if not chosen:
+            self.log("✅ Nothing to clean.")
+            return chosen
+        self.log(f"🧹 Cleaning {', '.join(chosen)}...")
+        checkpoint("kill")
+        self.kill_capcut_processes()
+        for name in chosen:
+            checkpoint(f"trash {name}")
+            path, reason = targets[name]
+            self.log(f"🧹 Moving aside {name} ({reason})...")
+            with span(f"trash {name}"):
+                self.trash(path)
+        self.start_purge()
+        return chosen
+
+    # --- Integrity ---
+
+    def get_integrity_path(self):
+        backup_dir = self.get_backup_dir()
+        return backup_dir.parent / "integrity.json" if backup_dir else None
+
+    def get_hash_cache_path(self):
+        backup_dir = self.get_backup_dir()
+        return backup_dir.parent / "file_hashes.json" if backup_dir else None
+
+    def hash_active_version(self):
+        """(active InstalledVersion, TreeHashes) of this CapCut folder, or (None, None) without one"""
+        active = self.scan_installation().active
+        if active is None:
+            return None, None
+        cache = HashCache(self.get_hash_cache_path(), self.platform)
+        task = current_task()
+        with span("hash tree", folder=active.name):
+            hashes = hash_tree(active.path, cache=cache, fs=self.platform,
+                               cancelled=lambda: task is not None and task.token.cancelled)
+        checkpoint() # A cancelled run stops here; its partial hashes are never compared or stored
+        cache.prune(active.path)
+        cache.save()
+        return active, hashes
+
+    def record_integrity_baseline(self, force=False):
+        """Store the hashes of the active version as its baseline; return the manifest, or None if none was stored
+
+        An existing baseline of the same version folder is kept unless force,
+        so blocking again never hides files that changed since.
+        """
+        if self.get_integrity_path() is None:
+            return None # No LOCALAPPDATA to keep it in
+        store = BaselineStore(self.get_integrity_path(), self.platform)
+        if not force:
+            existing = store.get(self.capcut_path)
+            active = self.scan_installation().active
+            if active is None or (existing and existing["folder"] == active.name):
+                return None
+        active, hashes = self.hash_active_version()
+        if active is None:
+            return None
+        if hashes.errors:
+            self.log(f"   ⚠️ Integrity baseline not saved: {len(hashes.errors)} file(s) of {active.label} unreadable")
+            return None
+        manifest = {"folder": active.name, "version": active.version, "created": time.time(), "files": hashes.files}
+        store.put(self.capcut_path, manifest)
+        self.log(f"   🧬 Integrity baseline of {active.label}: {len(hashes.files)} files, "
+                 f"{format_bytes(hashes.bytes)} in {hashes.seconds:.1f}s")
+        return manifest
+
+    def check_integrity(self):
+        """IntegrityReport of the active version against its baseline, or None if it has none"""
+        path = self.get_integrity_path()
+        baseline = BaselineStore(path, self.platform).get(self.capcut_path) if path else None
+        active = self.scan_installation().active
+        if active is None or not baseline or baseline["folder"] != active.name:
+            self.log("   🧬 No integrity baseline for this version yet; the next block records one.")
+            return None
+        active, hashes = self.hash_active_version()
+        report = IntegrityReport(active.label, baseline, hashes)
+        if report.ok:
+            self.log(f"   ✅ Integrity of {active.label}: {report.files} files unchanged "
+                     f"({report.hashed} hashed, {report.cached} unchanged since the last check, {report.seconds:.1f}s)")
+            return report
+        self.log(f"   ❌ Integrity of {active.label}: {len(report.modified)} modified, {len(report.added)} added, "
+                 f"{len(report.removed)} removed, {len(report.unreadable)} unreadable")
+        for kind, paths in (("modified", report.modified), ("added", report.added), ("removed", report.removed),
+                            ("unreadable", [path for path, _ in report.unreadable])):
+            for path in paths[:REPORT_LIMIT]:
+                self.log(f"      ⚠️ {kind}: {path}")
+            if len(paths) > REPORT_LIMIT:
+                self.log(f"      ⚠️ ...and {len(paths) - REPORT_LIMIT} more {kind}")
+        return report
+
+    # --- Background purge ---
+
+    def get_trash_dir(self):
+        # Inside the CapCut folder so the move is a same-volume rename
+        return self.capcut_path / TRASH_DIR_NAME
+
+    def trash(self, path):
+        """Move path into the trash now; it is deleted later by start_purge()"""
+        try:
+            move_to_trash(path, self.get_trash_dir(), self.platform)
+            return True
+        except OSError as e:
+            self.log(f"   ⚠️ Could not move {path.name} aside ({e}); deleting in place.")
+            self.purge_in_place.append(path)
+            return False
+
+    def start_purge(self):
+        """Empty the trash on a background thread and log what was reclaimed"""
+        if self.purge_thread and self.purge_thread.is_alive():
+            return
+        extra, self.purge_in_place = self.purge_in_place, []
+        if not extra and not self.platform.exists(self.get_trash_dir()):
+            return
+
+        task = current_task()
+        self.purge_stop.clear()
+        cancelled = lambda: self.purge_stop.is_set() or (task is not None and task.token.cancelled)
+
+        def run():
+            with span("purge"):
+                report = empty_trash(self.get_trash_dir(), extra, cancelled=cancelled, fs=self.platform)
+            count("files deleted", report.files)
+            count("bytes deleted", report.bytes)
+            self.purge_report = report
+            outcome = "stopped, the rest is removed next time" if cancelled() else "finished"
+            self.log(f"♻️ Purge {outcome}: {report.files} files, {format_bytes(report.bytes)} reclaimed in {report.seconds:.1f}s")
+            for path, error in report.failures[:10]:
+                self.log(f"   ⚠️ Could not delete {path}: {error}")
+            if len(report.failures) > 10:
+                self.log(f"   ⚠️ ...and {len(report.failures) - 10} more")
+
+        self.purge_thread = threading.Thread(target=run, name="purge", daemon=True)
+        self.purge_thread.start()
+
+    def stop_purge(self, timeout=None):
+        """Stop the background purge after the folders in progress; the rest waits for the next one"""
+        self.purge_stop.set()
+        return self.wait_for_purge(timeout)
+
+    def wait_for_purge(self, timeout=None):
+        """Block until the background purge is done; return its PurgeReport"""
+        if self.purge_thread:
+            self.purge_thread.join(timeout)
+        return self.purge_report
+
+    # --- Crash recovery ---
+
+    def get_journal_path(self):
+        backup_dir = self.get_backup_dir()
+        return backup_dir.parent / "journal.jsonl" if backup_dir else None
+
+    def recover(self):
+        """Redo the steps an interrupted block or restore left open; return how many"""
+        journal = Journal(self.get_journal_path(), self.platform)
+        run, steps = journal.unfinished()
+        if run is None:
+            return 0
+        if os.path.normcase(run["root"]) != os.path.normcase(str(self.capcut_path)):
+            return 0 # Belongs to another CapCut folder; left for a run on that one
+        self.log(f"🩹 Finishing interrupted {run['action']} ({len(steps)} step(s) left)...")
+        rules = {rule.name: rule for rule in LOCK_RULES}
+        cache = StatCache(self.platform)
+        if run["action"] == "restore":
+            store = self.get_backup_store()
+            backups = store.state(self.capcut_path, run.get("snapshot")) if store else {}
+        for step in steps:
+            rule = rules.get(step.get("rule"))
+            if rule is None:
+                continue
+            if step.get("kind") == "lock":
+                self.apply_rule(rule, cache)
+            elif step.get("kind") == "restore":
+                self.restore_rule(rule, store, backups, cache)
+        journal.clear()
+        return len(steps)
+
+    # --- Watchdog ---
+
+    def start_watch(self):
+        """Re-lock any protected file CapCut rewrites, on a background thread"""
+        if self.watchdog is None:
+            from capcut_watch import LockWatchdog
+            self.watchdog = LockWatchdog(self).start()
+        return self.watchdog
+
+    def stop_watch(self, timeout=5):
+        if self.watchdog is not None:
+            self.watchdog.stop()
+            self.watchdog.thread.join(timeout)
+            self.watchdog = None
+
+    # --- Restore & Reverse logic ---
+
+    def get_backup_dir(self):
+        localappdata = os.getenv('LOCALAPPDATA')
+        return Path(localappdata) / "CapCutUpdateBlocker" / "OriginalSettings" if localappdata else None
+
+    def get_inventory_path(self):
+        localappdata = os.getenv('LOCALAPPDATA')
+        return Path(localappdata) / "CapCutUpdateBlocker" / "inventory.json" if localappdata else None
+
+    def get_dir_size_cache_path(self):
+        localappdata = os.getenv('LOCALAPPDATA')
+        return Path(localappdata) / "CapCutUpdateBlocker" / "dir_sizes.json" if localappdata else None
+
+    def get_log_dir(self):
+        localappdata = os.getenv('LOCALAPPDATA')
+        return Path(localappdata) / "CapCutUpdateBlocker" / "Logs" if localappdata else None
+
+    def get_backup_store(self):
+        """Backup store for this CapCut folder, importing old *.bak files once; None without LOCALAPPDATA"""
+        if self.get_backup_dir() is None:
+            return None
+        store = BackupStore(self.get_backup_dir(), fs=self.platform)
+        if not store.snapshots(self.capcut_path):
+            legacy = store.snapshot(self.capcut_path, label="legacy .bak files")
+            for rule in LOCK_RULES:
+                # Both update.exe rules used to share update.exe.bak
+                bak = store.root / f"{rule.parts[-1]}.bak"
+                if self.platform.exists(bak):
+                    try: legacy.add(bak, rule.relative)
+                    except OSError: pass
+            legacy.commit()
+        return store
+
+    def list_snapshots(self):
+        """Backup manifests for this CapCut folder, oldest first"""
+        store = self.get_backup_store()
+        return store.snapshots(self.capcut_path) if store else []
+
+    def backup_config(self, file_path, rule, cache, snapshot):
+        """Save original file before we modify it"""
+        try:
+            st = cache.stat(file_path)
+            if st is None: return
+
+            # SAFETY CHECK: Don't backup if it looks like it's ALREADY blocked
+            if looks_blocked(rule, file_path, st, self.platform):
+                self.log(f"   ⚠️ Skipping backup of {file_path.name} (appears already blocked)")
+                return
+
+            # Unchanged since the last backup costs a hash and no copy
+            method = snapshot.add(file_path, rule.relative)
+            if method:
+                self.log(f"   Stored original: {rule.relative} ({method})")
+        except Exception as e:
+            self.log(f"   ⚠️ Could not back up {file_path.name}: {e}")
+
+    def remove_readonly(self, file_path):
+        """Remove Windows read-only/system/hidden attributes and unlock the file."""
+        try:
+            self.platform.clear_attributes(file_path)
+        except: pass
+
+    def apply_rule(self, rule, cache, snapshot=None, backup=True):
+        """Back up and lock one LOCK_RULES entry
+
+        Without a snapshot (a single re-lock) the backup gets one of its own.
+        With backup=False the file is locked without being saved first.
+        """
+        self.log(rule.message)
+        path = rule.path(self.capcut_path)
+        if snapshot is None and backup:
+            snapshot = self.get_backup_store().snapshot(self.capcut_path)
+        try:
+            if backup:
+                self.backup_config(path, rule, cache, snapshot) # Backup original
+                snapshot.commit() # The backup is on disk before the file is touched
+            getattr(self, f"lock_{rule.kind}")(path, cache)
+            count("files touched")
+        except Exception as e: self.log(f"❌ Error: {e}")
+        finally:
+            cache.invalidate(path)
+
+    def lock_ini(self, ini_path, cache):
+        # Rewritten through a temp file and a rename, never truncated in place
+        blocked = f'last_version={BLOCKED_VERSION}'.encode()
+        if cache.stat(ini_path) is not None:
+            self.platform.clear_attributes(ini_path)
+            lines = self.platform.read_bytes(ini_path).splitlines(keepends=True)
+            if any(line.strip().startswith(b'last_version=') for line in lines):
+                data = b"".join(blocked + line[len(line.rstrip(b"\r\n")):] if line.strip().startswith(b'last_version=') else line
+                                for line in lines)
+            else:
+                data = add_ini_line(lines, blocked)
+        else:
+            data = b'[capcut]' + os.linesep.encode() + blocked + os.linesep.encode()
+        atomic_write(ini_path, data, self.platform)
+        self.platform.set_readonly(ini_path)
+
+    def lock_readonly(self, path, cache):
+        if cache.stat(path) is not None:
+            self.platform.clear_attributes(path) # Ensure we can read/lock it
+        else:
+            # Only create if it doesn't exist at all
+            self.platform.touch(path)
+        self.platform.set_readonly(path) # SET TO READ-ONLY BUT DO NOT DELETE CONTENTS
+
+    def lock_stub(self, exe_path, cache):
+        self.platform.mkdir(exe_path.parent, parents=True, exist_ok=True)
+        if cache.stat(exe_path) is not None:
+            self.platform.clear_attributes(exe_path)
+        atomic_write(exe_path, b"", self.platform) # Swapped in by rename: never missing, never partial
+        self.platform.set_readonly(exe_path)
+        self.log("   Set to Read-Only.")
+
+    def verify_status(self, capcut_path, cache=None):
+        """Return [(name, status)] for every protected file, one stat each"""
+        cache = cache or StatCache(self.platform)
+        return [(rule.name, rule_status(rule, cache.stat(rule.path(capcut_path)))) for rule in LOCK_RULES]
+
+    def verify_locks(self, capcut_path, cache=None):
+        all_good = True
+        self.last_checks = self.verify_status(capcut_path, cache)
+        for name, status in self.last_checks:
+            ok = status in ["Locked", "Blocked"]
+            all_good = all_good and ok
+            symbol = "✅" if ok else "❌"
+            self.log(f"   {symbol} {name}: {status}")
+        return all_good
@@ -0,0 +1,107 @@
+"""Synthetic CapCut files and folders shared by the benchmarks and the tests
+
+Nothing here touches a real install: every builder writes to the path it is
+given or to a fresh MemoryBackend. Kept out of tests/ so capcut_bench.py
+runs from a tree without them.
+"""
+import os
+import struct
+from pathlib import Path
+
+RT_ICON = 3
+RT_VERSION = 16
+
+def version_exe_bytes(version, resource_type=RT_VERSION):
+    """A PE32+ image whose VS_VERSIONINFO says version
+
+    The resource tree is RT_VERSION -> id 1 -> language 0x409 -> data entry;
+    any other resource_type gives an exe whose only resource is not a
+    version resource.
+    """
+    parts = [int(p) for p in version.split(".")] + [0, 0, 0, 0]
+    most, least = parts[0] << 16 | parts[1], parts[2] << 16 | parts[3]
+    rva, raw = 0x1000, 0x200
+    info = struct.pack("<HHH", 92, 52, 0) + "VS_VERSION_INFO\0".encode("utf-16-le") + b"\0\0"
+    info += struct.pack("<13I", 0xFEEF04BD, 0x10000, most, least, most, least, 0x3F, 0, 4, 1, 0, 0, 0)
+    rsrc = b"".join([
+        struct.pack("<IIHHHH", 0, 0, 0, 0, 0, 1), struct.pack("<II", resource_type, 0x80000000 | 0x18),
+        struct.pack("<IIHHHH", 0, 0, 0, 0, 0, 1), struct.pack("<II", 1, 0x80000000 | 0x30),
+        struct.pack("<IIHHHH", 0, 0, 0, 0, 0, 1), struct.pack("<II", 0x409, 0x48),
+        struct.pack("<IIII", rva + 0x58, len(info), 0, 0), info])
+    optional = struct.pack("<H", 0x20B) + b"\0" * 106 + struct.pack("<I", 16)
+    optional += b"\0" * 16 + struct.pack("<II", rva, len(rsrc)) + b"\0" * 104
+    header = b"MZ" + b"\0" * 58 + struct.pack("<I", 0x40)
+    header += b"PE\0\0" + struct.pack("<HHIIIHH", 0x8664, 1, 0, 0, 0, len(optional), 0x22) + optional
+    header += b".rsrc\0\0\0" + struct.pack("<IIII", len(rsrc), rva, len(rsrc), raw) + b"\0" * 16
+    return header.ljust(raw, b"\0") + rsrc
+
+def write_version_exe(path, version, size=0, resource_type=RT_VERSION):
+    """version_exe_bytes() written to path, padded (sparse) to size bytes"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(version_exe_bytes(version, resource_type))
+        if size > f.tell():
+            f.truncate(size)
+
+# Axes of the in-memory scenario matrix; scenario n and n + SCENARIO_COUNT are the same
+FILE_STATES = ("missing", "original", "blocked")
+PROCESS_STATES = ("none", "running", "stuck") # stuck: survives the kill and holds configure.ini open
+FAULTS = ("none", "hidden", "deny attributes", "deny rename")
+SCENARIO_COUNT = len(FILE_STATES) ** 2 * len(PROCESS_STATES) * len(FAULTS)
+
+def scenario_axes(n):
+    """(configure.ini state, other files' state, process state, fault) of scenario n"""
+    n, ini = divmod(n, len(FILE_STATES))
+    n, others = divmod(n, len(FILE_STATES))
+    n, process = divmod(n, len(PROCESS_STATES))
+    return FILE_STATES[ini], FILE_STATES[others], PROCESS_STATES[process], FAULTS[n % len(FAULTS)]
+
+def memory_scenario(n):
+    """Scenario n of the matrix, on a fresh MemoryBackend; returns (fs, root, expectations)
+
+    The axes are the state of configure.ini, the state of the other protected
+    files, CapCut running, and one injected fault. Expectations are whether
+    block must verify, and the originals restore must bring back.
+    """
+    from capcut_memfs import MemoryBackend
+    from capcut_rules import BLOCKED_VERSION, LOCK_RULES, STUB_SIZE_LIMIT
+    ini, others, process, fault = scenario_axes(n)
+
+    fs = MemoryBackend()
+    root = Path(os.environ["LOCALAPPDATA"]) / "CapCut"
+    fs.add_file(root / "Apps" / "5.0.0.1" / "CapCutCore.dll", size=4096)
+    fs.add_file(root / "Apps" / "4.9.0.1" / "CapCutCore.dll", size=4096)
+    fs.add_file(root / "User Data" / "Download" / "partial.bin", size=1024)
+    originals = {}
+    for rule in LOCK_RULES:
+        state = ini if rule.kind == "ini" else others
+        path = rule.path(root)
+        if state == "missing":
+            continue
+        if rule.kind == "ini":
+            version = BLOCKED_VERSION if state == "blocked" else "5.0.0.1"
+            data = f"[capcut]\r\nlast_version={version}\r\nchannel=release\r\n".encode()
+        elif rule.kind == "stub":
+            data = b"" if state == "blocked" else b"MZ" + bytes(STUB_SIZE_LIMIT)
+        else:
+            data = b'<product version="5.0.0.1"/>'
+        fs.add_file(path, data, readonly=state == "blocked", hidden=fault == "hidden", system=fault == "hidden")
+        if state == "original":
+            originals[path] = data
+
+    ini_path = LOCK_RULES[0].path(root)
+    if process != "none":
+        pid = fs.start_process("CapCut.exe", killable=process == "running")
+        fs.hold(ini_path, pid)
+    if fault == "deny attributes":
+        fs.deny(LOCK_RULES[1].path(root), "attributes")
+    elif fault == "deny rename":
+        fs.deny(root / "Apps" / "4.9.0.1", "rename") # Moved aside fails; deleted in place instead
+
+    ok = True
+    if process == "stuck" and ini == "original":
+        ok = False # configure.ini cannot be replaced while CapCut has it open
+    if fault == "deny attributes" and others != "blocked":
+        ok = False # ProductInfo.xml cannot be made read-only
+    restorable = {} if not ok else originals
+    return fs, root, {"block": ok, "restored": restorable}
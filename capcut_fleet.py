@@ -0,0 +1,138 @@
+"""Apply block, verify or restore across many CapCut installs at once
+
+Shared terminal servers and lab images carry one CapCut tree per user
+profile. This module finds those trees and runs one CapCutBlocker per tree
+on a bounded thread pool, so a slow or broken profile never holds up the rest.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from capcut_backup import BackupStore
+from capcut_core import CapCutBlocker, logger, level_for
+from capcut_trace import span
+
+FLEET_ACTIONS = ("block", "verify", "restore")
+FLEET_WORKERS = 8
+
+def default_users_dir():
+    """Folder holding every user profile (C:\\Users on a stock install)"""
+    return Path(os.getenv('SystemDrive', 'C:') + "\\") / "Users"
+
+def discover_capcut_roots(users_dir=None):
+    """Return <profile>/AppData/Local/CapCut for every profile that has one"""
+    users_dir = Path(users_dir) if users_dir else default_users_dir()
+    roots = []
+    try:
+        entries = sorted(os.scandir(users_dir), key=lambda e: e.name.lower())
+    except OSError:
+        return roots
+    for entry in entries:
+        try:
+            if not entry.is_dir():
+                continue
+        except OSError:
+            continue
+        candidate = Path(entry.path) / "AppData" / "Local" / "CapCut"
+        if candidate.is_dir():
+            roots.append(candidate)
+    return roots
+
+def profile_backup_dir(capcut_path):
+    """Backups for a profile live in that profile's own LOCALAPPDATA"""
+    return Path(capcut_path).parent / "CapCutUpdateBlocker" / "OriginalSettings"
+
+class ProfileBlocker(CapCutBlocker):
+    """CapCutBlocker bound to one profile inside a fleet run
+
+    Log lines are kept per profile (and forwarded with a profile prefix),
+    backups go to that profile's own LOCALAPPDATA, and process killing is
+    left to the fleet runner, which does it once for the whole machine.
+    Identical originals are hardlinked from the other profiles' stores.
+    """
+    def __init__(self, capcut_path, peers=()):
+        super().__init__(capcut_path)
+        self.peers = peers
+        parts = self.capcut_path.parts
+        # <Users>/<profile>/AppData/Local/CapCut, otherwise just show the path
+        self.profile = parts[-4] if len(parts) >= 4 and parts[-2].lower() == "local" else str(self.capcut_path)
+        self.lines = []
+
+    def log(self, message):
+        self.lines.append(message)
+        logger.log(level_for(message), f"[{self.profile}] {message.strip()}")
+
+    def kill_capcut_processes(self):
+        pass
+
+    def get_backup_dir(self):
+        return profile_backup_dir(self.capcut_path)
+
+    def get_backup_store(self):
+        store = super().get_backup_store()
+        store.peers = self.peers
+        return store
+
+def apply_to_root(capcut_path, action, peers=()):
+    """Run one action on one root; never raises, returns a result dict"""
+    started = time.perf_counter()
+    blocker = ProfileBlocker(capcut_path, peers)
+    result = {"root": str(capcut_path), "profile": blocker.profile, "action": action}
+    try:
+        with span(f"{action} {blocker.profile}"):
+            blocker.recover()
+            if action == "block":
+                ok = blocker.block()
+                report = blocker.wait_for_purge()
+                if report:
+                    result["purge"] = report.as_dict()
+            elif action == "restore":
+                ok = blocker.restore()
+            else:
+                ok = blocker.verify_locks(blocker.capcut_path)
+            result["status"] = "ok" if ok else "incomplete"
+            if blocker.last_checks:
+                result["checks"] = dict(blocker.last_checks)
+    except Exception as e:
+        blocker.log(f"❌ Critical Error: {e}")
+        result["status"] = "error"
+        result["error"] = str(e)
+    result["seconds"] = round(time.perf_counter() - started, 4)
+    result["log"] = blocker.lines
+    return result
+
+def run_fleet(roots, action, workers=FLEET_WORKERS, kill_processes=True):
+    """Apply action to every root in parallel; return (results, summary)"""
+    if action not in FLEET_ACTIONS:
+        raise ValueError(f"Unknown fleet action: {action}")
+    started = time.perf_counter()
+    if kill_processes and action != "verify" and roots:
+        # One machine-wide kill instead of one per profile
+        CapCutBlocker().kill_capcut_processes()
+
+    peers = [BackupStore(profile_backup_dir(root)).object_dir for root in roots]
+    workers = max(1, min(workers, len(roots) or 1))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fleet") as pool:
+        results = list(pool.map(lambda root: apply_to_root(root, action, peers), roots))
+
+    summary = {"action": action, "roots": len(results), "workers": workers}
+    for status in ("ok", "incomplete", "error"):
+        summary[status] = sum(1 for r in results if r["status"] == status)
+    summary["seconds"] = round(time.perf_counter() - started, 4)
+    return results, summary
+
+def format_fleet_table(results, summary):
+    """Plain-text per-root table plus the aggregate line"""
+    width = max([len("Profile")] + [len(r["profile"]) for r in results])
+    lines = [f"{'Profile':<{width}}  {'Result':<10}  {'Time':>8}  Detail"]
+    for r in results:
+        if r["status"] == "error":
+            detail = r["error"]
+        else:
+            detail = ", ".join(f"{name}={status}" for name, status in r.get("checks", {}).items()
+                               if status not in ("Locked", "Blocked"))
+        lines.append(f"{r['profile']:<{width}}  {r['status']:<10}  {r['seconds']:>7.2f}s  {detail}")
+    lines.append(f"{summary['roots']} roots: {summary['ok']} ok, {summary['incomplete']} incomplete, "
+                 f"{summary['error']} failed in {summary['seconds']:.2f}s ({summary['workers']} workers)")
+    return "\n".join(lines)
@@ -0,0 +1,102 @@
+"""The filesystem primitives block, restore, verify and the purge go through
+
+Everything that touches the CapCut tree or the blocker's own state under
+LOCALAPPDATA calls these methods instead of os, open() and Path directly.
+OSFileSystem is the real disk; the platform backends in capcut_platform
+inherit it, so the `platform` a CapCutBlocker is given is also its
+filesystem. capcut_memfs.MemoryBackend implements the same methods on an
+in-memory tree, which lets whole block/restore/verify runs execute without
+a disk.
+
+The methods mirror the os functions they stand for, including the OSError
+subclasses they raise. Functions outside CapCutBlocker take an fs argument
+that defaults to LOCAL_FS.
+"""
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+class OSFileSystem:
+    """The local disk, through os and open()"""
+    native = True # Real file descriptors: reflinks, copy_file_range and mmap work
+
+    def stat(self, path):
+        return os.stat(path)
+
+    def lstat(self, path):
+        return os.lstat(path)
+
+    def exists(self, path):
+        return os.path.exists(path)
+
+    def isdir(self, path):
+        return os.path.isdir(path)
+
+    def islink(self, path):
+        return os.path.islink(path)
+
+    def scandir(self, path):
+        return os.scandir(path)
+
+    def mkdir(self, path, parents=False, exist_ok=False):
+        Path(path).mkdir(parents=parents, exist_ok=exist_ok)
+
+    def open(self, path, mode='r', buffering=-1, encoding=None, errors=None):
+        return open(path, mode, buffering, encoding=encoding, errors=errors)
+
+    def read_bytes(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def touch(self, path):
+        Path(path).touch()
+
+    def rename(self, src, dest):
+        os.rename(src, dest)
+
+    def replace(self, src, dest):
+        os.replace(src, dest)
+
+    def link(self, src, dest):
+        os.link(src, dest)
+
+    def unlink(self, path):
+        os.unlink(path)
+
+    def rmdir(self, path):
+        os.rmdir(path)
+
+    def chmod(self, path, mode):
+        os.chmod(path, mode)
+
+    def utime(self, path, times):
+        os.utime(path, times)
+
+    def fsync(self, f):
+        os.fsync(f.fileno())
+
+    def fsync_dir(self, path):
+        """Make a rename inside path durable (a no-op where directories can't be opened)"""
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    @contextmanager
+    def map_file(self, path):
+        """The whole file as a read-only buffer, mapped rather than read"""
+        import mmap
+        with open(path, 'rb') as f:
+            if not os.fstat(f.fileno()).st_size:
+                yield b""
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                yield view
+
+LOCAL_FS = OSFileSystem()
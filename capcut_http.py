@@ -0,0 +1,220 @@
+"""Pooled keep-alive HTTP connections for probes, range segments and downloads
+
+urllib opens a new TCP (and TLS) connection for every request, so each
+mirror probe, range segment, resume and retry paid the handshake again.
+ConnectionPool keeps finished HTTP/1.1 connections per host and hands them
+to the next request: the probe's connection carries the first segment, a
+resumed segment reuses its sibling's socket, and so on.
+
+Only a response read to the end goes back to the pool; anything cancelled
+or cut short is closed, since its socket still has body bytes in flight.
+A request whose connection is reset before any response arrives is retried
+with backoff; a refused or unreachable host fails at once so probing a dead
+mirror stays quick.
+Redirects and the system proxy settings are honoured like urllib does.
+"""
+import http.client
+import threading
+import time
+import urllib.request
+from urllib.parse import urljoin, urlsplit
+
+POOL_MAX_IDLE = 8 # Idle connections kept per host; more are closed when released
+POOL_IDLE_TIMEOUT = 30.0 # Seconds an idle connection is kept; servers drop them soon after
+POOL_RETRIES = 3
+POOL_BACKOFF = 0.25 # Seconds before the first retry, doubled after each
+MAX_REDIRECTS = 5
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+RETRY_ERRORS = (ConnectionResetError, ConnectionAbortedError, BrokenPipeError) # Includes RemoteDisconnected
+
+class HTTPError(IOError):
+    """The server answered with a 4xx or 5xx status"""
+    def __init__(self, url, status, reason):
+        super().__init__(f"HTTP Error {status}: {reason}")
+        self.url = url
+        self.status = status
+
+class PooledResponse:
+    """An http.client response that gives its connection back to the pool on close
+
+    Reads go straight to the underlying response; use it as a context manager.
+    """
+    def __init__(self, pool, key, conn, response, url):
+        self.pool = pool
+        self.key = key
+        self.conn = conn
+        self.response = response
+        self.url = url
+        self.status = response.status
+        self.headers = response.headers
+
+    def read(self, amount=None):
+        return self.response.read(amount)
+
+    def readinto(self, buffer):
+        return self.response.readinto(buffer)
+
+    def readinto1(self, buffer):
+        return self.response.readinto1(buffer)
+
+    def close(self):
+        if self.conn is None:
+            return
+        # isclosed(): http.client has read the whole body, so the socket is clean
+        reusable = self.response.isclosed() and not self.response.will_close
+        if not reusable:
+            self.response.close()
+        self.pool.release(self.key, self.conn, reusable)
+        self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ConnectionPool:
+    """HTTP/1.1 keep-alive connections per (scheme, host, port), bounded and expiring
+
+    Busy connections are not capped (the download engine already bounds its
+    segments); at most max_idle per host are kept for reuse, each for up to
+    idle_timeout seconds.
+
+    stats counts requests, new connections (handshakes), reuses and retries.
+    """
+    def __init__(self, max_idle=POOL_MAX_IDLE, idle_timeout=POOL_IDLE_TIMEOUT,
+                 retries=POOL_RETRIES, backoff=POOL_BACKOFF):
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.stats = {"requests": 0, "handshakes": 0, "reused": 0, "retries": 0}
+        self._idle = {} # key -> [(conn, returned at)], most recent last
+        self._proxies = {} # key -> proxy URL or None, looked up once per host
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _proxy(self, key):
+        if key not in self._proxies:
+            self._proxies[key] = proxy_for(key[0], key[1])
+        return self._proxies[key]
+
+    def _connect(self, key, timeout):
+        """An idle connection for key if a fresh one is waiting, else a new one; returns (conn, reused)"""
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                conn, returned = idle.pop()
+                if now - returned < self.idle_timeout:
+                    self.stats["reused"] += 1
+                    conn.timeout = timeout
+                    if conn.sock:
+                        conn.sock.settimeout(timeout)
+                    return conn, True
+                conn.close()
+        scheme, host, port = key
+        proxy = self._proxy(key)
+        if proxy:
+            target = urlsplit(proxy)
+            conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=timeout) if target.scheme == "http" \
+                else http.client.HTTPSConnection(target.hostname, target.port or 443, timeout=timeout)
+            if scheme == "https":
+                conn.set_tunnel(host, port)
+        elif scheme == "https":
+            conn = http.client.HTTPSConnection(host, port, timeout=timeout)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        self._count("handshakes")
+        return conn, False
+
+    def release(self, key, conn, reusable):
+        if reusable:
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if len(idle) < self.max_idle:
+                    idle.append((conn, time.monotonic()))
+                    return
+        conn.close()
+
+    def close_idle(self):
+        """Close every idle connection (open requests are unaffected)"""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for conn, _ in connections:
+                conn.close()
+
+    def request(self, url, headers=None, timeout=None, method="GET"):
+        """Send a request and return a PooledResponse, following redirects
+
+        Raises HTTPError for 4xx/5xx answers and OSError when the host cannot
+        be reached after the retries.
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            response = self._request_once(url, headers or {}, timeout, method)
+            location = response.headers.get("Location")
+            if response.status in REDIRECT_CODES and location:
+                response.response.read() # Redirect bodies are tiny; drain so the socket is reusable
+                response.close()
+                url = urljoin(url, location)
+                continue
+            if response.status >= 400:
+                response.close()
+                raise HTTPError(url, response.status, response.response.reason)
+            return response
+        raise IOError(f"Too many redirects: {url}")
+
+    def _request_once(self, url, headers, timeout, method):
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL: {url}")
+        key = (scheme, parts.hostname, parts.port or (443 if scheme == "https" else 80))
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        if scheme == "http" and self._proxy(key):
+            target = url # A plain HTTP proxy wants the absolute URL
+        self._count("requests")
+        delay = self.backoff
+        attempt = 0
+        while True:
+            conn, reused = self._connect(key, timeout)
+            try:
+                conn.request(method, target, headers=headers)
+                response = conn.getresponse()
+                return PooledResponse(self, key, conn, response, url)
+            except RETRY_ERRORS:
+                conn.close()
+                if reused:
+                    continue # The server dropped an idle connection; a new one costs no retry
+                if attempt >= self.retries:
+                    raise
+                attempt += 1
+                self._count("retries")
+                time.sleep(delay)
+                delay *= 2
+            except BaseException:
+                conn.close()
+                raise
+
+def proxy_for(scheme, host):
+    """The system proxy URL for scheme, unless host bypasses it"""
+    proxy = urllib.request.getproxies().get(scheme)
+    if proxy and not urllib.request.proxy_bypass(host):
+        return proxy if "://" in proxy else "http://" + proxy
+    return None
+
+_default_pool = ConnectionPool()
+
+def default_pool():
+    """The pool every download, probe and segment of this process shares"""
+    return _default_pool
+
+def open_url(url, headers=None, timeout=None):
+    """GET url through the shared pool"""
+    return _default_pool.request(url, headers, timeout)
@@ -0,0 +1,216 @@
+"""Integrity check of the active Apps/<version> folder against a baseline
+
+verify_locks() only looks at the four protected files, so an update that was
+blocked halfway, after the updater had already swapped some DLLs, went
+unnoticed. After a successful block the whole active version folder is
+hashed and stored as a baseline; check_integrity() hashes it again and
+reports the files added, removed and modified since.
+
+Files are hashed on a thread pool with large streamed reads (hashlib releases
+the GIL, so the workers really run in parallel), biggest first so one large
+binary never finishes alone at the end. HashCache keeps each file's digest
+keyed on its size and mtime in file_hashes.json, so a repeat check of an
+unchanged multi-GB install reads no file contents at all. A replacement
+that keeps both the size and the mtime of the original is the one change it
+cannot see.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from capcut_backup import file_digest
+from capcut_fs import LOCAL_FS
+from capcut_journal import atomic_write
+from capcut_trace import count
+
+INTEGRITY_WORKERS = 8
+HASH_CHUNK = 4 * 1024 * 1024 # Bytes per read while hashing
+REPORT_LIMIT = 10 # Paths per kind of change written to the log
+
+class HashCache:
+    """path -> [size, mtime_ns, sha256] for every file hashed, kept in a JSON file"""
+    _shared_lock = threading.Lock() # One file_hashes.json for every blocker in the process
+
+    def __init__(self, path=None, fs=LOCAL_FS):
+        self.path = Path(path) if path else None
+        self.fs = fs
+        self.hits = 0
+        self.misses = 0
+        self._entries = None
+        self._seen = set()
+        self._dirty = False
+        self._lock = HashCache._shared_lock
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = {}
+            if self.path:
+                try:
+                    with self.fs.open(self.path, 'r') as f:
+                        self._entries = json.load(f)
+                except (OSError, ValueError):
+                    pass
+        return self._entries
+
+    def get(self, path, st):
+        """The cached digest of path if its size and mtime still match st, else None"""
+        with self._lock:
+            self._seen.add(path)
+            entry = self._load().get(path)
+            if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            return None
+
+    def put(self, path, st, digest):
+        with self._lock:
+            self._load()[path] = [st.st_size, st.st_mtime_ns, digest]
+            self._dirty = True
+
+    def prune(self, root):
+        """Drop the entries below root this cache was not asked about (files gone since)"""
+        prefix = os.path.join(str(root), "")
+        with self._lock:
+            entries = self._load()
+            for path in [p for p in entries if p.startswith(prefix) and p not in self._seen]:
+                del entries[path]
+                self._dirty = True
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+        with self._lock:
+            try:
+                self.fs.mkdir(self.path.parent, parents=True, exist_ok=True)
+                atomic_write(self.path, json.dumps(self._entries).encode(), self.fs)
+                self._dirty = False
+            except OSError:
+                pass # Only a cache; the next check hashes the files again
+
+class TreeHashes:
+    """Result of hash_tree(): files by relative path, and what it cost"""
+    def __init__(self, root):
+        self.root = Path(root)
+        self.files = {} # relative path ("bin/x.dll") -> {"size", "sha256"}
+        self.errors = [] # [(relative path, error message)]
+        self.bytes = 0
+        self.hashed = 0 # Files read
+        self.hashed_bytes = 0
+        self.cached = 0 # Files whose size and mtime matched the cache
+        self.seconds = 0.0
+
+def _list_files(root, fs):
+    """[(relative path, full path, stat)] of every file below root, without following links"""
+    files = []
+    pending = [(str(root), "")]
+    while pending:
+        path, prefix = pending.pop()
+        with fs.scandir(path) as entries:
+            for entry in entries:
+                relative = prefix + entry.name
+                if entry.is_dir(follow_symlinks=False) and not entry.is_symlink():
+                    pending.append((entry.path, relative + "/"))
+                else:
+                    files.append((relative, entry.path, entry.stat(follow_symlinks=False)))
+    return files
+
+def hash_tree(root, workers=INTEGRITY_WORKERS, cache=None, fs=LOCAL_FS, cancelled=None):
+    """SHA-256 of every file below root, reusing cache entries whose size and mtime still match
+
+    Once cancelled() is true the files not yet started are skipped; the
+    result is then incomplete and must not be used as a baseline.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    started = time.perf_counter()
+    result = TreeHashes(root)
+    todo = []
+    for relative, path, st in _list_files(root, fs):
+        result.bytes += st.st_size
+        digest = cache.get(path, st) if cache is not None else None
+        if digest:
+            result.files[relative] = {"size": st.st_size, "sha256": digest}
+            result.cached += 1
+        else:
+            todo.append((relative, path, st))
+    todo.sort(key=lambda item: -item[2].st_size)
+
+    def work(item):
+        relative, path, st = item
+        if cancelled and cancelled():
+            return item, None, None
+        try:
+            return item, file_digest(path, fs, HASH_CHUNK), None
+        except OSError as e:
+            return item, None, e
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="hash") as pool:
+        for (relative, path, st), digest, error in pool.map(work, todo):
+            if error is not None:
+                result.errors.append((relative, str(error)))
+            elif digest is not None:
+                result.files[relative] = {"size": st.st_size, "sha256": digest}
+                result.hashed += 1
+                result.hashed_bytes += st.st_size
+                if cache is not None:
+                    cache.put(path, st, digest)
+    count("bytes hashed", result.hashed_bytes)
+    result.seconds = time.perf_counter() - started
+    return result
+
+class IntegrityReport:
+    """The active version folder compared with its baseline"""
+    def __init__(self, version, baseline, current):
+        self.version = version
+        self.baseline_created = baseline["created"]
+        old, new = baseline["files"], current.files
+        self.added = sorted(set(new) - set(old))
+        self.removed = sorted(set(old) - set(new) - {path for path, _ in current.errors})
+        self.modified = sorted(path for path in set(old) & set(new) if old[path]["sha256"] != new[path]["sha256"])
+        self.unreadable = current.errors
+        self.files = len(new)
+        self.bytes = current.bytes
+        self.hashed = current.hashed
+        self.cached = current.cached
+        self.seconds = current.seconds
+
+    @property
+    def ok(self):
+        return not (self.added or self.removed or self.modified or self.unreadable)
+
+    def as_dict(self):
+        return {"version": self.version, "ok": self.ok, "baseline_created": self.baseline_created,
+                "added": self.added, "removed": self.removed, "modified": self.modified,
+                "unreadable": [{"path": p, "error": e} for p, e in self.unreadable],
+                "files": self.files, "bytes": self.bytes, "hashed": self.hashed, "cached": self.cached,
+                "seconds": round(self.seconds, 4)}
+
+class BaselineStore:
+    """One baseline manifest per CapCut root, all in one JSON file
+
+        {"<root>": {"folder": "5.0.0.1886", "version": ..., "created": ..., "files": {relative: {size, sha256}}}}
+    """
+    _shared_lock = threading.Lock() # Fleet profiles may share one integrity.json
+
+    def __init__(self, path, fs=LOCAL_FS):
+        self.path = Path(path)
+        self.fs = fs
+
+    def _load(self):
+        try:
+            with self.fs.open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, root):
+        return self._load().get(os.path.normcase(str(root)))
+
+    def put(self, root, manifest):
+        with BaselineStore._shared_lock:
+            baselines = self._load()
+            baselines[os.path.normcase(str(root))] = manifest
+            self.fs.mkdir(self.path.parent, parents=True, exist_ok=True)
+            atomic_write(self.path, json.dumps(baselines).encode(), self.fs)
@@ -0,0 +1,257 @@
+"""Installed CapCut versions, read from the version resource of each CapCut.exe
+
+Picking the active version by sorting the Apps folder names deleted the
+wrong one after a downgrade: the higher-numbered folder left behind won. The
+inventory reads the VS_VERSIONINFO resource of Apps/<folder>/CapCut.exe
+through mmap, so only the header, section table and resource pages of a
+100+ MB binary are ever paged in. Results are cached on (path, size, mtime)
+in inventory.json, so a repeat scan costs one stat per folder.
+
+The active version is, in order of trust: the one configure.ini launches
+(unless block already replaced it with BLOCKED_VERSION), the most recently
+installed folder with a readable CapCut.exe, and only when no folder has
+one, the highest folder name as before.
+"""
+import json
+import os
+import re
+import struct
+import threading
+from pathlib import Path
+
+from capcut_fs import LOCAL_FS
+from capcut_rules import BLOCKED_VERSION
+
+EXE_NAME = "CapCut.exe"
+RT_VERSION = 16
+VS_FIXEDFILEINFO_SIGNATURE = 0xFEEF04BD
+VS_VERSION_INFO_KEY = "VS_VERSION_INFO\0".encode("utf-16-le")
+PE32_MAGIC = 0x10B
+PE32_PLUS_MAGIC = 0x20B
+RESOURCE_DIRECTORY = 2 # Index of the resource table among the data directories
+
+class PEFormatError(ValueError):
+    """Not a PE file, or one without a version resource"""
+
+def _rva_to_offset(sections, rva):
+    for address, size, raw_size, raw_offset in sections:
+        if address <= rva < address + max(size, raw_size):
+            return rva - address + raw_offset
+    raise PEFormatError(f"RVA {rva:#x} is outside every section")
+
+def _first_entry(data, directory, wanted_id=None):
+    """OffsetToData of the entry with wanted_id (or the first entry) of an IMAGE_RESOURCE_DIRECTORY"""
+    named, ids = struct.unpack_from("<HH", data, directory + 12)
+    for n in range(named + ids):
+        name, target = struct.unpack_from("<II", data, directory + 16 + n * 8)
+        if wanted_id is None or (not name & 0x80000000 and name == wanted_id):
+            return target
+    raise PEFormatError("No version resource")
+
+def parse_pe_version(data):
+    """The file version ("5.0.0.1886") in a PE image given as bytes, mmap or memoryview"""
+    try:
+        if data[:2] != b"MZ":
+            raise PEFormatError("No MZ header")
+        pe = struct.unpack_from("<I", data, 0x3C)[0]
+        if data[pe:pe + 4] != b"PE\0\0":
+            raise PEFormatError("No PE signature")
+        section_count, = struct.unpack_from("<H", data, pe + 6)
+        optional_size, = struct.unpack_from("<H", data, pe + 20)
+        optional = pe + 24
+        magic, = struct.unpack_from("<H", data, optional)
+        if magic == PE32_MAGIC:
+            count_at, directories = optional + 92, optional + 96
+        elif magic == PE32_PLUS_MAGIC:
+            count_at, directories = optional + 108, optional + 112
+        else:
+            raise PEFormatError(f"Unknown optional header magic {magic:#x}")
+        if struct.unpack_from("<I", data, count_at)[0] <= RESOURCE_DIRECTORY:
+            raise PEFormatError("No resource table")
+        resource_rva, resource_size = struct.unpack_from("<II", data, directories + RESOURCE_DIRECTORY * 8)
+        if not resource_rva or not resource_size:
+            raise PEFormatError("No resource table")
+        table = optional + optional_size
+        sections = []
+        for n in range(section_count):
+            size, address, raw_size, raw_offset = struct.unpack_from("<IIII", data, table + n * 40 + 8)
+            sections.append((address, size, raw_size, raw_offset))
+
+        # Type (RT_VERSION) -> name -> language -> IMAGE_RESOURCE_DATA_ENTRY
+        root = _rva_to_offset(sections, resource_rva)
+        target = _first_entry(data, root, RT_VERSION)
+        for _ in range(2):
+            if not target & 0x80000000:
+                raise PEFormatError("Malformed resource directory")
+            target = _first_entry(data, root + (target & 0x7FFFFFFF))
+        if target & 0x80000000:
+            raise PEFormatError("Malformed resource directory")
+        block_rva, = struct.unpack_from("<I", data, root + target)
+        block = _rva_to_offset(sections, block_rva)
+
+        # VS_VERSIONINFO: wLength, wValueLength, wType, szKey, padding, VS_FIXEDFILEINFO
+        key_end = block + 6 + len(VS_VERSION_INFO_KEY)
+        if data[block + 6:key_end] != VS_VERSION_INFO_KEY:
+            raise PEFormatError("Malformed VS_VERSIONINFO")
+        fixed = (key_end + 3) & ~3
+        signature, _, most, least = struct.unpack_from("<IIII", data, fixed)
+        if signature != VS_FIXEDFILEINFO_SIGNATURE:
+            raise PEFormatError("Malformed VS_FIXEDFILEINFO")
+    except (struct.error, IndexError):
+        raise PEFormatError("Truncated PE file") from None
+    return f"{most >> 16}.{most & 0xFFFF}.{least >> 16}.{least & 0xFFFF}"
+
+def read_pe_version(path, fs=LOCAL_FS):
+    """parse_pe_version() of a file, mapped rather than read; raises OSError or PEFormatError"""
+    with fs.map_file(path) as view:
+        if len(view) < 64:
+            raise PEFormatError("Too small for a PE file")
+        return parse_pe_version(view)
+
+def version_key(version):
+    return [int(p) for p in re.findall(r"\d+", version or "")]
+
+def configured_version(apps_path, fs=LOCAL_FS):
+    """last_version from Apps/configure.ini, or None"""
+    try:
+        with fs.open(Path(apps_path) / "configure.ini", 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                key, _, value = line.partition("=")
+                if key.strip() == "last_version":
+                    return value.strip() or None
+    except OSError:
+        pass
+    return None
+
+class InstalledVersion:
+    """One version folder under Apps
+
+    version comes from CapCut.exe; it is None when the exe is missing or
+    unreadable (an interrupted install, or a folder left half-deleted).
+    """
+    def __init__(self, path, version, installed):
+        self.path = Path(path)
+        self.version = version
+        self.installed = installed # Folder mtime: when files were last added
+
+    @property
+    def name(self):
+        return self.path.name
+
+    @property
+    def label(self):
+        return self.version or self.name
+
+    @property
+    def mismatch(self):
+        """CapCut.exe reports a different version than the folder name"""
+        return self.version is not None and self.version != self.name
+
+    def as_dict(self):
+        return {"folder": self.name, "version": self.version, "mismatch": self.mismatch}
+
+class Installation:
+    """Result of VersionInventory.scan(): every version folder and which one runs
+
+    reason says how active was chosen: "configure.ini", "newest install" or
+    "folder name".
+    """
+    def __init__(self, versions, configured, active, reason):
+        self.versions = versions
+        self.configured = configured
+        self.active = active
+        self.reason = reason
+
+    @property
+    def others(self):
+        return [v for v in self.versions if v is not self.active]
+
+    def as_dict(self):
+        return {"active": self.active.as_dict() if self.active else None, "reason": self.reason,
+                "configured": self.configured, "versions": [v.as_dict() for v in self.versions]}
+
+class VersionInventory:
+    """Reads and caches the version of every Apps/<folder>/CapCut.exe
+
+    The cache maps each exe path to [size, mtime_ns, version] and is kept in
+    cache_path (if given) across runs; any change to the file re-reads it.
+    """
+    _shared_lock = threading.Lock() # Fleet profiles share one inventory.json
+
+    def __init__(self, cache_path=None, fs=LOCAL_FS):
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.fs = fs
+        self.reads = 0 # Files actually parsed, for the benchmarks
+        self._cache = None
+        self._dirty = False
+
+    def _load(self):
+        if self._cache is None:
+            self._cache = {}
+            if self.cache_path:
+                try:
+                    with self.fs.open(self.cache_path, 'r') as f:
+                        self._cache = json.load(f)
+                except (OSError, ValueError):
+                    pass
+        return self._cache
+
+    def _save(self):
+        if not self.cache_path or not self._dirty:
+            return
+        try:
+            self.fs.mkdir(self.cache_path.parent, parents=True, exist_ok=True)
+            tmp = self.cache_path.with_suffix(f".{threading.get_ident()}.tmp")
+            with self.fs.open(tmp, 'w') as f:
+                json.dump(self._cache, f, indent=1)
+            self.fs.replace(tmp, self.cache_path)
+            self._dirty = False
+        except OSError:
+            pass # Only a cache; the next scan reads the headers again
+
+    def exe_version(self, exe_path):
+        """Version of one CapCut.exe, or None if it is missing or not a valid PE"""
+        key = str(exe_path)
+        try:
+            st = self.fs.stat(key)
+        except OSError:
+            return None
+        cache = self._load()
+        cached = cache.get(key)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        self.reads += 1
+        try:
+            version = read_pe_version(key, self.fs)
+        except (OSError, PEFormatError, ValueError):
+            version = None
+        cache[key] = [st.st_size, st.st_mtime_ns, version]
+        self._dirty = True
+        return version
+
+    def scan(self, apps_path):
+        """Inventory apps_path and decide which version is active; returns an Installation"""
+        apps_path = Path(apps_path)
+        versions = []
+        with VersionInventory._shared_lock:
+            try:
+                with self.fs.scandir(apps_path) as entries:
+                    for entry in entries:
+                        if entry.name[0].isdigit() and entry.is_dir():
+                            version = self.exe_version(os.path.join(entry.path, EXE_NAME))
+                            versions.append(InstalledVersion(entry.path, version, entry.stat().st_mtime))
+            except OSError:
+                pass
+            self._save()
+        versions.sort(key=lambda v: version_key(v.label), reverse=True)
+        configured = configured_version(apps_path, self.fs)
+
+        if configured and configured != BLOCKED_VERSION:
+            for wanted in (lambda v: v.version == configured, lambda v: v.name == configured):
+                match = next((v for v in versions if wanted(v)), None)
+                if match:
+                    return Installation(versions, configured, match, "configure.ini")
+        readable = [v for v in versions if v.version]
+        if readable:
+            return Installation(versions, configured, max(readable, key=lambda v: v.installed), "newest install")
+        return Installation(versions, configured, versions[0] if versions else None, "folder name")
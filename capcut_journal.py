@@ -0,0 +1,105 @@
+"""Write-ahead journal and atomic file replacement for block and restore
+
+A run journals the steps it intends to take before touching anything and
+marks each one done as it finishes, fsync'ing every record. Files are
+replaced with write-temp, fsync, rename, so a step has either fully happened
+or not at all; nothing is left half-written. If the process dies mid-run,
+recover() redoes only the steps not marked done on the next start. A run
+that completes deletes its journal, so the no-crash cost is a few small
+appends.
+"""
+import json
+import os
+import time
+from pathlib import Path
+
+from capcut_fs import LOCAL_FS
+
+def atomic_write(path, data, fs=LOCAL_FS):
+    """Replace path with data: write a temp file beside it, fsync, then rename over it"""
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.{os.urandom(4).hex()}.tmp")
+    try:
+        with fs.open(tmp, 'wb') as f:
+            f.write(data)
+            f.flush()
+            fs.fsync(f)
+        fs.replace(tmp, path)
+    except OSError:
+        try: fs.unlink(tmp)
+        except OSError: pass
+        raise
+    fs.fsync_dir(path.parent)
+
+class Journal:
+    """Append-only JSON-lines journal of one run at a time
+
+    The begin record lists every step the run intends to take; each finished
+    step appends a done record:
+
+        {"op": "begin", "action": "block", "root": ..., "steps": [{"step": 1, "kind": "lock", "rule": "configure.ini"}, ...]}
+        {"op": "done", "step": 1}
+    """
+    def __init__(self, path, fs=LOCAL_FS):
+        self.path = Path(path) if path else None # None: nowhere to keep it, so nothing is recorded
+        self.fs = fs
+
+    def _append(self, record):
+        if self.path is None:
+            return
+        self.fs.mkdir(self.path.parent, parents=True, exist_ok=True)
+        with self.fs.open(self.path, 'a') as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            self.fs.fsync(f)
+
+    def begin(self, action, root, steps, **fields):
+        """Record the intent of a whole run; steps are dicts, numbered from 1 here"""
+        steps = [dict(step, step=number) for number, step in enumerate(steps, 1)]
+        self._append(dict(op="begin", action=action, root=str(root), time=time.time(), steps=steps, **fields))
+        return steps
+
+    def done(self, step):
+        self._append({"op": "done", "step": step})
+
+    def clear(self):
+        """The run finished: drop the journal"""
+        if self.path is None:
+            return
+        try:
+            self.fs.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def unfinished(self):
+        """Return (begin record, [steps not marked done]) or (None, [])
+
+        Records that are not what begin() and done() write are skipped, so a
+        damaged journal costs the recovery, never the run that reads it.
+        """
+        if self.path is None:
+            return None, []
+        try:
+            with self.fs.open(self.path, 'r') as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return None, []
+        begin, finished = None, set()
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break # A torn final append; that step is redone
+            if not isinstance(record, dict):
+                continue
+            op = record.get("op")
+            if op == "begin":
+                if isinstance(record.get("steps"), list) and isinstance(record.get("action"), str) \
+                        and isinstance(record.get("root"), str):
+                    begin, finished = record, set()
+            elif op == "done":
+                finished.add(record.get("step"))
+        if begin is None:
+            return None, []
+        return begin, [step for step in begin["steps"]
+                       if isinstance(step, dict) and "step" in step and step["step"] not in finished]
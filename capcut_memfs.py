@@ -0,0 +1,498 @@
+"""An in-memory filesystem and platform backend for hermetic runs
+
+MemoryBackend implements the capcut_fs methods and the platform backend
+methods (attributes, process lookup and termination) on a tree of nodes in
+memory, so a CapCutBlocker built with platform=MemoryBackend() blocks,
+verifies and restores without touching the disk, in microseconds per step:
+
+    fs = MemoryBackend()
+    fs.add_file(root / "Apps" / "configure.ini", b"last_version=5.0.0\\n")
+    fs.start_process("CapCut.exe")
+    blocker = CapCutBlocker(root, platform=fs)
+
+It models what the blocker depends on, with Windows semantics: file sizes
+(contents optional, a size-only file reads as zeros), the read-only bit and
+the hidden/system attributes (a read-only file cannot be written, replaced
+or deleted, a hidden or system one cannot be overwritten), mtimes that
+change on every write, and directory mtimes that change when an entry is
+added, removed or renamed. Failures are injected with deny() for one
+operation on one path, and hold() for a file a running process keeps open
+until it is killed. There are no symlinks.
+"""
+import errno
+import io
+import os
+import stat
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from capcut_platform import FILE_ATTRIBUTE_HIDDEN, FILE_ATTRIBUTE_NORMAL, FILE_ATTRIBUTE_READONLY, FILE_ATTRIBUTE_SYSTEM, KILL_TIMEOUT
+
+FILE_ATTRIBUTE_DIRECTORY = 0x10
+DENY_OPS = ("read", "write", "delete", "rename", "attributes")
+MEMORY_DEVICE = 0x4D454D # st_dev of every node
+
+def _error(kind, code, path):
+    return kind(code, os.strerror(code), str(path))
+
+class _Node:
+    __slots__ = ("is_dir", "data", "size", "attributes", "mtime_ns", "ino", "children")
+
+    def __init__(self, is_dir, ino, mtime_ns):
+        self.is_dir = is_dir
+        self.data = None # None: size bytes of zeros
+        self.size = 0
+        self.attributes = 0
+        self.mtime_ns = mtime_ns
+        self.ino = ino
+        self.children = {} if is_dir else None
+
+    @property
+    def readonly(self):
+        return bool(self.attributes & FILE_ATTRIBUTE_READONLY)
+
+    def content(self):
+        return self.data if self.data is not None else bytes(self.size)
+
+class MemoryStat:
+    """The os.stat_result fields the blocker reads, plus st_file_attributes as on Windows"""
+    def __init__(self, node):
+        if node.is_dir:
+            self.st_mode = stat.S_IFDIR | 0o777
+            self.st_file_attributes = node.attributes | FILE_ATTRIBUTE_DIRECTORY
+        else:
+            self.st_mode = stat.S_IFREG | (0o444 if node.readonly else 0o666)
+            self.st_file_attributes = node.attributes or FILE_ATTRIBUTE_NORMAL
+        self.st_ino = node.ino
+        self.st_dev = MEMORY_DEVICE
+        self.st_nlink = 1
+        self.st_uid = self.st_gid = 0
+        self.st_size = 0 if node.is_dir else node.size
+        self.st_mtime_ns = self.st_atime_ns = self.st_ctime_ns = node.mtime_ns
+        self.st_mtime = self.st_atime = self.st_ctime = node.mtime_ns / 1e9
+
+class MemoryDirEntry:
+    """os.DirEntry for a MemoryBackend node"""
+    def __init__(self, name, path, node):
+        self.name = name
+        self.path = path
+        self._node = node
+
+    def is_dir(self, follow_symlinks=True):
+        return self._node.is_dir
+
+    def is_file(self, follow_symlinks=True):
+        return not self._node.is_dir
+
+    def is_symlink(self):
+        return False
+
+    def stat(self, follow_symlinks=True):
+        return MemoryStat(self._node)
+
+    def inode(self):
+        return self._node.ino
+
+class _ScandirIterator:
+    def __init__(self, entries):
+        self._entries = iter(entries)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._entries = iter(())
+
+class MemoryFile(io.BytesIO):
+    """A file opened on a MemoryBackend; what was written lands in the node on flush and close"""
+    def __init__(self, fs, node, data, writable, append):
+        super().__init__(data)
+        self._fs = fs
+        self._node = node
+        self._writable = writable
+        self._append = append
+        self._dirty = False
+        if append:
+            self.seek(0, io.SEEK_END)
+
+    def writable(self):
+        return self._writable
+
+    def write(self, data):
+        if not self._writable:
+            raise io.UnsupportedOperation("not writable")
+        if self._append:
+            self.seek(0, io.SEEK_END)
+        self._dirty = True
+        return super().write(data)
+
+    def truncate(self, size=None):
+        if not self._writable:
+            raise io.UnsupportedOperation("not writable")
+        self._dirty = True
+        return super().truncate(size)
+
+    def flush(self):
+        if self._dirty and not self.closed:
+            self._fs._store(self._node, self.getvalue())
+            self._dirty = False
+        super().flush()
+
+    def close(self):
+        if not self.closed:
+            self.flush()
+        super().close()
+
+class MemoryBackend:
+    """Filesystem and platform backend on an in-memory tree; see the module docstring"""
+    name = "memory"
+    native = False
+
+    def __init__(self):
+        self.spawns = 0
+        self.processes = {} # pid -> image name
+        self.unkillable = set() # pids kill_processes() cannot end
+        self._lock = threading.RLock()
+        self._split = {} # path string -> parts
+        self._last_ns = 0
+        self._next_ino = 1
+        self._root = self._new(True)
+        self._denied = {} # path parts -> {operation}
+        self._held = {} # path parts -> pid that keeps the file open
+        self._next_pid = 1000
+
+    # --- Tree ---
+
+    def _now(self):
+        # Strictly increasing, so every change is visible to mtime-keyed caches
+        self._last_ns = max(time.time_ns(), self._last_ns + 1000)
+        return self._last_ns
+
+    def _new(self, is_dir):
+        node = _Node(is_dir, self._next_ino, self._now())
+        self._next_ino += 1
+        return node
+
+    def _parts(self, path):
+        # Either separator, as on Windows; memoized since the same few paths are looked up over and over
+        key = os.fspath(path)
+        parts = self._split.get(key)
+        if parts is None:
+            parts = self._split[key] = tuple(part for part in key.replace("\\", "/").split("/") if part)
+        return parts
+
+    def _find(self, parts):
+        node = self._root
+        for part in parts:
+            if not node.is_dir:
+                return None
+            node = node.children.get(part)
+            if node is None:
+                return None
+        return node
+
+    def _get(self, path):
+        node = self._find(self._parts(path))
+        if node is None:
+            raise _error(FileNotFoundError, errno.ENOENT, path)
+        return node
+
+    def _parent(self, path):
+        """(parent directory node, name) of path; the parent must exist"""
+        parts = self._parts(path)
+        parent = self._find(parts[:-1])
+        if parent is None:
+            raise _error(FileNotFoundError, errno.ENOENT, path)
+        if not parent.is_dir:
+            raise _error(NotADirectoryError, errno.ENOTDIR, path)
+        return parent, parts[-1]
+
+    def _check(self, path, operation):
+        """Raise PermissionError for a denied operation or a file a live process holds open"""
+        parts = self._parts(path)
+        if operation in self._denied.get(parts, ()):
+            raise _error(PermissionError, errno.EACCES, path)
+        if operation in ("write", "delete", "rename"):
+            for held, pid in self._held.items():
+                if pid in self.processes and held[:len(parts)] == parts:
+                    raise _error(PermissionError, errno.EBUSY, path)
+
+    def _store(self, node, data):
+        with self._lock:
+            node.data = bytes(data)
+            node.size = len(node.data)
+            node.mtime_ns = self._now()
+
+    # --- Building scenarios ---
+
+    def add_dir(self, path):
+        self.mkdir(path, parents=True, exist_ok=True)
+
+    def add_file(self, path, data=b"", size=None, readonly=False, hidden=False, system=False):
+        """Create (or overwrite) a file and its parents; size without data makes a file of zeros"""
+        with self._lock:
+            self.mkdir(Path(path).parent, parents=True, exist_ok=True)
+            parent, name = self._parent(path)
+            node = parent.children.get(name)
+            if node is None:
+                node = parent.children[name] = self._new(False)
+                parent.mtime_ns = node.mtime_ns
+            if size is None:
+                self._store(node, data)
+            else:
+                node.data, node.size = None, size
+            node.attributes = ((FILE_ATTRIBUTE_READONLY if readonly else 0) | (FILE_ATTRIBUTE_HIDDEN if hidden else 0)
+                               | (FILE_ATTRIBUTE_SYSTEM if system else 0))
+
+    def deny(self, path, *operations):
+        """Make the given operations (default: all of DENY_OPS) on path raise PermissionError"""
+        for operation in operations:
+            if operation not in DENY_OPS:
+                raise ValueError(f"Unknown operation: {operation}")
+        self._denied.setdefault(self._parts(path), set()).update(operations or DENY_OPS)
+
+    def allow(self, path):
+        self._denied.pop(self._parts(path), None)
+
+    def start_process(self, name, killable=True):
+        """Pretend name is running; return its pid"""
+        with self._lock:
+            pid = self._next_pid
+            self._next_pid += 4
+            self.processes[pid] = name
+            if not killable:
+                self.unkillable.add(pid)
+            return pid
+
+    def hold(self, path, pid):
+        """path is open in process pid: no write, delete or rename of it (or its folders) until pid ends"""
+        self._held[self._parts(path)] = pid
+
+    def attributes(self, path):
+        with self._lock:
+            return self._get(path).attributes
+
+    # --- capcut_fs methods ---
+
+    def stat(self, path):
+        with self._lock:
+            return MemoryStat(self._get(path))
+
+    lstat = stat
+
+    def exists(self, path):
+        with self._lock:
+            return self._find(self._parts(path)) is not None
+
+    def isdir(self, path):
+        with self._lock:
+            node = self._find(self._parts(path))
+            return node is not None and node.is_dir
+
+    def islink(self, path):
+        return False
+
+    def scandir(self, path):
+        with self._lock:
+            node = self._get(path)
+            if not node.is_dir:
+                raise _error(NotADirectoryError, errno.ENOTDIR, path)
+            self._check(path, "read")
+            base = str(path)
+            return _ScandirIterator([MemoryDirEntry(name, os.path.join(base, name), child)
+                                     for name, child in node.children.items()])
+
+    def mkdir(self, path, parents=False, exist_ok=False):
+        with self._lock:
+            node = self._find(self._parts(path))
+            if node is not None:
+                if node.is_dir and exist_ok:
+                    return
+                raise _error(FileExistsError, errno.EEXIST, path)
+            if parents and self._find(self._parts(path)[:-1]) is None:
+                self.mkdir(Path(path).parent, parents=True, exist_ok=True)
+            parent, name = self._parent(path)
+            self._check(path, "write")
+            child = parent.children[name] = self._new(True)
+            parent.mtime_ns = child.mtime_ns
+
+    def open(self, path, mode='r', buffering=-1, encoding=None, errors=None):
+        kind = mode.replace('b', '').replace('t', '')
+        writable = kind != 'r'
+        with self._lock:
+            node = self._find(self._parts(path))
+            if node is not None and node.is_dir:
+                raise _error(IsADirectoryError, errno.EISDIR, path)
+            if kind.startswith('r'):
+                if node is None:
+                    raise _error(FileNotFoundError, errno.ENOENT, path)
+                self._check(path, "read")
+            if writable:
+                if node is not None and kind.startswith('x'):
+                    raise _error(FileExistsError, errno.EEXIST, path)
+                if node is not None and node.readonly:
+                    raise _error(PermissionError, errno.EACCES, path)
+                if node is not None and kind[0] == 'w' and node.attributes & (FILE_ATTRIBUTE_HIDDEN | FILE_ATTRIBUTE_SYSTEM):
+                    raise _error(PermissionError, errno.EACCES, path) # CREATE_ALWAYS refuses hidden/system files
+                self._check(path, "write")
+                if node is None:
+                    parent, name = self._parent(path)
+                    node = parent.children[name] = self._new(False)
+                    node.data = b""
+                    parent.mtime_ns = node.mtime_ns
+                if kind[0] in 'wx':
+                    self._store(node, b"") # Truncated on open, as on disk
+            data = node.content()
+        f = MemoryFile(self, node, data, writable, kind.startswith('a'))
+        if 'b' in mode:
+            return f
+        return io.TextIOWrapper(f, encoding=encoding or 'utf-8', errors=errors)
+
+    def read_bytes(self, path):
+        with self.open(path, 'rb') as f:
+            return f.read()
+
+    def touch(self, path):
+        with self._lock:
+            node = self._find(self._parts(path))
+            if node is None:
+                self.open(path, 'ab').close()
+            else:
+                self._check(path, "attributes")
+                node.mtime_ns = self._now()
+
+    def _move(self, src, dest, replace):
+        with self._lock:
+            node = self._get(src)
+            self._check(src, "rename")
+            dest_parent, dest_name = self._parent(dest)
+            existing = dest_parent.children.get(dest_name)
+            if existing is node:
+                return
+            if existing is not None:
+                if not replace:
+                    raise _error(FileExistsError, errno.EEXIST, dest) # Windows never renames over a file
+                if existing.is_dir:
+                    raise _error(IsADirectoryError, errno.EISDIR, dest)
+                if existing.readonly:
+                    raise _error(PermissionError, errno.EACCES, dest)
+                self._check(dest, "delete")
+            src_parent, src_name = self._parent(src)
+            del src_parent.children[src_name]
+            dest_parent.children[dest_name] = node
+            src_parent.mtime_ns = dest_parent.mtime_ns = self._now()
+
+    def rename(self, src, dest):
+        self._move(src, dest, replace=False)
+
+    def replace(self, src, dest):
+        self._move(src, dest, replace=True)
+
+    def link(self, src, dest):
+        with self._lock:
+            node = self._get(src)
+            if node.is_dir:
+                raise _error(PermissionError, errno.EPERM, src)
+            parent, name = self._parent(dest)
+            if name in parent.children:
+                raise _error(FileExistsError, errno.EEXIST, dest)
+            parent.children[name] = node # The same node: a write through either name shows in both
+            parent.mtime_ns = self._now()
+
+    def unlink(self, path):
+        with self._lock:
+            node = self._get(path)
+            if node.is_dir:
+                raise _error(IsADirectoryError, errno.EISDIR, path)
+            if node.readonly:
+                raise _error(PermissionError, errno.EACCES, path)
+            self._check(path, "delete")
+            parent, name = self._parent(path)
+            del parent.children[name]
+            parent.mtime_ns = self._now()
+
+    def rmdir(self, path):
+        with self._lock:
+            node = self._get(path)
+            if not node.is_dir:
+                raise _error(NotADirectoryError, errno.ENOTDIR, path)
+            if node.children:
+                raise _error(OSError, errno.ENOTEMPTY, path)
+            self._check(path, "delete")
+            parent, name = self._parent(path)
+            del parent.children[name]
+            parent.mtime_ns = self._now()
+
+    def chmod(self, path, mode):
+        with self._lock:
+            node = self._get(path)
+            self._check(path, "attributes")
+            if mode & stat.S_IWUSR:
+                node.attributes &= ~FILE_ATTRIBUTE_READONLY
+            else:
+                node.attributes |= FILE_ATTRIBUTE_READONLY
+
+    def utime(self, path, times):
+        with self._lock:
+            node = self._get(path)
+            self._check(path, "attributes")
+            node.mtime_ns = int(times[1] * 1e9) if times else self._now()
+
+    def fsync(self, f):
+        f.flush()
+
+    def fsync_dir(self, path):
+        pass
+
+    @contextmanager
+    def map_file(self, path):
+        with self._lock:
+            node = self._get(path)
+            self._check(path, "read")
+            data = node.content()
+        yield memoryview(data)
+
+    # --- Platform backend methods ---
+
+    def is_readonly(self, path):
+        return self.stat(path).st_mode & stat.S_IWUSR == 0
+
+    def set_readonly(self, path):
+        with self._lock:
+            node = self._get(path)
+            self._check(path, "attributes")
+            node.attributes |= FILE_ATTRIBUTE_READONLY
+
+    def clear_attributes(self, path):
+        """Equivalent of attrib -r -s -h"""
+        with self._lock:
+            node = self._get(path)
+            self._check(path, "attributes")
+            node.attributes &= ~(FILE_ATTRIBUTE_READONLY | FILE_ATTRIBUTE_SYSTEM | FILE_ATTRIBUTE_HIDDEN)
+
+    def find_processes(self, names):
+        wanted = {name.lower() for name in names}
+        with self._lock:
+            return [pid for pid, name in self.processes.items() if name.lower() in wanted]
+
+    def kill_processes(self, names, timeout=KILL_TIMEOUT):
+        """End the matching processes at once; return the pids that would not die"""
+        with self._lock:
+            survivors = []
+            for pid in self.find_processes(names):
+                if pid in self.unkillable:
+                    survivors.append(pid)
+                else:
+                    del self.processes[pid]
+            return survivors
@@ -0,0 +1,246 @@
+"""Platform backends for file attributes and process termination
+
+Locking used to spawn attrib.exe for every file and taskkill.exe for every
+image name, followed by a fixed one-second sleep. The native backends do the
+same work in-process: SetFileAttributesW/GetFileAttributesW and a Toolhelp
+process scan on Windows, os.chmod and /proc on POSIX. Termination polls until
+the processes are gone (or a deadline passes) instead of sleeping blindly.
+
+Every backend counts the processes it spawns in `spawns` (and in the
+"subprocesses" trace counter), so a full block/restore cycle can be checked
+for zero subprocesses. Each is also the filesystem its blocker works
+through (see capcut_fs); capcut_memfs.MemoryBackend stands in for both.
+"""
+import os
+import signal
+import stat
+import sys
+import time
+
+from capcut_fs import OSFileSystem
+from capcut_trace import count, span
+
+KILL_TIMEOUT = 5.0 # Seconds to wait for CapCut to exit after terminating it
+KILL_POLL_INTERVAL = 0.02
+
+FILE_ATTRIBUTE_READONLY = 0x1
+FILE_ATTRIBUTE_HIDDEN = 0x2
+FILE_ATTRIBUTE_SYSTEM = 0x4
+FILE_ATTRIBUTE_NORMAL = 0x80
+INVALID_FILE_ATTRIBUTES = 0xFFFFFFFF
+
+class PosixBackend(OSFileSystem):
+    """os.chmod / os.stat and /proc based backend (Linux, and for tests)"""
+    name = "posix"
+
+    def __init__(self):
+        self.spawns = 0
+
+    def is_readonly(self, path):
+        return not (os.stat(path).st_mode & stat.S_IWUSR)
+
+    def set_readonly(self, path):
+        os.chmod(path, 0o444)
+
+    def clear_attributes(self, path):
+        os.chmod(path, 0o666)
+
+    def find_processes(self, names):
+        """Return pids whose executable name matches one of names (case-insensitive)"""
+        # /proc/<pid>/comm is truncated to 15 characters
+        wanted = {name.lower()[:15] for name in names}
+        pids = []
+        try:
+            entries = os.listdir("/proc")
+        except OSError:
+            return pids
+        for entry in entries:
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/comm", "r") as f:
+                    comm = f.read().strip().lower()
+            except OSError:
+                continue
+            if comm in wanted:
+                pids.append(int(entry))
+        return pids
+
+    def _alive(self, pid):
+        try:
+            with open(f"/proc/{pid}/stat", "r") as f:
+                # Field 3 is the state; a zombie has already exited
+                return f.read().rpartition(")")[2].split()[0] != "Z"
+        except (OSError, IndexError):
+            return False
+
+    def kill_processes(self, names, timeout=KILL_TIMEOUT):
+        """Terminate matching processes and wait for them; return pids still alive"""
+        pids = self.find_processes(names)
+        for pid in pids:
+            try: os.kill(pid, signal.SIGTERM)
+            except OSError: pass
+        deadline = time.monotonic() + timeout
+        while pids and time.monotonic() < deadline:
+            pids = [pid for pid in pids if self._alive(pid)]
+            if pids:
+                time.sleep(KILL_POLL_INTERVAL)
+        for pid in pids:
+            try: os.kill(pid, signal.SIGKILL)
+            except OSError: pass
+        return pids
+
+class WindowsBackend(OSFileSystem):
+    """Native Win32 backend through ctypes: no attrib.exe or taskkill.exe"""
+    name = "windows"
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+        self.spawns = 0
+        self._ctypes = ctypes
+        k32 = ctypes.WinDLL("kernel32", use_last_error=True)
+
+        k32.GetFileAttributesW.argtypes = [wintypes.LPCWSTR]
+        k32.GetFileAttributesW.restype = wintypes.DWORD
+        k32.SetFileAttributesW.argtypes = [wintypes.LPCWSTR, wintypes.DWORD]
+        k32.SetFileAttributesW.restype = wintypes.BOOL
+
+        class PROCESSENTRY32W(ctypes.Structure):
+            _fields_ = [
+                ("dwSize", wintypes.DWORD),
+                ("cntUsage", wintypes.DWORD),
+                ("th32ProcessID", wintypes.DWORD),
+                ("th32DefaultHeapID", ctypes.c_size_t),
+                ("th32ModuleID", wintypes.DWORD),
+                ("cntThreads", wintypes.DWORD),
+                ("th32ParentProcessID", wintypes.DWORD),
+                ("pcPriClassBase", wintypes.LONG),
+                ("dwFlags", wintypes.DWORD),
+                ("szExeFile", wintypes.WCHAR * 260),
+            ]
+        self._entry_type = PROCESSENTRY32W
+
+        k32.CreateToolhelp32Snapshot.argtypes = [wintypes.DWORD, wintypes.DWORD]
+        k32.CreateToolhelp32Snapshot.restype = wintypes.HANDLE
+        k32.Process32FirstW.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESSENTRY32W)]
+        k32.Process32FirstW.restype = wintypes.BOOL
+        k32.Process32NextW.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESSENTRY32W)]
+        k32.Process32NextW.restype = wintypes.BOOL
+        k32.OpenProcess.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.DWORD]
+        k32.OpenProcess.restype = wintypes.HANDLE
+        k32.TerminateProcess.argtypes = [wintypes.HANDLE, wintypes.UINT]
+        k32.TerminateProcess.restype = wintypes.BOOL
+        k32.WaitForSingleObject.argtypes = [wintypes.HANDLE, wintypes.DWORD]
+        k32.WaitForSingleObject.restype = wintypes.DWORD
+        k32.CloseHandle.argtypes = [wintypes.HANDLE]
+        k32.CloseHandle.restype = wintypes.BOOL
+        self._k32 = k32
+
+    def _get(self, path):
+        attributes = self._k32.GetFileAttributesW(str(path))
+        if attributes == INVALID_FILE_ATTRIBUTES:
+            raise self._ctypes.WinError(self._ctypes.get_last_error())
+        return attributes
+
+    def _set(self, path, attributes):
+        if not self._k32.SetFileAttributesW(str(path), attributes or FILE_ATTRIBUTE_NORMAL):
+            raise self._ctypes.WinError(self._ctypes.get_last_error())
+
+    def is_readonly(self, path):
+        return bool(self._get(path) & FILE_ATTRIBUTE_READONLY)
+
+    def set_readonly(self, path):
+        attributes = self._get(path) & ~FILE_ATTRIBUTE_NORMAL
+        self._set(path, attributes | FILE_ATTRIBUTE_READONLY)
+
+    def clear_attributes(self, path):
+        """Equivalent of attrib -r -s -h"""
+        attributes = self._get(path)
+        self._set(path, attributes & ~(FILE_ATTRIBUTE_READONLY | FILE_ATTRIBUTE_SYSTEM | FILE_ATTRIBUTE_HIDDEN))
+
+    def find_processes(self, names):
+        wanted = {name.lower() for name in names}
+        snapshot = self._k32.CreateToolhelp32Snapshot(0x2, 0) # TH32CS_SNAPPROCESS
+        if not snapshot or snapshot == self._ctypes.c_void_p(-1).value:
+            return []
+        pids = []
+        try:
+            entry = self._entry_type()
+            entry.dwSize = self._ctypes.sizeof(entry)
+            more = self._k32.Process32FirstW(snapshot, self._ctypes.byref(entry))
+            while more:
+                if entry.szExeFile.lower() in wanted:
+                    pids.append(entry.th32ProcessID)
+                more = self._k32.Process32NextW(snapshot, self._ctypes.byref(entry))
+        finally:
+            self._k32.CloseHandle(snapshot)
+        return pids
+
+    def kill_processes(self, names, timeout=KILL_TIMEOUT):
+        """Terminate matching processes and wait for them; return pids still alive"""
+        PROCESS_TERMINATE, SYNCHRONIZE = 0x0001, 0x00100000
+        handles = []
+        for pid in self.find_processes(names):
+            handle = self._k32.OpenProcess(PROCESS_TERMINATE | SYNCHRONIZE, False, pid)
+            if not handle:
+                continue
+            self._k32.TerminateProcess(handle, 1)
+            handles.append((pid, handle))
+        deadline = time.monotonic() + timeout
+        remaining = []
+        for pid, handle in handles:
+            wait_ms = max(0, int((deadline - time.monotonic()) * 1000))
+            if self._k32.WaitForSingleObject(handle, wait_ms) != 0: # WAIT_OBJECT_0
+                remaining.append(pid)
+            self._k32.CloseHandle(handle)
+        return remaining
+
+class CommandBackend(OSFileSystem):
+    """The original attrib/taskkill behaviour, kept as a fallback and a baseline"""
+    name = "command"
+
+    def __init__(self):
+        self.spawns = 0
+
+    def _run(self, args):
+        import subprocess
+        self.spawns += 1
+        count("subprocesses")
+        try:
+            with span(args[0]):
+                subprocess.run(args, capture_output=True, check=False)
+        except OSError:
+            pass
+
+    def is_readonly(self, path):
+        return not os.access(path, os.W_OK)
+
+    def set_readonly(self, path):
+        self._run(["attrib", "+r", str(path)])
+        os.chmod(path, 0o444)
+
+    def clear_attributes(self, path):
+        self._run(["attrib", "-r", "-s", "-h", str(path)])
+        os.chmod(path, 0o666)
+
+    def kill_processes(self, names, timeout=KILL_TIMEOUT):
+        for name in names:
+            self._run(["taskkill", "/F", "/IM", name])
+        time.sleep(1)
+        return []
+
+_backend = None
+
+def get_platform_backend():
+    """Native backend for this OS, falling back to attrib/taskkill on failure"""
+    global _backend
+    if _backend is None:
+        if sys.platform == 'win32':
+            try:
+                _backend = WindowsBackend()
+            except (OSError, AttributeError):
+                _backend = CommandBackend()
+        else:
+            _backend = PosixBackend()
+    return _backend
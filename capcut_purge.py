@@ -0,0 +1,187 @@
+"""Rename-to-trash and parallel background deletion
+
+Deleting multi-GB cache folders inline made the lock steps wait. Targets are
+instead renamed into a trash folder on the same volume (instant), and the
+trash is emptied afterwards by a parallel os.scandir walker that counts files
+and bytes reclaimed and records every entry it could not delete.
+"""
+import os
+import stat
+import sys
+import threading
+import time
+from pathlib import Path
+
+from capcut_fs import LOCAL_FS
+
+TRASH_DIR_NAME = ".blocker_trash"
+PURGE_WORKERS = 8
+FILE_ATTRIBUTE_REPARSE_POINT = 0x400
+
+class PurgeReport:
+    """Counters for one purge run; safe to update from several workers"""
+    def __init__(self):
+        self.files = 0
+        self.dirs = 0
+        self.bytes = 0
+        self.failures = [] # [(path, error message)]
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add_file(self, size):
+        with self._lock:
+            self.files += 1
+            self.bytes += size
+
+    def add_dir(self):
+        with self._lock:
+            self.dirs += 1
+
+    def fail(self, path, error):
+        with self._lock:
+            self.failures.append((str(path), str(error)))
+
+    def merge(self, other):
+        self.files += other.files
+        self.dirs += other.dirs
+        self.bytes += other.bytes
+        self.failures.extend(other.failures)
+        self.seconds += other.seconds
+
+    def as_dict(self):
+        return {
+            "files": self.files,
+            "dirs": self.dirs,
+            "bytes": self.bytes,
+            "seconds": round(self.seconds, 4),
+            "failures": [{"path": p, "error": e} for p, e in self.failures],
+        }
+
+def move_to_trash(path, trash_root, fs=LOCAL_FS):
+    """Atomically move path into a fresh slot under trash_root; return the new path
+
+    trash_root must be on the same volume as path, so this is a rename and
+    never a copy. Raises OSError if the rename fails (e.g. a file is in use).
+    """
+    trash_root = Path(trash_root)
+    fs.mkdir(trash_root, parents=True, exist_ok=True)
+    dest = trash_root / f"{int(time.time() * 1000)}-{os.urandom(4).hex()}-{Path(path).name}"
+    fs.rename(path, dest)
+    return dest
+
+def is_link(entry):
+    """Symlinks and Windows junctions must be unlinked, never descended into"""
+    if entry.is_symlink():
+        return True
+    if sys.platform == 'win32':
+        attributes = getattr(entry.stat(follow_symlinks=False), 'st_file_attributes', 0)
+        return bool(attributes & FILE_ATTRIBUTE_REPARSE_POINT)
+    return False
+
+def _remove(path, remover, fs):
+    """Remove path, clearing the read-only bit once if that is what blocks it"""
+    try:
+        remover(path)
+    except PermissionError:
+        fs.chmod(path, stat.S_IWRITE | stat.S_IREAD)
+        remover(path)
+
+def purge_tree(root, workers=PURGE_WORKERS, report=None, cancelled=None, fs=LOCAL_FS):
+    """Delete root and everything below it with a parallel scandir walk
+
+    Each directory is one task: its files are unlinked in place and its
+    subdirectories become new tasks. Directories are removed deepest first
+    once the walk is done. Failures are recorded, never raised. Once
+    cancelled() is true no new directory is started; what is left stays
+    in place (in the trash) for the next purge and is not reported as a
+    failure.
+    """
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+    report = report or PurgeReport()
+    started = time.perf_counter()
+    root = str(root)
+
+    try:
+        if not fs.isdir(root) or fs.islink(root):
+            size = fs.lstat(root).st_size
+            _remove(root, fs.unlink, fs)
+            report.add_file(size)
+            report.seconds += time.perf_counter() - started
+            return report
+    except OSError as e:
+        report.fail(root, e)
+        report.seconds += time.perf_counter() - started
+        return report
+
+    def visit(path):
+        subdirs = []
+        if cancelled and cancelled():
+            return subdirs
+        with fs.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if is_link(entry):
+                        # A directory junction is removed like an empty folder
+                        _remove(entry.path, fs.rmdir if entry.is_dir() else fs.unlink, fs)
+                        report.add_file(0)
+                    elif entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    else:
+                        size = entry.stat(follow_symlinks=False).st_size
+                        _remove(entry.path, fs.unlink, fs)
+                        report.add_file(size)
+                except OSError as e:
+                    report.fail(entry.path, e)
+        return subdirs
+
+    visited = [] # (depth, path) for the bottom-up rmdir pass
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="purge") as pool:
+        pending = {pool.submit(visit, root): (root, 0)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, depth = pending.pop(future)
+                try:
+                    subdirs = future.result()
+                except OSError as e:
+                    report.fail(path, e)
+                    subdirs = []
+                visited.append((depth, path))
+                for sub in subdirs:
+                    pending[pool.submit(visit, sub)] = (sub, depth + 1)
+
+    # After a stop, folders whose walk never started are still full; that is not a failure
+    stopped = cancelled is not None and cancelled()
+    for depth, path in sorted(visited, reverse=True):
+        try:
+            _remove(path, fs.rmdir, fs)
+            report.add_dir()
+        except OSError as e:
+            if not stopped:
+                report.fail(path, e)
+
+    report.seconds += time.perf_counter() - started
+    return report
+
+def empty_trash(trash_root, extra_paths=(), workers=PURGE_WORKERS, cancelled=None, fs=LOCAL_FS):
+    """Purge every slot under trash_root (including leftovers from earlier runs)
+
+    extra_paths are deleted in place; they are targets that could not be
+    renamed into the trash.
+    """
+    report = PurgeReport()
+    targets = list(extra_paths)
+    try:
+        with fs.scandir(trash_root) as entries:
+            targets += [entry.path for entry in entries]
+    except FileNotFoundError:
+        pass
+    for target in targets:
+        if cancelled and cancelled():
+            break
+        purge_tree(target, workers, report, cancelled, fs)
+    try:
+        fs.rmdir(trash_root)
+    except OSError:
+        pass
+    return report
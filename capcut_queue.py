@@ -0,0 +1,303 @@
+"""Download several installers at once under one shared bandwidth cap
+
+Jobs wait in a priority queue (higher priority first, then in the order they
+were added) and run on at most `workers` threads. Every job draws from one
+TokenBucket, so the cap holds for all of them together and can be changed
+while they run, e.g. tightened during office hours. Each job owns its own
+InstallerDownloader, so pause, discard and progress work per job exactly as
+they do for a single download, including resume from the .part file.
+"""
+import collections
+import heapq
+import itertools
+import threading
+import time
+
+from capcut_core import InstallerDownloader, format_bytes, level_for, logger
+from capcut_trace import span
+
+DOWNLOAD_QUEUE_WORKERS = 2
+THROTTLE_SLICE = 0.1 # Longest single sleep, so pause and rate changes apply promptly
+RATE_WINDOW = 3.0 # Seconds of samples behind a job's current rate
+RATE_SAMPLE_INTERVAL = 0.25
+
+RATE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+def parse_rate(text):
+    """Bytes per second from "800K", "5M", "1.5M" or a plain number; 0 or "" means no cap"""
+    text = str(text).strip().upper().removesuffix("/S").removesuffix("B")
+    if not text:
+        return None
+    unit = text[-1] if text[-1] in RATE_UNITS else ""
+    try:
+        rate = float(text[:len(text) - len(unit)]) * RATE_UNITS[unit]
+    except ValueError:
+        raise ValueError(f"Invalid rate: {text}") from None
+    if rate < 0:
+        raise ValueError(f"Invalid rate: {text}")
+    return int(rate) or None
+
+class TokenBucket:
+    """Bandwidth cap shared by any number of threads
+
+    consume(n) takes n bytes' worth of tokens even if that leaves the bucket
+    in debt, then waits until the refill has paid the debt back. Data has
+    already arrived when it is counted, so a slow caller stops reading and
+    TCP slows the server down. A rate of None means no cap.
+    """
+    def __init__(self, rate=None, burst=None):
+        self._lock = threading.Lock()
+        self.rate = None
+        self.tokens = 0.0
+        self.stamp = time.monotonic()
+        self.set_rate(rate, burst)
+
+    def set_rate(self, rate, burst=None):
+        with self._lock:
+            self._refill()
+            self.rate = rate or None
+            self.burst = burst or self.rate or 0 # One second's worth by default
+            self.tokens = min(self.tokens, self.burst) if self.rate else 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate:
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def consume(self, count, cancelled=None):
+        """Take count tokens, waiting while in debt; return the seconds waited"""
+        started = time.monotonic()
+        with self._lock:
+            if not self.rate:
+                return 0.0
+            self._refill()
+            self.tokens -= count
+        while True:
+            with self._lock:
+                if not self.rate:
+                    break
+                self._refill()
+                if self.tokens >= 0:
+                    break
+                wait = -self.tokens / self.rate
+            if cancelled and cancelled():
+                break
+            time.sleep(min(wait, THROTTLE_SLICE))
+        return time.monotonic() - started
+
+class JobDownloader(InstallerDownloader):
+    """The downloader of one DownloadJob: logs and progress go to the job"""
+    def __init__(self, job, versions):
+        super().__init__(versions)
+        self.job = job
+
+    def log(self, message):
+        self.job.log(message)
+
+    def on_progress(self, done, total):
+        self.job.on_progress(done, total)
+
+class DownloadJob:
+    """One queued installer download with its own pause/discard flags and progress
+
+    state is queued, running, done, failed, paused, discarded or cancelled
+    (removed from the queue before it started).
+    """
+    def __init__(self, queue, version, priority=0, dest=None):
+        self.queue = queue
+        self.downloader = JobDownloader(self, queue.blocker.versions)
+        self.version = version
+        self.priority = priority
+        self.dest = dest
+        self.state = "queued"
+        self.requested = None # "pause" or "discard" once the user asks
+        self.path = None
+        self.done = 0
+        self.total = 0
+        self.started = None
+        self.finished = None
+        self._start_done = None
+        self._samples = collections.deque()
+        downloader = self.downloader
+        downloader.throttle = lambda count: queue.bucket.consume(count, lambda: downloader.cancel_download_flag)
+
+    def log(self, message):
+        logger.log(level_for(message), f"[{self.label}] {message.strip()}")
+
+    @property
+    def label(self):
+        return self.version.split(" ")[0]
+
+    @property
+    def active(self):
+        return self.state in ("queued", "running")
+
+    def on_progress(self, done, total):
+        self.done, self.total = done, total
+        now = time.monotonic()
+        if self._start_done is None:
+            self._start_done = done # Resumed bytes do not count towards the rate
+        if not self._samples or now - self._samples[-1][0] >= RATE_SAMPLE_INTERVAL:
+            self._samples.append((now, done))
+            while now - self._samples[0][0] > RATE_WINDOW:
+                self._samples.popleft()
+        self.queue.notify(self)
+
+    def rate(self):
+        """Bytes per second over the last RATE_WINDOW seconds"""
+        if self.state != "running" or len(self._samples) < 2:
+            return 0.0
+        (t0, d0), (t1, d1) = self._samples[0], self._samples[-1]
+        return (d1 - d0) / (t1 - t0) if t1 > t0 else 0.0
+
+    def average_rate(self):
+        """Bytes per second over the whole run, not counting resumed bytes"""
+        if not self.started or self._start_done is None:
+            return 0.0
+        elapsed = (self.finished or time.monotonic()) - self.started
+        return (self.done - self._start_done) / elapsed if elapsed > 0 else 0.0
+
+    def cancel(self, discard=False):
+        """Pause (keep the .part file) or discard this job, queued or running"""
+        self.requested = "discard" if discard else "pause"
+        if discard:
+            self.downloader.discard_download_flag = True
+        self.downloader.cancel_download_flag = True
+        self.queue.withdraw(self)
+
+    def run(self):
+        """Download on the calling thread; the queue has already marked it running"""
+        self.started = time.monotonic()
+        self.queue.notify(self)
+        try:
+            with span(f"download {self.label}"):
+                self.path = self.downloader.download_version(self.version, self.dest)
+        except Exception as e:
+            self.log(f"❌ Error during download: {e}")
+        self.finished = time.monotonic()
+        if self.path:
+            self.state = "done"
+        elif self.requested == "discard":
+            self.state = "discarded"
+        elif self.requested == "pause":
+            self.state = "paused"
+        else:
+            self.state = "failed"
+        self.queue.notify(self)
+
+    def as_dict(self):
+        elapsed = (self.finished or time.monotonic()) - self.started if self.started else None
+        return {"version": self.version, "priority": self.priority, "state": self.state,
+                "path": str(self.path) if self.path else None, "done": self.done, "total": self.total,
+                "seconds": round(elapsed, 3) if elapsed is not None else None,
+                "rate": round(self.rate()), "average_rate": round(self.average_rate())}
+
+class DownloadQueue:
+    """Priority queue of DownloadJobs run on a bounded number of threads
+
+    Threads are started as jobs arrive and exit when the queue runs dry.
+    on_update(job) is called from worker threads on every progress tick and
+    state change; the GUI coalesces it, the CLI ignores it.
+    """
+    def __init__(self, blocker, workers=DOWNLOAD_QUEUE_WORKERS, rate_limit=None, on_update=None):
+        self.blocker = blocker
+        self.workers = max(1, workers)
+        self.bucket = TokenBucket(rate_limit)
+        self.on_update = on_update
+        self.jobs = []
+        self._pending = [] # Heap of (-priority, sequence, job)
+        self._sequence = itertools.count()
+        self._running = 0
+        self._cond = threading.Condition()
+
+    def submit(self, version, priority=0, dest=None):
+        """Queue a download; a version already queued or running is not added twice"""
+        return self.submit_many([(version, priority)], dest)[0]
+
+    def submit_many(self, items, dest=None):
+        """Queue [(version, priority)] at once, so the first cannot start before the rest arrive"""
+        jobs, added = [], []
+        with self._cond:
+            for version, priority in items:
+                job = next((j for j in self.jobs if j.active and j.version == version and j.dest == dest), None)
+                if job is None:
+                    job = DownloadJob(self, version, priority, dest)
+                    self.jobs.append(job)
+                    heapq.heappush(self._pending, (-priority, next(self._sequence), job))
+                    added.append(job)
+                jobs.append(job)
+            while self._running < min(self.workers, len(self._pending)):
+                self._running += 1
+                threading.Thread(target=self._worker, name=f"download-{self._running}", daemon=True).start()
+        for job in added:
+            job.log(f"🕒 Queued (priority {job.priority}).")
+            self.notify(job)
+        return jobs
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = None
+                while self._pending and job is None:
+                    job = heapq.heappop(self._pending)[2]
+                    if job.state == "queued":
+                        job.state = "running"
+                    else:
+                        job = None # Cancelled while it waited
+                if job is None:
+                    self._running -= 1
+                    self._cond.notify_all()
+                    return
+            job.run()
+            with self._cond:
+                self._cond.notify_all()
+
+    def withdraw(self, job):
+        """Take a job that has not started yet off the queue"""
+        with self._cond:
+            if job.state != "queued":
+                return
+            job.state = "cancelled"
+            self._cond.notify_all()
+        job.log("🚫 Removed from the queue.")
+        self.notify(job)
+
+    def cancel(self, discard=False):
+        """Pause or discard every queued and running job"""
+        for job in list(self.jobs):
+            if job.active:
+                job.cancel(discard)
+
+    def set_rate_limit(self, rate):
+        """Change the shared cap (bytes per second, None for none); applies to running jobs"""
+        self.bucket.set_rate(rate)
+        self.blocker.log(f"🚦 Download limit: {format_bytes(rate) + '/s' if rate else 'none'}")
+
+    def notify(self, job):
+        if self.on_update:
+            self.on_update(job)
+
+    def _drained(self):
+        return self._running == 0 and not any(job.active for job in self.jobs)
+
+    def idle(self):
+        with self._cond:
+            return self._drained()
+
+    def wait(self, timeout=None):
+        """Block until every job has finished; return False on timeout"""
+        with self._cond:
+            return self._cond.wait_for(self._drained, timeout)
+
+    def stats(self):
+        """Per-job results plus aggregate throughput over the running jobs"""
+        jobs = list(self.jobs)
+        running = [job for job in jobs if job.state == "running"]
+        return {"jobs": [job.as_dict() for job in jobs],
+                "running": len(running),
+                "queued": sum(job.state == "queued" for job in jobs),
+                "done": sum(job.done for job in running),
+                "total": sum(job.total for job in running),
+                "rate": round(sum(job.rate() for job in running)),
+                "rate_limit": self.bucket.rate}
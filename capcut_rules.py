@@ -0,0 +1,123 @@
+"""The table of protected files that block, verify and restore all walk
+
+Each LockRule names one file under the CapCut root and the kind of lock it
+gets. Adding a protected file (say, a future updater binary) is one entry in
+LOCK_RULES. A StatCache is shared by every step of one run so each file is
+stat'ed once per state change instead of once per check.
+"""
+import stat
+
+from capcut_fs import LOCAL_FS
+
+BLOCKED_VERSION = "1.0.0.0"
+STUB_SIZE_LIMIT = 1024 * 1024 # Real updaters are > 10 MB; anything under 1 MB is ours
+
+# Lock kinds:
+#   ini      rewrite last_version= to BLOCKED_VERSION, then read-only
+#   readonly keep contents (create empty if missing), then read-only
+#   stub     replace with an empty file, then read-only
+LOCK_KINDS = ("ini", "readonly", "stub")
+
+class LockRule:
+    """One protected file: where it lives and how it is locked"""
+    def __init__(self, name, parts, kind, message):
+        if kind not in LOCK_KINDS:
+            raise ValueError(f"Unknown lock kind: {kind}")
+        self.name = name # Label used in logs and verify output
+        self.parts = parts # Path relative to the CapCut root
+        self.kind = kind
+        self.message = message # Logged when the lock is applied
+
+    def path(self, capcut_path):
+        return capcut_path.joinpath(*self.parts)
+
+    @property
+    def relative(self):
+        # Key of this file in backup snapshots, the same on every OS
+        return "/".join(self.parts)
+
+    @property
+    def locked_label(self):
+        # Stubs have always been reported as Blocked, edited files as Locked
+        return "Blocked" if self.kind == "stub" else "Locked"
+
+    @property
+    def unlocked_label(self):
+        return "Unblocked" if self.kind == "stub" else "Unlocked"
+
+LOCK_RULES = [
+    LockRule("configure.ini", ("Apps", "configure.ini"), "ini", "🔒 Locking configure.ini..."),
+    LockRule("ProductInfo.xml", ("Apps", "ProductInfo.xml"), "readonly", "🛡️ Blocking ProductInfo.xml..."),
+    LockRule("Download/update.exe", ("User Data", "Download", "update.exe"), "stub", "⛔ Blocking Download/update.exe..."),
+    LockRule("Apps/update.exe", ("Apps", "update.exe"), "stub", "⛔ Blocking Apps/update.exe..."), # Added per user feedback
+]
+
+class StatCache:
+    """Per-run memo of fs.stat results; None means the file does not exist"""
+    def __init__(self, fs=LOCAL_FS):
+        self.fs = fs
+        self._stats = {}
+        self.calls = 0
+
+    def stat(self, path):
+        key = str(path)
+        if key not in self._stats:
+            self.calls += 1
+            try:
+                self._stats[key] = self.fs.stat(key)
+            except (FileNotFoundError, NotADirectoryError):
+                self._stats[key] = None
+        return self._stats[key]
+
+    def invalidate(self, path):
+        self._stats.pop(str(path), None)
+
+def is_readonly(st):
+    # On Windows os.stat clears the write bits for FILE_ATTRIBUTE_READONLY
+    return not (st.st_mode & stat.S_IWUSR)
+
+def rule_status(rule, st):
+    """Verify label for one rule from a single stat result"""
+    if st is None:
+        return "MISSING"
+    return rule.locked_label if is_readonly(st) else rule.unlocked_label
+
+def looks_blocked(rule, path, st, fs=LOCAL_FS):
+    """True if the file already looks like our lock (so it must not be backed up)"""
+    if st is None:
+        return False
+    if rule.kind == "stub":
+        return st.st_size < STUB_SIZE_LIMIT
+    if rule.kind == "readonly":
+        return st.st_size == 0
+    # ini: if we can't read it, assume it might be locked/crypto, but let's try
+    try:
+        with fs.open(path, 'r', errors='ignore') as f:
+            return f'last_version={BLOCKED_VERSION}' in f.read()
+    except OSError:
+        return False
+
+def read_last_version(path, fs=LOCAL_FS):
+    """Value of the last_version= line in configure.ini, or None"""
+    try:
+        with fs.open(path, 'r', errors='ignore') as f:
+            for line in f:
+                if line.strip().startswith('last_version='):
+                    return line.strip().partition('=')[2]
+    except OSError:
+        pass
+    return None
+
+def rule_drift(rule, path, st, fs=LOCAL_FS):
+    """Why a file is not in its locked state, or None if it already is"""
+    if st is None:
+        return "missing"
+    if rule.kind == "stub" and st.st_size:
+        return f"not an empty stub ({st.st_size} bytes)"
+    if rule.kind == "ini":
+        version = read_last_version(path, fs)
+        if version != BLOCKED_VERSION:
+            return f"last_version={version}"
+    if not is_readonly(st):
+        return "writable"
+    return None
@@ -0,0 +1,226 @@
+"""Cancellable tasks on a bounded worker pool
+
+Block, restore and download run as Tasks on a TaskRunner instead of
+fire-and-forget daemon threads. Each task carries a CancelToken. Code that
+runs in a task marks its step boundaries with checkpoint("lock configure.ini");
+once the token is cancelled, the next checkpoint raises TaskCancelled, so a
+task always stops between steps and never halfway through writing a file.
+checkpoint() is a no-op outside a task, so the same code runs unchanged in
+the fleet pool or from a script.
+
+Every step is timed, and shutdown() cancels everything and waits for the
+running tasks to reach their next step boundary instead of killing them.
+"""
+import threading
+import time
+
+from capcut_trace import span
+
+TASK_WORKERS = 2
+TASK_HISTORY = 50 # Finished tasks kept in TaskRunner.tasks
+
+_local = threading.local()
+
+class TaskCancelled(Exception):
+    """Raised at a checkpoint once the running task has been cancelled"""
+
+class CancelToken:
+    """Thread-safe cancel flag; on_cancel callbacks let blocking waits end early"""
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def on_cancel(self, callback):
+        """Call callback once the token is cancelled (now, if it already is)"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def check(self):
+        if self._event.is_set():
+            raise TaskCancelled()
+
+class Task:
+    """One unit of work: its state, result, and how long each step took
+
+    state is pending, running, done, failed or cancelled.
+    """
+    def __init__(self, name, target, args=(), kwargs=None):
+        self.name = name
+        self.target = target
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.token = CancelToken()
+        self.state = "pending"
+        self.result = None
+        self.error = None
+        self.steps = [] # [(step name, seconds)]
+        self.submitted = time.monotonic()
+        self.started = None
+        self.finished = None
+        self._step = None # (name, started) of the step in progress
+        self._done = threading.Event()
+
+    def cancel(self):
+        self.token.cancel()
+
+    def step(self, name=None):
+        """A step boundary: raise TaskCancelled if cancelled, else start timing name"""
+        now = time.monotonic()
+        if name is not None or self.token.cancelled:
+            self._end_step(now)
+        self.token.check()
+        if name is not None:
+            self._step = (name, now)
+
+    def _end_step(self, now):
+        if self._step:
+            name, started = self._step
+            self.steps.append((name, now - started))
+            self._step = None
+
+    def run(self):
+        self.state = "running"
+        self.started = time.monotonic()
+        _local.task = self
+        try:
+            self.token.check() # Cancelled while it waited for a worker
+            with span(self.name):
+                self.result = self.target(*self.args, **self.kwargs)
+            self.state = "done"
+        except TaskCancelled as e:
+            self.error = e
+            self.state = "cancelled"
+        except BaseException as e:
+            self.error = e
+            self.state = "failed"
+        finally:
+            _local.task = None
+            self.finished = time.monotonic()
+            self._end_step(self.finished)
+            self._done.set()
+
+    @property
+    def active(self):
+        return not self._done.is_set()
+
+    @property
+    def seconds(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    def wait(self, timeout=None):
+        """Block until the task has finished; return False on timeout"""
+        return self._done.wait(timeout)
+
+    def get(self, timeout=None):
+        """The target's return value; re-raises whatever it raised (TaskCancelled included)"""
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"Task {self.name} still running")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def summary(self, slowest=3):
+        """One line: name, state, total time and the slowest steps"""
+        text = f"{self.name} {self.state} in {self.seconds:.2f} s"
+        steps = sorted(self.steps, key=lambda s: -s[1])[:slowest]
+        if steps:
+            text += " (" + ", ".join(f"{name} {seconds:.2f} s" for name, seconds in steps) + ")"
+        return text
+
+    def as_dict(self):
+        return {"name": self.name, "state": self.state,
+                "queued": round((self.started or time.monotonic()) - self.submitted, 4),
+                "seconds": round(self.seconds, 4),
+                "steps": [{"step": name, "seconds": round(seconds, 4)} for name, seconds in self.steps]}
+
+class TaskRunner:
+    """Runs Tasks on at most `workers` threads
+
+    on_done(task) is called on the worker thread after each task finishes.
+    Worker threads are not daemons: a task that is still running when the
+    program exits gets to finish its current step.
+    """
+    def __init__(self, workers=TASK_WORKERS, on_done=None):
+        from concurrent.futures import ThreadPoolExecutor
+        self.on_done = on_done
+        self.tasks = []
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="task")
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def submit(self, name, target, *args, **kwargs):
+        """Queue target(*args, **kwargs) as a task named name; return the Task"""
+        task = Task(name, target, args, kwargs)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("TaskRunner has been shut down")
+            finished = [t for t in self.tasks if not t.active]
+            for old in finished[:max(0, len(finished) - TASK_HISTORY)]:
+                self.tasks.remove(old)
+            self.tasks.append(task)
+            self._pool.submit(self._run, task)
+        return task
+
+    def _run(self, task):
+        task.run()
+        if self.on_done:
+            self.on_done(task)
+
+    def active(self):
+        with self._lock:
+            return [task for task in self.tasks if task.active]
+
+    def idle(self):
+        return not self.active()
+
+    def cancel_all(self):
+        for task in self.active():
+            task.cancel()
+
+    def shutdown(self, timeout=None):
+        """Cancel every task and stop accepting new ones
+
+        Running tasks stop at their next checkpoint; waits up to timeout for
+        them (None: as long as it takes). Returns True if all have finished.
+        """
+        with self._lock:
+            self._closed = True
+        self.cancel_all()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for task in self.active():
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            task.wait(remaining)
+        self._pool.shutdown(wait=False)
+        return self.idle()
+
+def current_task():
+    """The Task running on this thread, or None"""
+    return getattr(_local, "task", None)
+
+def checkpoint(step=None):
+    """Mark a step boundary of the current task (if any); raises TaskCancelled once cancelled
+
+    With a name, the time until the next checkpoint is recorded as that step.
+    """
+    task = current_task()
+    if task is not None:
+        task.step(step)
@@ -0,0 +1,151 @@
+"""Timing spans and counters, exported as a Chrome trace and a summary table
+
+    with span("lock configure.ini"):
+        ...
+    count("bytes deleted", report.bytes)
+
+Both are no-ops until enable() is called: span() then returns one shared
+do-nothing context manager and count() returns at once, so the
+instrumentation can stay in the block, purge and download paths for good.
+
+Once enabled, every span becomes a Chrome trace-event "complete" event on
+the thread that ran it, and every counter a running total. The file written
+by export() opens in chrome://tracing or https://ui.perfetto.dev; summary()
+gives the same data as a table for the log or --json.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+TRACE_ENV = "CAPCUT_TRACE" # Set to a file path to trace the GUI (or as a default for --trace)
+COUNTER_SAMPLE_INTERVAL = 0.01 # Seconds between counter events per name; totals stay exact
+
+_NO_SPAN = nullcontext()
+_tracer = None
+
+class _Span:
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, kind, error, tb):
+        if kind is not None:
+            self.args["error"] = kind.__name__
+        self.tracer.add_span(self.name, self.started, time.perf_counter(), self.args)
+
+class Tracer:
+    """Collects spans and counters from any number of threads"""
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.events = [] # Chrome trace events, in the order they finished
+        self.counters = {} # name -> total
+        self.spans = {} # name -> [count, total seconds, longest]
+        self._sampled = {} # counter name -> when its last event was recorded
+        self._threads = {} # thread id -> name, kept since the threads are often gone by export
+        self._lock = threading.Lock()
+
+    def _ts(self, moment):
+        return round((moment - self.origin) * 1e6, 1) # Microseconds since the tracer started
+
+    def span(self, name, **args):
+        return _Span(self, name, args)
+
+    def add_span(self, name, started, finished, args=None):
+        thread = threading.current_thread()
+        event = {"name": name, "ph": "X", "ts": self._ts(started), "dur": round((finished - started) * 1e6, 1),
+                 "pid": os.getpid(), "tid": thread.ident}
+        if args:
+            event["args"] = args
+        seconds = finished - started
+        with self._lock:
+            self.events.append(event)
+            self._threads[thread.ident] = thread.name
+            stats = self.spans.setdefault(name, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+
+    def count(self, name, amount=1):
+        now = time.perf_counter()
+        with self._lock:
+            total = self.counters[name] = self.counters.get(name, 0) + amount
+            if now - self._sampled.get(name, -COUNTER_SAMPLE_INTERVAL) < COUNTER_SAMPLE_INTERVAL:
+                return
+            self._sampled[name] = now
+            self.events.append({"name": name, "ph": "C", "ts": self._ts(now), "pid": os.getpid(),
+                                "args": {name: total}})
+
+    def as_trace(self):
+        """The Chrome trace-event document"""
+        with self._lock:
+            events = list(self.events)
+            counters = dict(self.counters)
+            threads = dict(self._threads)
+        now = self._ts(time.perf_counter())
+        # A closing sample per counter, so the graphs end at the exact totals
+        events += [{"name": name, "ph": "C", "ts": now, "pid": os.getpid(), "args": {name: total}}
+                   for name, total in counters.items()]
+        events += [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+                   for tid, name in threads.items()]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, path):
+        """Write the Chrome trace to path; return the path"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.as_trace(), f)
+        return path
+
+    def summary(self):
+        """{"spans": [{name, count, seconds, longest}] slowest first, "counters": {name: total}}"""
+        with self._lock:
+            spans = [{"name": name, "count": n, "seconds": round(total, 4), "longest": round(longest, 4)}
+                     for name, (n, total, longest) in self.spans.items()]
+            counters = dict(self.counters)
+        spans.sort(key=lambda s: -s["seconds"])
+        return {"spans": spans, "counters": counters}
+
+def format_summary(summary, limit=20):
+    """Plain-text table of summary(): the slowest spans, then the counters"""
+    lines = [f"{'Step':<32} {'Count':>6} {'Total':>10} {'Longest':>10}"]
+    for s in summary["spans"][:limit]:
+        lines.append(f"{s['name'][:32]:<32} {s['count']:>6} {s['seconds'] * 1000:>8.1f}ms {s['longest'] * 1000:>8.1f}ms")
+    if len(summary["spans"]) > limit:
+        lines.append(f"...and {len(summary['spans']) - limit} more")
+    for name, total in sorted(summary["counters"].items()):
+        lines.append(f"{name:<32} {total:>6,}")
+    return "\n".join(lines)
+
+def enable():
+    """Start recording (keeps the current tracer if already on); return the Tracer"""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+def disable():
+    """Stop recording; return the Tracer that was active, or None"""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+def tracer():
+    """The active Tracer, or None when tracing is off"""
+    return _tracer
+
+def span(name, **args):
+    """Context manager timing name on this thread; free when tracing is off"""
+    if _tracer is None:
+        return _NO_SPAN
+    return _tracer.span(name, **args)
+
+def count(name, amount=1):
+    """Add amount to counter name; free when tracing is off"""
+    if _tracer is not None:
+        _tracer.count(name, amount)
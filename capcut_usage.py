@@ -0,0 +1,151 @@
+"""Parallel disk usage of the cleanup targets, with a per-directory size cache
+
+Block used to delete the update caches and every other version folder
+without saying what that was worth. disk_usage() sizes a folder with the same
+parallel os.scandir walk the purge uses (one task per directory), and
+DirSizeCache remembers, per directory, the bytes and files directly inside
+it plus its subdirectories, keyed on the directory's mtime. Adding, removing
+or renaming an entry changes that mtime, so a repeat scan of an unchanged
+tree costs one stat per directory and reads no listing at all. A file
+rewritten in place to a new size is the one change it misses, until
+something else in its folder changes.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from capcut_fs import LOCAL_FS
+from capcut_purge import is_link
+
+USAGE_WORKERS = 8
+
+class DirSizeCache:
+    """path -> [mtime_ns, bytes, files, [subdirectories]] for each directory seen, kept in a JSON file"""
+    _shared_lock = threading.Lock() # One dir_sizes.json for every blocker in the process
+
+    def __init__(self, path=None, fs=LOCAL_FS):
+        self.path = Path(path) if path else None
+        self.fs = fs
+        self.hits = 0
+        self.misses = 0
+        self._entries = None
+        self._seen = set()
+        self._lock = DirSizeCache._shared_lock
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = {}
+            if self.path:
+                try:
+                    with self.fs.open(self.path, 'r') as f:
+                        self._entries = json.load(f)
+                except (OSError, ValueError):
+                    pass
+        return self._entries
+
+    def get(self, path, mtime_ns):
+        with self._lock:
+            self._seen.add(path)
+            entry = self._load().get(path)
+            if entry and entry[0] == mtime_ns:
+                self.hits += 1
+                return entry
+            self.misses += 1
+            return None
+
+    def put(self, path, mtime_ns, size, files, subdirs):
+        with self._lock:
+            self._load()[path] = [mtime_ns, size, files, subdirs]
+
+    def prune(self, root):
+        """Drop the entries at or below root this cache was not asked about (folders gone since)"""
+        root = str(root)
+        prefix = os.path.join(root, "")
+        with self._lock:
+            entries = self._load()
+            for path in [p for p in entries if (p == root or p.startswith(prefix)) and p not in self._seen]:
+                del entries[path]
+
+    def save(self):
+        if not self.path or self._entries is None:
+            return
+        with self._lock:
+            try:
+                self.fs.mkdir(self.path.parent, parents=True, exist_ok=True)
+                tmp = self.path.with_suffix(".tmp")
+                with self.fs.open(tmp, 'w') as f:
+                    json.dump(self._entries, f)
+                self.fs.replace(tmp, self.path)
+            except OSError:
+                pass # Only a cache; the next scan walks the folders again
+
+class Usage:
+    """Size of one folder: bytes and files below it, and how long the scan took"""
+    def __init__(self, path, size=0, files=0, dirs=0, seconds=0.0, errors=0):
+        self.path = Path(path)
+        self.bytes = size
+        self.files = files
+        self.dirs = dirs
+        self.seconds = seconds
+        self.errors = errors
+
+    def as_dict(self):
+        return {"path": str(self.path), "bytes": self.bytes, "files": self.files, "dirs": self.dirs,
+                "seconds": round(self.seconds, 4), "errors": self.errors}
+
+def disk_usage(root, workers=USAGE_WORKERS, cache=None, fs=LOCAL_FS):
+    """Usage of root, walking its directories in parallel and reusing cache entries whose mtime still matches"""
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+    started = time.perf_counter()
+    root = str(root)
+    usage = Usage(root)
+    try:
+        st = fs.lstat(root)
+    except OSError:
+        return usage
+    if not fs.isdir(root) or fs.islink(root):
+        usage.bytes, usage.files = st.st_size, 1
+        usage.seconds = time.perf_counter() - started
+        return usage
+
+    def visit(path):
+        """(bytes, files, subdirectories) directly in path"""
+        mtime = fs.stat(path).st_mtime_ns
+        if cache is not None:
+            entry = cache.get(path, mtime)
+            if entry:
+                return entry[1], entry[2], entry[3]
+        size = files = 0
+        subdirs = []
+        with fs.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if not is_link(entry) and entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    else:
+                        size += entry.stat(follow_symlinks=False).st_size
+                        files += 1
+                except OSError:
+                    pass # Vanished while we looked; it no longer takes space
+        if cache is not None:
+            cache.put(path, mtime, size, files, subdirs)
+        return size, files, subdirs
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="du") as pool:
+        pending = {pool.submit(visit, root)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    size, files, subdirs = future.result()
+                except OSError:
+                    usage.errors += 1
+                    continue
+                usage.bytes += size
+                usage.files += files
+                usage.dirs += 1
+                pending.update(pool.submit(visit, sub) for sub in subdirs)
+    usage.seconds = time.perf_counter() - started
+    return usage
@@ -0,0 +1,351 @@
+"""Re-apply a lock as soon as CapCut's updater rewrites the file it protects
+
+The updater sometimes restores configure.ini or drops a fresh update.exe
+while CapCut is running. Instead of re-running the whole block, a watchdog
+waits on OS change notifications for the folders that hold the protected
+files (inotify on Linux, ReadDirectoryChangesW on Windows) and re-locks only
+the rule whose file drifted. Idle, it sleeps in one blocking call per folder
+and does no work at all. Where neither API is available it falls back to
+stat-polling the protected files every POLL_INTERVAL seconds.
+"""
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+from pathlib import Path
+
+from capcut_rules import LOCK_RULES, StatCache, rule_drift
+
+WATCH_DEBOUNCE = 0.05 # One rewrite is a burst of events; gather it before checking
+POLL_INTERVAL = 5.0 # Fallback stat-poll period in seconds
+
+# inotify event bits
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+INOTIFY_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+                | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+
+# ReadDirectoryChangesW filter
+FILE_NOTIFY_CHANGE_FILE_NAME = 0x1
+FILE_NOTIFY_CHANGE_DIR_NAME = 0x2
+FILE_NOTIFY_CHANGE_ATTRIBUTES = 0x4
+FILE_NOTIFY_CHANGE_SIZE = 0x8
+FILE_NOTIFY_CHANGE_LAST_WRITE = 0x10
+
+def nearest_existing(path):
+    """path itself, or its closest ancestor that exists"""
+    while not path.exists() and path.parent != path:
+        path = path.parent
+    return path
+
+class _Watcher:
+    """Shared bookkeeping: which folders to watch and which files an event touches
+
+    wait() blocks until at least one protected file may have changed and
+    returns those paths, or returns None once close() has been called.
+    """
+    def __init__(self, paths):
+        self.paths = {Path(p) for p in paths}
+
+    def watch_dirs(self):
+        # A missing parent is watched through its nearest ancestor until it appears
+        return {nearest_existing(p.parent) for p in self.paths}
+
+    def affected(self, folder, name=None):
+        if name:
+            target = folder / name
+            if target in self.paths:
+                return {target}
+            # A parent of a protected file was created, moved or deleted
+            return {p for p in self.paths if target in p.parents}
+        return {p for p in self.paths if folder in p.parents}
+
+class InotifyWatcher(_Watcher):
+    name = "inotify"
+
+    def __init__(self, paths):
+        super().__init__(paths)
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._ctypes = ctypes
+        self._add_watch = libc.inotify_add_watch
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._wake_r, self._wake_w = os.pipe() # close() wakes the blocked select through this
+        self._closed = False
+        self._watches = {} # wd -> folder
+        self._refresh()
+
+    def _refresh(self):
+        for folder in self.watch_dirs():
+            wd = self._add_watch(self._fd, os.fsencode(folder), INOTIFY_MASK)
+            if wd >= 0:
+                self._watches[wd] = folder
+
+    def _read(self):
+        changed = set()
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                wd, mask, _cookie, length = struct.unpack_from("iIII", data, offset)
+                name = data[offset + 16:offset + 16 + length].rstrip(b"\0")
+                offset += 16 + length
+                if mask & IN_Q_OVERFLOW:
+                    changed |= self.paths
+                    continue
+                folder = self._watches.get(wd)
+                if folder is None:
+                    continue
+                if mask & IN_IGNORED:
+                    # The folder itself is gone; _refresh() watches its ancestor instead
+                    del self._watches[wd]
+                changed |= self.affected(folder, os.fsdecode(name) if name else None)
+
+    def wait(self):
+        changed = set()
+        timeout = None
+        while True:
+            ready, _, _ = select.select([self._fd, self._wake_r], [], [], timeout)
+            if self._wake_r in ready:
+                for fd in (self._fd, self._wake_r, self._wake_w):
+                    os.close(fd)
+                return None
+            if not ready:
+                break # The burst is over
+            changed |= self._read()
+            if changed:
+                timeout = WATCH_DEBOUNCE
+        self._refresh()
+        return changed
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            os.write(self._wake_w, b"x")
+
+class WindowsWatcher(_Watcher):
+    """One blocking ReadDirectoryChangesW call per folder, each on its own thread"""
+    name = "ReadDirectoryChangesW"
+
+    def __init__(self, paths):
+        super().__init__(paths)
+        import ctypes
+        from ctypes import wintypes
+        self._ctypes = ctypes
+        k32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        k32.CreateFileW.argtypes = [wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD, wintypes.LPVOID,
+                                    wintypes.DWORD, wintypes.DWORD, wintypes.HANDLE]
+        k32.CreateFileW.restype = wintypes.HANDLE
+        k32.ReadDirectoryChangesW.argtypes = [wintypes.HANDLE, wintypes.LPVOID, wintypes.DWORD, wintypes.BOOL,
+                                              wintypes.DWORD, ctypes.POINTER(wintypes.DWORD), wintypes.LPVOID, wintypes.LPVOID]
+        k32.ReadDirectoryChangesW.restype = wintypes.BOOL
+        k32.CancelIoEx.argtypes = [wintypes.HANDLE, wintypes.LPVOID]
+        k32.CancelIoEx.restype = wintypes.BOOL
+        k32.CloseHandle.argtypes = [wintypes.HANDLE]
+        k32.CloseHandle.restype = wintypes.BOOL
+        self._k32 = k32
+        self._dword = wintypes.DWORD
+        self._events = queue.Queue()
+        self._handles = {} # folder -> directory handle
+        self._lock = threading.Lock()
+        self._closed = False
+        self._refresh()
+
+    def _refresh(self):
+        for folder in self.watch_dirs():
+            with self._lock:
+                if self._closed or folder in self._handles:
+                    continue
+                handle = self._k32.CreateFileW(str(folder), 0x1, 0x7, None, 3, 0x02000000, None) # FILE_LIST_DIRECTORY, share all, OPEN_EXISTING, BACKUP_SEMANTICS
+                if handle in (None, self._ctypes.c_void_p(-1).value):
+                    continue
+                self._handles[folder] = handle
+            threading.Thread(target=self._watch, args=(folder, handle), name="watch", daemon=True).start()
+
+    def _watch(self, folder, handle):
+        buffer = self._ctypes.create_string_buffer(64 * 1024)
+        returned = self._dword()
+        flags = (FILE_NOTIFY_CHANGE_FILE_NAME | FILE_NOTIFY_CHANGE_DIR_NAME | FILE_NOTIFY_CHANGE_ATTRIBUTES
+                 | FILE_NOTIFY_CHANGE_SIZE | FILE_NOTIFY_CHANGE_LAST_WRITE)
+        try:
+            while not self._closed:
+                if not self._k32.ReadDirectoryChangesW(handle, buffer, len(buffer), False, flags,
+                                                       self._ctypes.byref(returned), None, None):
+                    break # Cancelled by close(), or the folder was deleted
+                if not returned.value:
+                    self._events.put(self.affected(folder)) # Buffer overflow: recheck everything here
+                    continue
+                changed = set()
+                offset = 0
+                while True:
+                    next_offset, _action, length = struct.unpack_from("III", buffer.raw, offset)
+                    name = buffer.raw[offset + 12:offset + 12 + length].decode("utf-16-le")
+                    changed |= self.affected(folder, name)
+                    if not next_offset:
+                        break
+                    offset += next_offset
+                if changed:
+                    self._events.put(changed)
+        finally:
+            with self._lock:
+                self._handles.pop(folder, None)
+            self._k32.CloseHandle(handle)
+            if not self._closed:
+                self._events.put(self.affected(folder))
+
+    def wait(self):
+        changed = self._events.get()
+        if changed is None:
+            return None
+        while True:
+            try:
+                more = self._events.get(timeout=WATCH_DEBOUNCE)
+            except queue.Empty:
+                break
+            if more is None:
+                return None
+            changed |= more
+        self._refresh()
+        return changed
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            for handle in self._handles.values():
+                self._k32.CancelIoEx(handle, None)
+        self._events.put(None)
+
+class PollingWatcher(_Watcher):
+    """Fallback: compare (size, mtime, mode) of each protected file every interval"""
+    name = "polling"
+
+    def __init__(self, paths, interval=POLL_INTERVAL):
+        super().__init__(paths)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._signatures = {p: self._signature(p) for p in self.paths}
+
+    def _signature(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns, st.st_mode
+
+    def wait(self):
+        while not self._stop.wait(self.interval):
+            changed = set()
+            for path in self.paths:
+                signature = self._signature(path)
+                if signature != self._signatures[path]:
+                    self._signatures[path] = signature
+                    changed.add(path)
+            if changed:
+                return changed
+        return None
+
+    def close(self):
+        self._stop.set()
+
+def file_signature(st):
+    """What a rewrite of the file changes: identity, size, mtime and mode"""
+    return st.st_ino, st.st_size, st.st_mtime_ns, st.st_mode
+
+def open_watcher(paths):
+    """Native change notifications where available, stat-polling otherwise"""
+    try:
+        if sys.platform == 'win32':
+            return WindowsWatcher(paths)
+        if sys.platform.startswith('linux'):
+            return InotifyWatcher(paths)
+    except (OSError, AttributeError):
+        pass
+    return PollingWatcher(paths)
+
+class LockWatchdog:
+    """Keeps every LOCK_RULES entry applied on one CapCutBlocker's folder"""
+    def __init__(self, blocker, watcher=None):
+        self.blocker = blocker
+        self.rules = {rule.path(blocker.capcut_path): rule for rule in LOCK_RULES}
+        self.watcher = watcher or open_watcher(self.rules)
+        self.wakeups = 0
+        self.relocks = 0
+        self.thread = None
+        self._left = {} # path -> file_signature() right after our own re-lock
+
+    def check(self, paths=None):
+        """Re-lock the rules among paths (default: all) that drifted; return their names
+
+        A file still exactly as the last re-lock left it is skipped: the event
+        came from our own write, or the re-lock did not take and trying again
+        would only wake us up again. It is retried once something else changes it.
+        """
+        platform = self.blocker.platform
+        cache = StatCache(platform)
+        relocked = []
+        for path, rule in self.rules.items():
+            if paths is not None and path not in paths:
+                continue
+            st = cache.stat(path)
+            if st is not None and self._left.get(path) == file_signature(st):
+                continue
+            reason = rule_drift(rule, path, st, platform)
+            if reason:
+                self.blocker.log(f"⚠️ {rule.name} changed ({reason}), re-locking...")
+                # What drifted is the updater's file, not an original: saving it would make it what restore returns to
+                self.blocker.apply_rule(rule, cache, backup=False)
+                relocked.append(rule.name)
+                st = cache.stat(path)
+                self._left[path] = file_signature(st) if st is not None else None
+                reason = rule_drift(rule, path, st, platform)
+                if reason:
+                    self.blocker.log(f"⚠️ {rule.name} is still not locked ({reason}); waiting for it to change again.")
+        self.relocks += len(relocked)
+        return relocked
+
+    def run(self, duration=None):
+        """Watch until stop() is called, or for duration seconds"""
+        timer = None
+        if duration:
+            timer = threading.Timer(duration, self.stop)
+            timer.daemon = True
+            timer.start()
+        self.blocker.log(f"👀 Watching {len(self.rules)} protected files ({self.watcher.name})...")
+        try:
+            self.check()
+            while True:
+                changed = self.watcher.wait()
+                if changed is None:
+                    break
+                self.wakeups += 1
+                self.check(changed)
+        finally:
+            if timer:
+                timer.cancel()
+        self.blocker.log(f"👀 Stopped watching ({self.relocks} re-locks).")
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="watchdog", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.watcher.close()
@@ -0,0 +1,92 @@
+"""Shared fixtures: the capcut_* modules live at the repository root"""
+import http.server
+import os
+import re
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def localappdata(tmp_path, monkeypatch):
+    """LOCALAPPDATA pointed at an empty temporary folder"""
+    path = tmp_path / "LocalAppData"
+    path.mkdir()
+    monkeypatch.setenv("LOCALAPPDATA", str(path))
+    return path
+
+ORIGINAL_INI = b"[capcut]\nlast_version=5.0.0.1886\nchannel=stable\n"
+UPDATER_SIZE = 2 * 1024 * 1024 # Over STUB_SIZE_LIMIT, so it is backed up as an original
+
+@pytest.fixture
+def capcut_root(tmp_path, localappdata):
+    """A small CapCut folder with every protected file in its original state"""
+    root = tmp_path / "CapCut"
+    (root / "Apps").mkdir(parents=True)
+    (root / "User Data" / "Download").mkdir(parents=True)
+    (root / "Apps" / "configure.ini").write_bytes(ORIGINAL_INI)
+    (root / "Apps" / "ProductInfo.xml").write_bytes(b"<product version='5.0.0.1886'/>")
+    for updater in (root / "Apps" / "update.exe", root / "User Data" / "Download" / "update.exe"):
+        with open(updater, 'wb') as f:
+            f.truncate(UPDATER_SIZE)
+    return root
+
+class InstallerServer:
+    """Serves one payload in one of three modes: "ranges", "full" (Range ignored) or "nolength"
+
+    delay is slept after every 64 KB written, so a test can pause mid-download.
+    """
+    def __init__(self, payload, mode, delay=0):
+        self.payload = payload
+        self.mode = mode
+        self.delay = delay
+        self.sent = 0
+        self.requests = []
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.0" if mode == "nolength" else "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                size = len(server.payload)
+                server.requests.append(self.headers.get("Range"))
+                match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range") or "")
+                if match and server.mode == "ranges":
+                    start, end = int(match.group(1)), int(match.group(2) or size - 1)
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+                else:
+                    start, end = 0, size - 1
+                    self.send_response(200)
+                self.send_header("ETag", '"payload-1"')
+                if server.mode == "nolength":
+                    self.send_header("Connection", "close")
+                else:
+                    self.send_header("Content-Length", str(end - start + 1))
+                self.end_headers()
+                view = memoryview(server.payload)
+                try:
+                    while start <= end:
+                        count = min(64 * 1024, end - start + 1)
+                        self.wfile.write(view[start:start + count])
+                        start += count
+                        server.sent += count
+                        if server.delay:
+                            time.sleep(server.delay)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/CapCut_test_installer.exe"
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,38 @@
+"""The benchmark runner's exit code: a crashing benchmark fails the run, a skipped one does not"""
+import pytest
+
+import capcut_bench
+import capcut_platform
+from capcut_core import logger
+
+@pytest.fixture
+def bench_env(localappdata, monkeypatch):
+    """Undo what capcut_bench.main changes in this process"""
+    monkeypatch.setenv("LOCALAPPDATA", str(localappdata))
+    monkeypatch.setattr(capcut_platform, "_backend", capcut_platform._backend)
+    monkeypatch.setattr(logger, "handlers", list(logger.handlers))
+    monkeypatch.setattr(logger, "propagate", logger.propagate)
+
+def run_only(monkeypatch, benchmark, capsys):
+    monkeypatch.setitem(capcut_bench.BENCHMARKS, "probe", benchmark)
+    code = capcut_bench.main(["--only", "probe", "--repeat", "1"])
+    return code, capsys.readouterr().err
+
+def test_crashing_benchmark_fails_the_run(bench_env, monkeypatch, capsys):
+    def crash(b):
+        raise RuntimeError("restore path broken")
+    code, err = run_only(monkeypatch, crash, capsys)
+    assert code == 1
+    assert "FAILED probe: crashed with RuntimeError: restore path broken" in err
+
+def test_skipped_benchmark_passes(bench_env, monkeypatch, capsys):
+    def skip(b):
+        raise capcut_bench.BenchSkipped("needs inotify")
+    code, err = run_only(monkeypatch, skip, capsys)
+    assert code == 0
+    assert "needs inotify" in err and "FAILED" not in err
+
+def test_passing_benchmark(bench_env, monkeypatch, capsys):
+    code, err = run_only(monkeypatch, lambda b: b.time_runs("probe", lambda _: {"ok": True}), capsys)
+    assert code == 0
+    assert "ok=True" in err
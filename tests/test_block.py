@@ -0,0 +1,55 @@
+"""block on configure.ini files in shapes the updater does not usually write"""
+import os
+
+import pytest
+
+import capcut_cli
+from capcut_core import CapCutBlocker, add_ini_line
+from capcut_rules import BLOCKED_VERSION, StatCache, read_last_version
+
+BLOCKED = f"last_version={BLOCKED_VERSION}".encode()
+
+@pytest.mark.parametrize("original, locked", [
+    (b"[capcut]\nfoo=1\n", b"[capcut]\n" + BLOCKED + b"\nfoo=1\n"),
+    (b"[capcut]\r\nfoo=1\r\n", b"[capcut]\r\n" + BLOCKED + b"\r\nfoo=1\r\n"),
+    (b"[other]\nfoo=1", b"[other]\nfoo=1\n[capcut]\n" + BLOCKED + b"\n"),
+    (b"[CapCut]", b"[CapCut]\n" + BLOCKED + b"\n"),
+])
+def test_add_ini_line(original, locked):
+    lines = original.splitlines(keepends=True)
+    expected = locked if b"\n" in original else locked.replace(b"\n", os.linesep.encode())
+    assert add_ini_line(lines, BLOCKED) == expected
+
+def test_ini_without_last_version_is_locked_once(capcut_root, capsys):
+    ini = capcut_root / "Apps" / "configure.ini"
+    ini.write_bytes(b"[capcut]\nfoo=1\n")
+    blocker = CapCutBlocker(capcut_root)
+
+    assert blocker.block()
+    assert read_last_version(ini) == BLOCKED_VERSION
+    assert ini.read_bytes() == b"[capcut]\n" + BLOCKED + b"\nfoo=1\n"
+    assert blocker.plan_block(StatCache(blocker.platform)) == []
+    assert capcut_cli.main(["--json", "--path", str(capcut_root), "block", "--dry-run"]) == capcut_cli.EXIT_OK
+
+    assert blocker.restore()
+    assert ini.read_bytes() == b"[capcut]\nfoo=1\n"
+
+def test_without_localappdata(capcut_root, monkeypatch):
+    assert CapCutBlocker(capcut_root).block()
+    monkeypatch.delenv("LOCALAPPDATA")
+    blocker = CapCutBlocker(capcut_root)
+    for getter in (blocker.get_backup_dir, blocker.get_cache_dir, blocker.get_journal_path,
+                   blocker.get_integrity_path, blocker.get_hash_cache_path):
+        assert getter() is None
+    assert blocker.list_snapshots() == []
+    assert blocker.recover() == 0
+    assert blocker.check_integrity() is None
+
+    assert blocker.block() # Already blocked: nothing to back up
+    assert blocker.restore() # No backups to return to: unlocked, our empty stubs removed
+    assert not (capcut_root / "Apps" / "update.exe").exists()
+    assert read_last_version(capcut_root / "Apps" / "configure.ini") == BLOCKED_VERSION
+
+    (capcut_root / "Apps" / "update.exe").write_bytes(b"MZ")
+    assert not blocker.block() # Would change files it cannot back up first
+    assert (capcut_root / "Apps" / "update.exe").read_bytes() == b"MZ"
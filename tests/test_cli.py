@@ -0,0 +1,43 @@
+"""Exit codes and error reporting of the headless CLI"""
+import json
+
+import pytest
+
+import capcut_cli
+from capcut_core import CapCutBlocker
+
+@pytest.fixture
+def run(localappdata, tmp_path, capsys):
+    """run(*argv) -> (exit code, JSON result) against an empty CapCut folder"""
+    root = tmp_path / "CapCut"
+    root.mkdir()
+
+    def run(*argv):
+        code = capcut_cli.main(["--json", "--path", str(root), *argv])
+        return code, json.loads(capsys.readouterr().out)
+    return run
+
+@pytest.mark.parametrize("argv, error", [
+    (["probe", "9.9.9"], "Unknown version: 9.9.9"),
+    (["download", "9.9.9"], "Unknown version: 9.9.9"),
+    (["restore", "--snapshot", "nope"], "Unknown snapshot: nope"),
+    (["clean", "Nope"], "Unknown cleanup target: Nope"),
+])
+def test_unknown_names_are_usage_errors(run, argv, error):
+    code, result = run(*argv)
+    assert code == capcut_cli.EXIT_USAGE
+    assert result["error"] == error
+
+def test_other_key_errors_are_unexpected(run, monkeypatch):
+    def broken(self):
+        raise KeyError("steps")
+    monkeypatch.setattr(CapCutBlocker, "reclaimable", broken)
+
+    code, result = run("space")
+    assert code == capcut_cli.EXIT_ERROR
+    assert result["error"] == "'steps'"
+
+def test_versions(run):
+    code, result = run("versions")
+    assert code == capcut_cli.EXIT_OK
+    assert "v2.0.0 (Legacy Stable)" in result["versions"]
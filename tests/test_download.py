@@ -0,0 +1,133 @@
+"""Downloads against a local server that honours Range, ignores it, or sends no Content-Length"""
+import hashlib
+import logging
+import os
+
+import pytest
+
+import capcut_core
+from capcut_catalog import VersionEntry
+from capcut_core import CapCutBlocker, DownloadState
+
+from conftest import InstallerServer
+
+MB = 1024 * 1024
+PAYLOAD_SIZE = 3 * MB + 12345 # Over download_file_native's 1 MB sanity floor, and not block aligned
+
+class PausingBlocker(CapCutBlocker):
+    """Pauses its download once pause_at bytes have arrived"""
+    pause_at = None
+
+    def on_progress(self, done, total):
+        if self.pause_at is not None and done >= self.pause_at:
+            self.cancel_download_flag = True
+
+@pytest.fixture
+def payload():
+    return os.urandom(PAYLOAD_SIZE)
+
+@pytest.fixture
+def serve(payload, monkeypatch):
+    """serve(mode, delay=0) -> a running InstallerServer, shut down after the test"""
+    for name in ("http_proxy", "HTTP_PROXY", "all_proxy", "ALL_PROXY"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(capcut_core, "MIN_SEGMENT_SIZE", 256 * 1024) # Four segments of a 3 MB payload
+    servers = []
+
+    def start(mode, delay=0):
+        servers.append(InstallerServer(payload, mode, delay))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
+
+@pytest.fixture
+def blocker(localappdata, tmp_path):
+    return PausingBlocker(tmp_path / "CapCut")
+
+def log_text(caplog):
+    return "\n".join(record.getMessage() for record in caplog.records)
+
+@pytest.mark.parametrize("mode", ["ranges", "full", "nolength"])
+def test_download_matches_payload(mode, serve, blocker, payload, tmp_path, caplog):
+    server = serve(mode)
+    target = tmp_path / "installer.exe"
+    entry = VersionEntry("test", [server.url], sha256=hashlib.sha256(payload).hexdigest())
+
+    with caplog.at_level(logging.INFO, logger="capcut_blocker"):
+        assert blocker.download_file_native(entry, str(target))
+
+    assert target.read_bytes() == payload
+    assert not os.path.exists(str(target) + ".part")
+    assert not os.path.exists(str(target) + ".part.json")
+    if mode == "ranges":
+        assert "Mode: Ranged (4 parallel segments)" in log_text(caplog)
+    else:
+        assert "Mode: Single stream" in log_text(caplog)
+
+def test_pause_and_resume_ranged(serve, blocker, payload, tmp_path, caplog):
+    server = serve("ranges", delay=0.005)
+    target = tmp_path / "installer.exe"
+    temp_path = str(target) + ".part"
+    entry = VersionEntry("test", [server.url])
+
+    blocker.pause_at = PAYLOAD_SIZE // 3
+    assert not blocker.download_file_native(entry, str(target))
+    assert not target.exists()
+    state = DownloadState.load(temp_path)
+    assert state is not None and 0 < state.completed() < PAYLOAD_SIZE
+    with open(temp_path, 'rb') as f:
+        partial = f.read()
+    for start, end, offset in state.segments: # What the checkpoint claims is on disk really is
+        assert partial[start:offset] == payload[start:offset]
+
+    blocker.pause_at = None
+    blocker.cancel_download_flag = False
+    sent_before = server.sent
+    with caplog.at_level(logging.INFO, logger="capcut_blocker"):
+        assert blocker.download_file_native(entry, str(target))
+
+    assert "Resuming" in log_text(caplog)
+    assert target.read_bytes() == payload
+    assert server.sent - sent_before < PAYLOAD_SIZE # Only the missing ranges were fetched again
+    assert not os.path.exists(temp_path + ".json")
+
+def test_resume_restarts_when_remote_changed(serve, blocker, payload, tmp_path, caplog):
+    server = serve("ranges", delay=0.005)
+    target = tmp_path / "installer.exe"
+    entry = VersionEntry("test", [server.url])
+
+    blocker.pause_at = PAYLOAD_SIZE // 3
+    assert not blocker.download_file_native(entry, str(target))
+    state = DownloadState.load(str(target) + ".part")
+    state.etag = '"payload-0"' # As if the partial file came from an older build
+    state.save()
+
+    blocker.pause_at = None
+    blocker.cancel_download_flag = False
+    server.delay = 0
+    with caplog.at_level(logging.INFO, logger="capcut_blocker"):
+        assert blocker.download_file_native(entry, str(target))
+
+    assert "Remote file changed, restarting download." in log_text(caplog)
+    assert target.read_bytes() == payload
+
+def test_pause_discards_single_stream(serve, blocker, tmp_path):
+    server = serve("full", delay=0.005)
+    target = tmp_path / "installer.exe"
+
+    blocker.pause_at = PAYLOAD_SIZE // 3
+    assert not blocker.download_file_native(VersionEntry("test", [server.url]), str(target))
+
+    assert not target.exists()
+    assert not os.path.exists(str(target) + ".part") # Without ranges there is nothing to resume from
+
+def test_sha256_mismatch_is_rejected(serve, blocker, tmp_path):
+    server = serve("ranges")
+    target = tmp_path / "installer.exe"
+
+    assert not blocker.download_file_native(VersionEntry("test", [server.url], sha256="0" * 64), str(target))
+
+    assert not target.exists()
+    assert not os.path.exists(str(target) + ".part")
@@ -0,0 +1,104 @@
+"""The integrity baseline of the active version folder, on MemoryBackend"""
+import pytest
+
+import capcut_cli
+from capcut_core import CapCutBlocker
+from capcut_fixtures import memory_scenario
+from capcut_integrity import BaselineStore, HashCache, hash_tree
+from capcut_memfs import MemoryBackend
+
+@pytest.fixture
+def scenario(localappdata):
+    """(fs, blocker, active version folder): everything original, nothing running, no fault"""
+    fs, root, _ = memory_scenario(4)
+    active = root / "Apps" / "5.0.0.1"
+    fs.add_file(active / "CapCut.exe", b"MZ exe")
+    fs.add_file(active / "resources" / "app.pak", b"pak" * 1000)
+    return fs, CapCutBlocker(root, platform=fs), active
+
+def baseline(blocker):
+    return BaselineStore(blocker.get_integrity_path(), blocker.platform).get(blocker.capcut_path)
+
+def test_report_lists_added_removed_and_modified(scenario):
+    fs, blocker, active = scenario
+    assert blocker.block()
+    assert blocker.check_integrity().ok
+
+    fs.add_file(active / "CapCutCore.dll", b"patched by the updater")
+    fs.add_file(active / "resources" / "new.pak", b"new")
+    fs.unlink(active / "CapCut.exe")
+    report = blocker.check_integrity()
+    assert not report.ok
+    assert report.modified == ["CapCutCore.dll"]
+    assert report.added == ["resources/new.pak"]
+    assert report.removed == ["CapCut.exe"]
+    assert report.unreadable == []
+
+def test_unchanged_files_are_not_read_again(tmp_path):
+    fs = MemoryBackend()
+    folder = tmp_path / "tree"
+    for n in range(5):
+        fs.add_file(folder / f"file{n}.bin", bytes([n]) * 1000)
+    cache = HashCache(fs=fs)
+    first = hash_tree(folder, cache=cache, fs=fs)
+    assert (first.hashed, first.cached) == (5, 0)
+
+    second = hash_tree(folder, cache=cache, fs=fs)
+    assert (second.hashed, second.cached) == (0, 5)
+    assert second.files == first.files
+
+    fs.add_file(folder / "file0.bin", b"x" * 1000) # Same size, new mtime
+    third = hash_tree(folder, cache=cache, fs=fs)
+    assert (third.hashed, third.cached) == (1, 4)
+    assert third.files["file0.bin"] != first.files["file0.bin"]
+
+def test_repeat_check_uses_the_hash_cache(scenario):
+    fs, blocker, _ = scenario
+    assert blocker.block()
+    report = blocker.check_integrity()
+    assert report.ok and report.hashed == 0 and report.cached == report.files
+
+def test_second_block_keeps_the_existing_baseline(scenario):
+    fs, blocker, active = scenario
+    assert blocker.block()
+    created = baseline(blocker)["created"]
+    fs.add_file(active / "CapCutCore.dll", b"patched by the updater")
+
+    assert blocker.block()
+    assert blocker.record_integrity_baseline() is None
+    assert baseline(blocker)["created"] == created
+    assert blocker.check_integrity().modified == ["CapCutCore.dll"] # Still reported, not hidden
+
+def test_rebaseline_replaces_the_baseline(scenario):
+    fs, blocker, active = scenario
+    assert blocker.block()
+    fs.add_file(active / "CapCutCore.dll", b"patched on purpose")
+    assert not blocker.check_integrity().ok
+
+    manifest = blocker.record_integrity_baseline(force=True)
+    assert manifest["folder"] == "5.0.0.1"
+    assert baseline(blocker) == manifest
+    assert blocker.check_integrity().ok
+
+def test_no_baseline_while_files_are_unreadable(scenario):
+    fs, blocker, active = scenario
+    fs.deny(active / "resources" / "app.pak", "read")
+    assert blocker.block() # The locks do not depend on the baseline
+    assert baseline(blocker) is None
+    assert blocker.record_integrity_baseline(force=True) is None
+    assert blocker.check_integrity() is None
+
+    fs.allow(active / "resources" / "app.pak")
+    assert blocker.record_integrity_baseline() is not None
+    assert sorted(baseline(blocker)["files"]) == ["CapCut.exe", "CapCutCore.dll", "resources/app.pak"]
+
+def test_cli_rebaseline(capcut_root, capsys):
+    dll = capcut_root / "Apps" / "5.0.0.1886" / "CapCutCore.dll"
+    dll.parent.mkdir()
+    dll.write_bytes(b"original")
+    args = ["--json", "--path", str(capcut_root)]
+    assert capcut_cli.main(args + ["block"]) == capcut_cli.EXIT_OK
+    dll.write_bytes(b"patched on purpose")
+    assert capcut_cli.main(args + ["verify", "--integrity"]) != capcut_cli.EXIT_OK
+    assert capcut_cli.main(args + ["block", "--rebaseline"]) == capcut_cli.EXIT_OK
+    assert capcut_cli.main(args + ["verify", "--integrity"]) == capcut_cli.EXIT_OK
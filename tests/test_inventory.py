@@ -0,0 +1,132 @@
+"""Version inventory: VS_VERSIONINFO parsing and which Apps folder is picked as the active one"""
+import os
+
+import pytest
+
+from capcut_fixtures import RT_ICON, version_exe_bytes, write_version_exe
+from capcut_inventory import PEFormatError, VersionInventory, parse_pe_version, read_pe_version
+from capcut_rules import BLOCKED_VERSION
+
+DAY = 24 * 3600
+
+@pytest.fixture
+def apps(tmp_path):
+    path = tmp_path / "CapCut" / "Apps"
+    path.mkdir(parents=True)
+    return path
+
+def install(apps, folder, version=None, age=0, exe=None):
+    """A version folder whose CapCut.exe reports version (folder name by default), age days old"""
+    path = apps / folder / "CapCut.exe"
+    if exe is None:
+        write_version_exe(path, version or folder)
+    else:
+        path.parent.mkdir(parents=True)
+        path.write_bytes(exe)
+    when = 1_700_000_000 - age * DAY
+    os.utime(apps / folder, (when, when))
+    return apps / folder
+
+def configure(apps, version):
+    (apps / "configure.ini").write_text(f"[capcut]\nlast_version={version}\nchannel=release\n")
+
+def test_parse_version_resource(tmp_path):
+    assert parse_pe_version(version_exe_bytes("5.2.0.1950")) == "5.2.0.1950"
+    write_version_exe(tmp_path / "CapCut.exe", "4.9.0.1", size=4 * 1024 * 1024)
+    assert read_pe_version(tmp_path / "CapCut.exe") == "4.9.0.1"
+
+@pytest.mark.parametrize("length", [0, 2, 63, 0x40, 0x100, 0x200, 0x260, 0x28C])
+def test_truncated_pe(tmp_path, length):
+    data = version_exe_bytes("5.0.0.1")[:length]
+    with pytest.raises(PEFormatError):
+        parse_pe_version(data)
+    path = tmp_path / "CapCut.exe"
+    path.write_bytes(data)
+    assert VersionInventory().exe_version(path) is None
+
+def test_exe_without_version_resource(tmp_path):
+    data = version_exe_bytes("5.0.0.1", resource_type=RT_ICON)
+    with pytest.raises(PEFormatError, match="No version resource"):
+        parse_pe_version(data)
+    (tmp_path / "CapCut.exe").write_bytes(data)
+    assert VersionInventory().exe_version(tmp_path / "CapCut.exe") is None
+
+def test_not_a_pe_file(tmp_path):
+    with pytest.raises(PEFormatError, match="No MZ header"):
+        parse_pe_version(b"#!/bin/sh\n" + bytes(200))
+    assert VersionInventory().exe_version(tmp_path / "missing.exe") is None
+
+def test_configure_ini_wins_over_newer_and_higher_folders(apps):
+    install(apps, "5.0.0.1", age=30)
+    downgraded = install(apps, "4.9.0.1", age=0) # Installed after 5.0, so its folder is newer
+    configure(apps, "4.9.0.1")
+
+    installation = VersionInventory().scan(apps)
+    assert (installation.active.path, installation.reason) == (downgraded, "configure.ini")
+    assert [v.name for v in installation.others] == ["5.0.0.1"]
+
+def test_configure_ini_matches_exe_version_before_folder_name(apps):
+    install(apps, "5.0.0.1", version="4.9.0.1", age=0) # Downgraded in place: the folder name lies
+    install(apps, "4.9.0.1", version="4.8.0.1", age=30)
+    configure(apps, "4.9.0.1")
+
+    installation = VersionInventory().scan(apps)
+    assert installation.active.name == "5.0.0.1"
+    assert installation.active.mismatch
+    assert installation.reason == "configure.ini"
+
+def test_downgraded_folder_with_newer_mtime_without_configure_ini(apps):
+    install(apps, "5.0.0.1", age=30)
+    downgraded = install(apps, "4.9.0.1", age=0)
+
+    installation = VersionInventory().scan(apps)
+    assert (installation.active.path, installation.reason) == (downgraded, "newest install")
+
+def test_blocked_configure_ini_falls_back_to_exe_scan(apps):
+    install(apps, "5.1.0.1", exe=b"MZ" + bytes(100), age=0) # Newest and highest, but half installed
+    install(apps, "5.0.0.1", age=30)
+    downgraded = install(apps, "4.9.0.1", age=10)
+    install(apps, BLOCKED_VERSION, age=400) # A real, very old install must not match the placeholder
+    configure(apps, BLOCKED_VERSION)
+
+    installation = VersionInventory().scan(apps)
+    assert installation.configured == BLOCKED_VERSION
+    assert (installation.active.path, installation.reason) == (downgraded, "newest install")
+
+def test_unknown_configured_version_falls_back_to_exe_scan(apps):
+    install(apps, "5.0.0.1", age=30)
+    newest = install(apps, "4.9.0.1", age=0)
+    configure(apps, "6.0.0.1") # Written by an updater that never finished
+
+    installation = VersionInventory().scan(apps)
+    assert (installation.active.path, installation.reason) == (newest, "newest install")
+
+def test_folder_name_when_no_exe_is_readable(apps):
+    install(apps, "4.9.0.1", exe=b"", age=0)
+    install(apps, "5.0.0.1", exe=b"MZ", age=30)
+    configure(apps, BLOCKED_VERSION)
+
+    installation = VersionInventory().scan(apps)
+    assert (installation.active.name, installation.reason) == ("5.0.0.1", "folder name")
+
+def test_empty_or_missing_apps(apps):
+    assert VersionInventory().scan(apps).active is None
+    assert VersionInventory().scan(apps / "missing").versions == []
+
+def test_cache_skips_unchanged_exes(apps, tmp_path):
+    cache = tmp_path / "inventory.json"
+    install(apps, "5.0.0.1", age=30)
+    install(apps, "4.9.0.1", age=0)
+    first = VersionInventory(cache)
+    first.scan(apps)
+    assert first.reads == 2
+
+    second = VersionInventory(cache)
+    assert second.scan(apps).active.name == "4.9.0.1"
+    assert second.reads == 0
+
+    write_version_exe(apps / "5.0.0.1" / "CapCut.exe", "5.0.0.2", size=8192) # Repaired in place
+    third = VersionInventory(cache)
+    versions = {v.name: v.version for v in third.scan(apps).versions}
+    assert third.reads == 1
+    assert versions == {"5.0.0.1": "5.0.0.2", "4.9.0.1": "4.9.0.1"}
@@ -0,0 +1,144 @@
+"""Crash safety of block and restore: kill the process at every step boundary, then recover"""
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+import capcut_cli
+from capcut_core import CapCutBlocker
+from capcut_journal import Journal
+from capcut_rules import LOCK_RULES, rule_drift
+
+from conftest import ORIGINAL_INI, UPDATER_SIZE
+
+KILLED = 77
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STEPS = len(LOCK_RULES) # Every rule of the fixture tree has something to lock and to restore
+
+# Runs one action and dies with os._exit just before (or just after) the
+# journal append number `kill_at`: after the begin record, each step's file
+# change and its done record are separate points in time.
+CHILD = textwrap.dedent("""
+    import os, sys
+    sys.path.insert(0, {repo!r})
+    import capcut_journal
+    from capcut_core import CapCutBlocker
+
+    root, action, kill_at, when = sys.argv[1], sys.argv[2], int(sys.argv[3]), sys.argv[4]
+    append = capcut_journal.Journal._append
+    appends = []
+
+    def dying_append(self, record):
+        appends.append(record)
+        if len(appends) == kill_at and when == "before":
+            os._exit({killed})
+        append(self, record)
+        if len(appends) == kill_at and when == "after":
+            os._exit({killed})
+
+    capcut_journal.Journal._append = dying_append
+    blocker = CapCutBlocker(root)
+    blocker.block() if action == "block" else blocker.restore()
+    blocker.wait_for_purge()
+""").format(repo=REPO, killed=KILLED)
+
+def run_killed(root, action, kill_at, when):
+    result = subprocess.run([sys.executable, "-c", CHILD, str(root), action, str(kill_at), when],
+                            capture_output=True, text=True, env=dict(os.environ), timeout=60)
+    assert result.returncode == KILLED, result.stderr
+
+def locked(root):
+    return [rule.name for rule in LOCK_RULES if rule_drift(rule, rule.path(root), os.stat(rule.path(root))) is None]
+
+def assert_original(root):
+    assert (root / "Apps" / "configure.ini").read_bytes() == ORIGINAL_INI
+    assert (root / "Apps" / "ProductInfo.xml").read_bytes() == b"<product version='5.0.0.1886'/>"
+    for updater in (root / "Apps" / "update.exe", root / "User Data" / "Download" / "update.exe"):
+        assert updater.stat().st_size == UPDATER_SIZE
+    assert locked(root) == []
+
+def assert_no_temp_files(root):
+    leftovers = [name for _, _, names in os.walk(root) for name in names if name.endswith(".tmp")]
+    assert leftovers == []
+
+KILL_POINTS = [(kill_at, when) for kill_at in range(1, STEPS + 2) for when in ("before", "after")]
+
+@pytest.mark.parametrize("kill_at, when", KILL_POINTS)
+def test_block_killed_at_step_boundary(capcut_root, kill_at, when):
+    run_killed(capcut_root, "block", kill_at, when)
+    journal_started = not (kill_at == 1 and when == "before")
+
+    blocker = CapCutBlocker(capcut_root)
+    blocker.recover()
+    assert Journal(blocker.get_journal_path()).unfinished() == (None, [])
+    assert_no_temp_files(capcut_root)
+    if journal_started:
+        assert sorted(locked(capcut_root)) == sorted(rule.name for rule in LOCK_RULES)
+    else:
+        assert_original(capcut_root) # Killed before the first lock: nothing was touched
+
+    # Every original was backed up before its file was changed
+    assert blocker.restore()
+    assert_original(capcut_root)
+
+@pytest.mark.parametrize("kill_at, when", KILL_POINTS)
+def test_restore_killed_at_step_boundary(capcut_root, kill_at, when):
+    assert CapCutBlocker(capcut_root).block()
+    run_killed(capcut_root, "restore", kill_at, when)
+
+    blocker = CapCutBlocker(capcut_root)
+    blocker.recover()
+    assert Journal(blocker.get_journal_path()).unfinished() == (None, [])
+    assert_no_temp_files(capcut_root)
+    if kill_at == 1 and when == "before":
+        assert len(locked(capcut_root)) == STEPS # Killed before the first restore: still fully blocked
+    else:
+        assert_original(capcut_root)
+
+@pytest.mark.parametrize("lines", [
+    ['{"op": "begin", "action": "block", "root": "/x"}'], # No steps
+    ['[1, 2]', '"begin"', 'null'],
+    ['{"op": "begin", "action": "block", "root": "/x", "steps": "all"}'],
+    ['{"steps": [{"step": 1, "kind": "lock", "rule": "configure.ini"}]}'], # No op
+])
+def test_malformed_journal_records_are_skipped(tmp_path, lines):
+    path = tmp_path / "journal.jsonl"
+    path.write_text("\n".join(lines) + "\n")
+    assert Journal(path).unfinished() == (None, [])
+
+def test_malformed_steps_are_skipped(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    begin = {"op": "begin", "action": "block", "root": "/x",
+             "steps": ["lock", {"kind": "lock"}, {"step": 1, "kind": "lock", "rule": "configure.ini"}]}
+    path.write_text(json.dumps(begin) + "\n" + json.dumps({"op": "done"}) + "\n")
+    run, steps = Journal(path).unfinished()
+    assert run["action"] == "block"
+    assert steps == [{"step": 1, "kind": "lock", "rule": "configure.ini"}]
+
+def test_cli_recovers_only_for_commands_that_change_files(capcut_root, monkeypatch, capsys):
+    calls = []
+    monkeypatch.setattr(CapCutBlocker, "recover", lambda self: calls.append(1) or 0)
+    for command in ("versions", "snapshots", "space"):
+        assert capcut_cli.main(["--json", "--path", str(capcut_root), command]) == capcut_cli.EXIT_OK
+    assert calls == []
+    assert capcut_cli.main(["--json", "--path", str(capcut_root), "block"]) == capcut_cli.EXIT_OK
+    assert calls == [1]
+
+def test_cli_carries_on_when_recovery_fails(capcut_root, capsys):
+    journal = CapCutBlocker(capcut_root).get_journal_path()
+    journal.parent.mkdir(parents=True)
+    journal.write_text('{"op": "begin", "action": "restore", "root": "%s", "snapshot": "gone",'
+                       ' "steps": [{"step": 1, "kind": "restore", "rule": "configure.ini"}]}\n' % capcut_root)
+
+    assert capcut_cli.main(["--json", "--path", str(capcut_root), "block"]) == capcut_cli.EXIT_OK
+    result = json.loads(capsys.readouterr().out)
+    assert result["ok"]
+    assert "⚠️ Could not finish the interrupted run: Unknown snapshot: gone" in result["log"]
+
+def test_cli_without_localappdata(monkeypatch, capsys):
+    monkeypatch.delenv("LOCALAPPDATA", raising=False)
+    assert capcut_cli.main(["--json", "versions"]) == capcut_cli.EXIT_OK
+    assert json.loads(capsys.readouterr().out)["ok"]
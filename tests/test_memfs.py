@@ -0,0 +1,52 @@
+"""block and restore on MemoryBackend, for every scenario of the in-memory matrix"""
+import pytest
+
+from capcut_core import CapCutBlocker
+from capcut_fixtures import SCENARIO_COUNT, memory_scenario, scenario_axes
+from capcut_memfs import MemoryBackend
+from capcut_rules import LOCK_RULES
+
+def scenario_id(n):
+    return "-".join(axis.replace(" ", "_") for axis in scenario_axes(n))
+
+@pytest.mark.parametrize("n", range(SCENARIO_COUNT), ids=scenario_id)
+def test_block_and_restore(localappdata, n):
+    fs, root, expected = memory_scenario(n)
+    _, _, process, _ = scenario_axes(n)
+    blocker = CapCutBlocker(root, platform=fs)
+
+    assert blocker.block() == expected["block"]
+    blocker.wait_for_purge()
+    assert blocker.verify_locks(root) == expected["block"]
+    assert not fs.exists(root / "Apps" / "4.9.0.1") # Old version removed, even where the rename is denied
+    assert fs.exists(root / "Apps" / "5.0.0.1" / "CapCutCore.dll")
+    assert fs.exists(root / "User Data" / "Download" / "partial.bin")
+    assert list(fs.processes.values()) == (["CapCut.exe"] if process == "stuck" else [])
+
+    assert blocker.restore()
+    for path, data in expected["restored"].items():
+        assert fs.exists(path) and fs.read_bytes(path) == data
+        assert not fs.is_readonly(path)
+
+def test_matrix_covers_every_combination():
+    assert len({scenario_axes(n) for n in range(SCENARIO_COUNT)}) == SCENARIO_COUNT
+    assert scenario_axes(SCENARIO_COUNT) == scenario_axes(0)
+
+def test_block_twice_changes_nothing(localappdata):
+    fs, root, expected = memory_scenario(4) # Everything original, nothing running, no fault
+    blocker = CapCutBlocker(root, platform=fs)
+    assert blocker.block()
+    blocker.wait_for_purge()
+    before = {rule.name: fs.stat(rule.path(root)).st_mtime_ns for rule in LOCK_RULES}
+    assert blocker.block()
+    assert {rule.name: fs.stat(rule.path(root)).st_mtime_ns for rule in LOCK_RULES} == before
+
+def test_denied_operation_raises_permission_error(tmp_path):
+    fs = MemoryBackend()
+    fs.add_file(tmp_path / "configure.ini", b"last_version=5.0.0.1")
+    fs.deny(tmp_path / "configure.ini", "rename")
+    with pytest.raises(PermissionError):
+        fs.rename(tmp_path / "configure.ini", tmp_path / "configure.bak")
+    fs.allow(tmp_path / "configure.ini")
+    fs.rename(tmp_path / "configure.ini", tmp_path / "configure.bak")
+    assert fs.read_bytes(tmp_path / "configure.bak") == b"last_version=5.0.0.1"
@@ -0,0 +1,51 @@
+"""Background purge of the trash folder, on the in-memory filesystem"""
+from pathlib import Path
+
+from capcut_memfs import MemoryBackend
+from capcut_purge import empty_trash, purge_tree
+
+TRASH = Path("/CapCut/.blocker_trash")
+
+def build_trash(fs, folders=6, files=5):
+    for n in range(folders):
+        for m in range(files):
+            fs.add_file(TRASH / "1-slot-Cache" / f"dir{n}" / f"sub{m}" / "blob.bin", size=1000)
+
+def test_purge_removes_everything_and_counts_it():
+    fs = MemoryBackend()
+    build_trash(fs)
+
+    report = empty_trash(TRASH, workers=4, fs=fs)
+
+    assert report.failures == []
+    assert (report.files, report.bytes) == (30, 30000)
+    assert report.dirs == 1 + 6 + 30
+    assert not fs.exists(TRASH)
+
+def test_stopped_purge_reports_no_failures():
+    fs = MemoryBackend()
+    build_trash(fs)
+    calls = []
+
+    def cancelled():
+        calls.append(1)
+        return len(calls) > 3 # Stops after the first few folders
+
+    report = purge_tree(TRASH / "1-slot-Cache", workers=1, cancelled=cancelled, fs=fs)
+
+    assert report.failures == []
+    assert fs.exists(TRASH / "1-slot-Cache") # The rest waits for the next purge
+    report = empty_trash(TRASH, workers=1, fs=fs)
+    assert report.failures == []
+    assert report.files > 0 and not fs.exists(TRASH)
+
+def test_undeletable_file_is_a_failure():
+    fs = MemoryBackend()
+    build_trash(fs, folders=1, files=1)
+    blob = TRASH / "1-slot-Cache" / "dir0" / "sub0" / "blob.bin"
+    fs.deny(blob, "delete")
+
+    report = empty_trash(TRASH, workers=1, fs=fs)
+
+    assert [path for path, _ in report.failures][0] == str(blob)
+    assert fs.exists(blob)
@@ -0,0 +1,153 @@
+"""The download queue: priorities, the parallelism bound, per-job pause and discard, the shared cap"""
+import os
+import threading
+import time
+
+import pytest
+
+from capcut_catalog import VersionEntry
+from capcut_core import CapCutBlocker
+from capcut_queue import DownloadQueue, TokenBucket, parse_rate
+
+from conftest import InstallerServer
+
+MB = 1024 * 1024
+PAYLOAD_SIZE = 2 * MB + 4321
+VERSIONS = ["1.0.0", "2.0.0", "3.0.0", "4.0.0"]
+
+@pytest.fixture
+def server(monkeypatch):
+    for name in ("http_proxy", "HTTP_PROXY", "all_proxy", "ALL_PROXY"):
+        monkeypatch.delenv(name, raising=False)
+    server = InstallerServer(os.urandom(PAYLOAD_SIZE), "ranges")
+    yield server
+    server.close()
+
+@pytest.fixture
+def blocker(localappdata, tmp_path, server):
+    """A blocker whose catalog has one entry per VERSIONS, each at its own URL (so none is a cache hit)"""
+    blocker = CapCutBlocker(tmp_path / "CapCut")
+    base = server.url.rsplit("/", 1)[0]
+    blocker.versions = {name: VersionEntry(name, [f"{base}/{name}.exe"]) for name in VERSIONS}
+    return blocker
+
+class Recorder:
+    """on_update hook: the order jobs started in and the most that ran at once"""
+    def __init__(self):
+        self.started = []
+        self.most_running = 0
+        self.queue = None
+        self._lock = threading.Lock()
+
+    def __call__(self, job):
+        with self._lock:
+            if job.state == "running" and job.version not in self.started:
+                self.started.append(job.version)
+            running = sum(j.state == "running" for j in self.queue.jobs)
+            self.most_running = max(self.most_running, running)
+
+def make_queue(blocker, workers, rate_limit=None):
+    recorder = Recorder()
+    queue = DownloadQueue(blocker, workers, rate_limit, on_update=recorder)
+    recorder.queue = queue
+    return queue, recorder
+
+def wait_until(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_higher_priority_starts_first(blocker, tmp_path, server):
+    queue, recorder = make_queue(blocker, workers=1)
+    jobs = queue.submit_many([("1.0.0", 0), ("2.0.0", 5), ("3.0.0", 1), ("4.0.0", 5)], tmp_path / "out")
+    assert queue.wait(30)
+    assert recorder.started == ["2.0.0", "4.0.0", "3.0.0", "1.0.0"] # Equal priorities keep their order
+    for job in jobs:
+        assert job.state == "done"
+        assert job.path.read_bytes() == server.payload
+
+def test_no_more_than_workers_run_at_once(blocker, tmp_path, server):
+    server.delay = 0.002
+    queue, recorder = make_queue(blocker, workers=2)
+    queue.submit_many([(name, 0) for name in VERSIONS], tmp_path / "out")
+    assert queue.wait(60)
+    assert recorder.most_running == 2
+    assert all(job.state == "done" for job in queue.jobs)
+    assert queue.idle()
+
+def test_same_version_is_queued_once(blocker, tmp_path, server):
+    server.delay = 0.002
+    queue, _ = make_queue(blocker, workers=1)
+    first = queue.submit("1.0.0", dest=tmp_path / "out")
+    assert queue.submit("1.0.0", dest=tmp_path / "out") is first
+    waiting = queue.submit("2.0.0", dest=tmp_path / "out")
+    waiting.cancel()
+    assert waiting.state == "cancelled" # Withdrawn before it started
+    assert queue.wait(30)
+    assert first.state == "done"
+    assert len(queue.jobs) == 2
+
+def test_pause_and_discard_apply_to_one_job(blocker, tmp_path, server):
+    server.delay = 0.005
+    out = tmp_path / "out"
+    queue, _ = make_queue(blocker, workers=3)
+    paused, discarded, kept = queue.submit_many([("1.0.0", 0), ("2.0.0", 0), ("3.0.0", 0)], out)
+    wait_until(lambda: paused.done > 0 and discarded.done > 0)
+    paused.cancel()
+    discarded.cancel(discard=True)
+    assert queue.wait(60)
+
+    assert (paused.state, discarded.state, kept.state) == ("paused", "discarded", "done")
+    assert kept.path.read_bytes() == server.payload
+    assert (out / "capcut_1_0_0_installer.exe.part").exists() # Kept to resume from
+    assert not (out / "capcut_2_0_0_installer.exe.part").exists()
+    assert not (out / "capcut_2_0_0_installer.exe").exists()
+
+    sent = server.sent
+    server.delay = 0
+    resumed = queue.submit("1.0.0", dest=out)
+    assert resumed is not paused
+    assert queue.wait(30)
+    assert resumed.state == "done"
+    assert resumed.path.read_bytes() == server.payload
+    assert server.sent - sent < PAYLOAD_SIZE # Only what the pause left out was fetched again
+
+def test_rate_limit_is_shared_and_can_change_mid_run(blocker, tmp_path, server):
+    rate = 512 * 1024
+    queue, _ = make_queue(blocker, workers=2, rate_limit=rate)
+    jobs = queue.submit_many([("1.0.0", 0), ("2.0.0", 0)], tmp_path / "out")
+    wait_until(lambda: all(job.done for job in jobs))
+    started, done = time.monotonic(), sum(job.done for job in jobs)
+    time.sleep(1.0)
+    elapsed, moved = time.monotonic() - started, sum(job.done for job in jobs) - done
+    # Both jobs together, not each: about rate * elapsed, with room for the reads in flight
+    assert rate * elapsed / 2 < moved < rate * elapsed + 256 * 1024
+    assert not queue.wait(0)
+
+    queue.set_rate_limit(None)
+    assert queue.wait(30)
+    assert all(job.state == "done" for job in jobs)
+
+def test_job_owns_a_downloader_not_the_blocker_api(blocker, tmp_path):
+    queue, _ = make_queue(blocker, workers=1)
+    job = queue.submit("1.0.0", dest=tmp_path / "out")
+    assert queue.wait(30)
+    assert not hasattr(job, "block") and not hasattr(job.downloader, "restore")
+
+def test_token_bucket():
+    bucket = TokenBucket(1000)
+    assert 0.3 < bucket.consume(500) < 1.0 # Starts empty: half a second's worth of debt
+    time.sleep(1.1)
+    assert bucket.consume(500) < 0.05 # Refilled, up to one second's burst
+    bucket.set_rate(None)
+    assert bucket.consume(10 ** 9) == 0.0
+
+@pytest.mark.parametrize("text, rate", [("", None), ("0", None), ("800K", 800 * 1024), ("1.5M", 3 * MB // 2),
+                                        ("5MB/s", 5 * MB), ("1000", 1000)])
+def test_parse_rate(text, rate):
+    assert parse_rate(text) == rate
+
+def test_parse_rate_rejects_garbage():
+    with pytest.raises(ValueError):
+        parse_rate("fast")
@@ -0,0 +1,14 @@
+"""The CLI defers what only some commands need"""
+import json
+import os
+import subprocess
+import sys
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFERRED = ["tkinter", "ctypes", "shutil", "subprocess", "http.client", "urllib.request", "ssl", "email",
+            "concurrent.futures", "mmap", "hashlib", "uuid"]
+
+def test_cli_import_leaves_deferred_modules_unloaded():
+    code = f"import json, sys, capcut_cli; print(json.dumps([m for m in {DEFERRED!r} if m in sys.modules]))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO, capture_output=True, text=True, check=True)
+    assert json.loads(result.stdout) == []
@@ -0,0 +1,120 @@
+"""TaskRunner and CancelToken: cancelling at checkpoints, shutdown, the worker bound"""
+import threading
+import time
+
+import pytest
+
+from capcut_tasks import CancelToken, TaskCancelled, TaskRunner, checkpoint, current_task
+
+@pytest.fixture
+def runner():
+    runner = TaskRunner(workers=2)
+    yield runner
+    runner.shutdown(5)
+
+def test_cancelled_task_stops_at_the_next_checkpoint(runner):
+    started, release = threading.Event(), threading.Event()
+    reached = []
+    def work():
+        checkpoint("first")
+        reached.append("first")
+        started.set()
+        release.wait(5)
+        reached.append("first done") # The step in progress still finishes
+        checkpoint("second")
+        reached.append("second")
+    task = runner.submit("work", work)
+    assert started.wait(5)
+    task.cancel()
+    release.set()
+    assert task.wait(5)
+    assert task.state == "cancelled"
+    assert reached == ["first", "first done"]
+    assert [name for name, _ in task.steps] == ["first"]
+    with pytest.raises(TaskCancelled):
+        task.get(0)
+
+def test_task_cancelled_while_queued_never_runs():
+    runner = TaskRunner(workers=1)
+    release = threading.Event()
+    ran = []
+    busy = runner.submit("busy", release.wait, 5)
+    queued = runner.submit("queued", ran.append, "queued")
+    queued.cancel()
+    release.set()
+    assert busy.wait(5) and queued.wait(5)
+    assert queued.state == "cancelled" and ran == []
+    assert runner.shutdown(5)
+
+def test_shutdown_waits_for_the_current_step(runner):
+    started = threading.Event()
+    finished = []
+    def work():
+        checkpoint("slow step")
+        started.set()
+        time.sleep(0.3)
+        finished.append("slow step")
+        checkpoint("never reached")
+        finished.append("never reached")
+    task = runner.submit("work", work)
+    assert started.wait(5)
+    assert runner.shutdown()
+    assert finished == ["slow step"]
+    assert task.state == "cancelled" and not task.active
+    with pytest.raises(RuntimeError):
+        runner.submit("late", lambda: None)
+
+def test_shutdown_timeout_returns_false_while_a_step_runs():
+    runner = TaskRunner(workers=1)
+    started, release = threading.Event(), threading.Event()
+    def work():
+        started.set()
+        release.wait(5)
+        checkpoint()
+    task = runner.submit("work", work)
+    assert started.wait(5)
+    assert runner.shutdown(timeout=0.1) is False
+    assert task.active
+    release.set()
+    assert task.wait(5) and task.state == "cancelled"
+
+def test_no_more_than_the_pool_size_run_at_once(runner):
+    lock = threading.Lock()
+    running, most = [0], [0]
+    def work(n):
+        with lock:
+            running[0] += 1
+            most[0] = max(most[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return n
+    tasks = [runner.submit(f"task {n}", work, n) for n in range(6)]
+    assert [task.get(5) for task in tasks] == list(range(6))
+    assert most[0] == 2
+    assert runner.idle()
+
+def test_failure_is_kept_and_reraised(runner):
+    def work():
+        raise OSError("disk gone")
+    task = runner.submit("work", work)
+    assert task.wait(5)
+    assert task.state == "failed"
+    with pytest.raises(OSError):
+        task.get(0)
+
+def test_checkpoint_outside_a_task_is_a_no_op():
+    assert current_task() is None
+    checkpoint("anything")
+
+def test_cancel_token_callbacks():
+    token = CancelToken()
+    calls = []
+    token.on_cancel(lambda: calls.append("early"))
+    token.check()
+    token.cancel()
+    token.cancel() # Only the first cancel runs the callbacks
+    token.on_cancel(lambda: calls.append("late")) # Runs at once
+    assert token.cancelled and calls == ["early", "late"]
+    with pytest.raises(TaskCancelled):
+        token.check()
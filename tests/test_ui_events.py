@@ -0,0 +1,45 @@
+"""The worker-to-Tk event channel, without creating a window"""
+import threading
+
+import pytest
+
+tkinter = pytest.importorskip("tkinter")
+import capcut
+from capcut import CapCutBlockerApp, UIEventChannel
+
+def test_every_post_from_many_threads_is_counted_and_delivered():
+    channel = UIEventChannel()
+    seen = []
+
+    def worker(n):
+        for i in range(1000):
+            channel.post(seen.append, (n, i))
+            channel.post_latest(("progress", n), seen.append, None)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    channel.drain()
+
+    assert channel.posted == 16000
+    assert len([item for item in seen if item is not None]) == 8000
+    assert channel.delivered == 8000 + 8 # post_latest keeps only the newest per key
+    for n in range(8):
+        assert [i for m, i in (item for item in seen if item) if m == n] == list(range(1000))
+
+def test_worker_dialogs_are_shown_from_the_drain(monkeypatch):
+    shown = []
+    monkeypatch.setattr(capcut.messagebox, "showinfo", lambda title, message: shown.append((threading.current_thread(), title)))
+    app = CapCutBlockerApp.__new__(CapCutBlockerApp) # No Tk root: only the channel is needed
+    app.ui_events = UIEventChannel()
+    app.flush_log = lambda: None
+
+    worker = threading.Thread(target=app.post_dialog, args=("info", "Success", "Done"))
+    worker.start()
+    worker.join()
+    assert shown == []
+
+    app.ui_events.drain()
+    assert shown == [(threading.current_thread(), "Success")]
@@ -0,0 +1,84 @@
+"""The lock watchdog re-locks files the updater rewrites"""
+import os
+
+import pytest
+
+from capcut_core import CapCutBlocker
+from capcut_rules import BLOCKED_VERSION, LOCK_RULES
+from capcut_watch import LockWatchdog, PollingWatcher
+
+from conftest import ORIGINAL_INI
+
+def rewrite_as_updater(path, data):
+    os.chmod(path, 0o666)
+    path.write_bytes(data)
+
+def test_relock_keeps_the_original_as_the_restore_point(capcut_root):
+    blocker = CapCutBlocker(capcut_root)
+    assert blocker.block()
+    snapshots = len(blocker.list_snapshots())
+    ini = capcut_root / "Apps" / "configure.ini"
+    updater = capcut_root / "Apps" / "update.exe"
+
+    rewrite_as_updater(ini, b"[capcut]\nlast_version=6.1.0.2000\n")
+    rewrite_as_updater(updater, b"MZ" + bytes(2 * 1024 * 1024))
+    watchdog = LockWatchdog(blocker, PollingWatcher([rule.path(capcut_root) for rule in LOCK_RULES]))
+    assert sorted(watchdog.check()) == ["Apps/update.exe", "configure.ini"]
+    assert f"last_version={BLOCKED_VERSION}".encode() in ini.read_bytes()
+    assert updater.stat().st_size == 0
+    assert len(blocker.list_snapshots()) == snapshots # The updater's files are never backed up
+
+    assert blocker.restore()
+    assert ini.read_bytes() == ORIGINAL_INI
+    assert updater.stat().st_size == 2 * 1024 * 1024
+
+class StuckIniBlocker(CapCutBlocker):
+    """Rewrites configure.ini on every re-lock without ever locking it, like a lock that does not take"""
+    def lock_ini(self, ini_path, cache):
+        os.chmod(ini_path, 0o666)
+        ini_path.write_bytes(b"[capcut]\nfoo=1\n")
+
+def test_relock_that_does_not_take_is_not_retried_on_its_own_events(capcut_root):
+    assert CapCutBlocker(capcut_root).block()
+    blocker = StuckIniBlocker(capcut_root)
+    ini = capcut_root / "Apps" / "configure.ini"
+    rewrite_as_updater(ini, b"[capcut]\nfoo=1\n")
+    watchdog = LockWatchdog(blocker)
+    if watchdog.watcher.name != "inotify":
+        watchdog.stop()
+        pytest.skip("needs inotify")
+
+    watchdog.run(1)
+    assert watchdog.relocks == 1
+    assert watchdog.wakeups <= 2
+
+def test_own_writes_are_skipped_until_the_file_changes_again(capcut_root):
+    assert CapCutBlocker(capcut_root).block()
+    blocker = StuckIniBlocker(capcut_root)
+    ini = capcut_root / "Apps" / "configure.ini"
+    watchdog = LockWatchdog(blocker, PollingWatcher([ini]))
+
+    rewrite_as_updater(ini, b"[capcut]\nlast_version=6.1.0.2000\n")
+    assert watchdog.check({ini}) == ["configure.ini"]
+    assert watchdog.check({ini}) == []
+    rewrite_as_updater(ini, b"[capcut]\nlast_version=6.1.0.2001\n")
+    assert watchdog.check({ini}) == ["configure.ini"]
+
+def test_block_pauses_the_running_watchdog(capcut_root, monkeypatch):
+    blocker = CapCutBlocker(capcut_root)
+    assert blocker.block()
+    monkeypatch.setattr(LockWatchdog, "check", lambda self, paths=None: []) # Leaves the drift to block
+    first = blocker.start_watch()
+    rewrite_as_updater(capcut_root / "Apps" / "update.exe", b"MZ" + bytes(2 * 1024 * 1024))
+
+    during = []
+    apply_plan = CapCutBlocker.apply_plan
+    monkeypatch.setattr(CapCutBlocker, "apply_plan",
+                        lambda self, plan, cache: during.append(self.watchdog) or apply_plan(self, plan, cache))
+    try:
+        assert blocker.block()
+        assert during == [None]
+        assert not first.thread.is_alive()
+        assert blocker.watchdog is not None and blocker.watchdog.thread.is_alive()
+    finally:
+        blocker.stop_watch()